@@ -0,0 +1,295 @@
+"""
+asyncio counterpart of DBClient, backed by an asyncpg connection pool.
+
+usage:
+    async with get_async_db_client() as db:
+        ids = await db.claim_episodes(WORKER_ID, batch_size=4)
+
+Every method borrows a connection from the pool only for the duration of its
+own statement(s), so thousands of concurrent coroutines (feed refresh,
+downloads, transcription bookkeeping) multiplex over a handful of connections.
+"""
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import asyncpg
+from dotenv import load_dotenv
+
+from db_client import (CLAIM_ORDER, LEASE_MINUTES, LEASE_FLOOR_MINUTES, LEASE_PER_AUDIO_S,
+                       create_ssh_tunnel, load_credentials_from_env, parse_pub_date)
+
+load_dotenv()
+
+POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "8"))
+
+
+@asynccontextmanager
+async def get_async_db_client(min_size: int = POOL_MIN, max_size: int = POOL_MAX):
+    db_credential_map = {
+        "database": "AZURE_DATABASE",
+        "user": "AZURE_USER",
+        "password": "AZURE_PASSWORD",
+        "host": "AZURE_HOST",
+        "port": "AZURE_PORT",
+    }
+
+    db_credentials = load_credentials_from_env(db_credential_map)
+    db_credentials["port"] = int(db_credentials["port"])
+
+    # Same tunnel setup as the sync client
+    use_tunnel = os.getenv("USE_SSH_TUNNEL") == "1"
+    tunnel = None
+    if use_tunnel:
+        tunnel = create_ssh_tunnel(
+            db_credentials['host'], db_credentials['port'])
+        db_credentials['host'] = 'localhost'
+        db_credentials['port'] = tunnel.local_bind_port
+    try:
+        db = await AsyncDBClient.connect(
+            min_size=min_size, max_size=max_size, **db_credentials)
+        try:
+            yield db
+        finally:
+            await db.close()
+    finally:
+        if tunnel:
+            tunnel.stop()
+
+
+class AsyncDBClient:
+    """
+    Same method surface as DBClient for the hot-path calls, but every method
+    is a coroutine. Build it with get_async_db_client() so the pool (and
+    tunnel) are torn down when the context exits.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    @classmethod
+    async def connect(cls, database, user, password, host, port,
+                      min_size: int = POOL_MIN, max_size: int = POOL_MAX):
+        pool = await asyncpg.create_pool(
+            database=database,
+            user=user,
+            password=password,
+            host=host,
+            port=port,
+            min_size=min_size,
+            max_size=max_size,
+        )
+        return cls(pool)
+
+    async def close(self):
+        await self.pool.close()
+
+    async def insert_episode(self, episode_data):
+        """
+        Upsert an episode row (see DBClient.insert_episode).
+        Podcast lookup/creation and the episode upsert share one transaction.
+        """
+        pub_date = parse_pub_date(episode_data.get('pubDate'))
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                podcast_id = await conn.fetchval(
+                    'SELECT id FROM podcasts WHERE title = $1',
+                    episode_data['podcast_title'])
+                if podcast_id is None:
+                    podcast_id = await conn.fetchval(
+                        'INSERT INTO podcasts (title) VALUES ($1) RETURNING id',
+                        episode_data['podcast_title'])
+
+                await conn.execute(
+                    """
+                    INSERT INTO episodes (
+                        id, guid, title, pub_date, download_url, audio_path,
+                        description, podcast_id,
+                        transcript_status, worker_id, lease_expires_at,
+                        transcription_timestamp_completed
+                    )
+                    VALUES ($1, $2, $3, $4, $5, $6,
+                            $7, $8,
+                            'pending', NULL, NULL,
+                            NULL)
+                    ON CONFLICT (id) DO UPDATE SET
+                        guid         = COALESCE(EXCLUDED.guid, episodes.guid),
+                        title        = COALESCE(EXCLUDED.title, episodes.title),
+                        pub_date     = COALESCE(EXCLUDED.pub_date, episodes.pub_date),
+                        download_url = COALESCE(EXCLUDED.download_url, episodes.download_url),
+                        audio_path   = COALESCE(episodes.audio_path, EXCLUDED.audio_path),
+                        description  = COALESCE(EXCLUDED.description, episodes.description),
+                        podcast_id   = COALESCE(EXCLUDED.podcast_id, episodes.podcast_id)
+                    """,
+                    episode_data['unique_id'],
+                    episode_data.get('guid'),
+                    episode_data.get('title'),
+                    # pub_date is a naive TIMESTAMP column
+                    pub_date.replace(tzinfo=None) if pub_date else None,
+                    episode_data.get('downloadUrl'),
+                    episode_data.get('audio_path'),
+                    episode_data.get('description'),
+                    podcast_id,
+                )
+
+    async def get_existing_ids(self, candidate_ids):
+        """take a list of ids and return those that are actually in db"""
+        rows = await self.pool.fetch(
+            "SELECT id FROM episodes WHERE id = ANY($1::text[])",
+            list(candidate_ids))
+        return {r["id"] for r in rows}
+
+    async def claim_episodes(self, worker_id: str, batch_size: int = 1):
+        """
+        Atomically claim up to batch_size 'pending' (or expired) episodes for this worker.
+        Uses SKIP LOCKED so concurrent workers don't collide. Leases are scaled
+        to the episode's length (see db_client.lease_minutes), and episodes
+        come in db_client.CLAIM_ORDER.
+        """
+        rows = await self.pool.fetch(
+            f"""
+            WITH cte AS (
+              SELECT id
+                FROM episodes
+               WHERE transcript_status IN ('pending','processing')
+                 AND (
+                       transcript_status = 'pending'
+                    OR lease_expires_at IS NULL
+                    OR lease_expires_at < NOW()
+                 )
+               ORDER BY {CLAIM_ORDER}
+               FOR UPDATE SKIP LOCKED
+               LIMIT $1
+            )
+            UPDATE episodes e
+               SET transcript_status = 'processing',
+                   worker_id = $2,
+                   lease_expires_at = NOW() + make_interval(secs => GREATEST($3::float8, LEAST($4::float8,
+                       COALESCE(e.audio_duration_s, e.duration_s)::float8 * $5::float8)))
+              FROM cte
+             WHERE e.id = cte.id
+         RETURNING e.id
+            """,
+            batch_size, worker_id, LEASE_FLOOR_MINUTES * 60, LEASE_MINUTES * 60, LEASE_PER_AUDIO_S,
+        )
+        return [r["id"] for r in rows]
+
+    async def mark_done(self, episode_id: str, audio_duration_s: Optional[float] = None,
+                        model: Optional[str] = None, language: Optional[str] = None,
+                        worker_id: Optional[str] = None) -> bool:
+        """Mark done and store the transcript summary columns (see DBClient.mark_done)."""
+        status = await self.pool.execute("""
+            UPDATE episodes e
+               SET transcript_status = 'done',
+                   worker_id = NULL,
+                   lease_expires_at = NULL,
+                   transcription_timestamp_completed = NOW(),
+                   segment_count = s.segment_count,
+                   word_count = s.word_count,
+                   transcript_duration_s = s.transcript_duration_s,
+                   audio_duration_s = COALESCE($2::float8::numeric, e.audio_duration_s),
+                   transcript_model = COALESCE($3::text, e.transcript_model),
+                   language = COALESCE($4::text, e.language)
+              FROM (
+                    SELECT COUNT(*) AS segment_count,
+                           COALESCE(SUM((SELECT COUNT(*) FROM transcript_words w
+                                          WHERE w.seg_id = ts.id)), 0) AS word_count,
+                           COALESCE(MAX(ts.end_s) - MIN(ts.start_s), 0) AS transcript_duration_s
+                      FROM transcript_segments ts
+                     WHERE ts.episode_id = $1
+                   ) s
+             WHERE e.id = $1
+               AND ($5::text IS NULL OR e.worker_id = $5)
+        """, episode_id, None if audio_duration_s is None else float(audio_duration_s),
+            model, language, worker_id)
+        return status != "UPDATE 0"
+
+    async def mark_failed(self, episode_id: str, retry: bool = True,
+                          worker_id: Optional[str] = None) -> bool:
+        """See DBClient.mark_failed: with a worker_id, only if that worker still holds it."""
+        status = await self.pool.execute("""
+            UPDATE episodes
+               SET transcript_status = $2,
+                   worker_id = NULL,
+                   lease_expires_at = NULL
+             WHERE id = $1
+               AND ($3::text IS NULL OR worker_id = $3)
+        """, episode_id, 'pending' if retry else 'failed', worker_id)
+        return status != "UPDATE 0"
+
+    async def extend_lease(self, episode_id: str, minutes: float = 30):
+        await self.pool.execute("""
+            UPDATE episodes
+               SET lease_expires_at = NOW() + make_interval(secs => $1::float8)
+             WHERE id = $2
+        """, float(minutes) * 60, episode_id)
+
+    async def word_level_insert(self, episode_id, seg_rows, word_rows):
+        """
+        Insert or update a word-level transcript for an episode.
+
+        seg_rows:  [(start_s, end_s, text), ...]
+        word_rows: [(seg_idx, word_idx, start_s, end_s, word), ...]
+
+        Two round-trips regardless of transcript size: one unnest() upsert for
+        all segments (returning their ids) and one for all words.
+        """
+        seg_idx, seg_start, seg_end, seg_text = [], [], [], []
+        for idx, (start, end, text) in enumerate(seg_rows or []):
+            seg_idx.append(int(idx))
+            seg_start.append(float(start))
+            seg_end.append(float(end))
+            seg_text.append(str(text))
+
+        words_by_seg = defaultdict(list)
+        for (s_idx, w_idx, w_start, w_end, token) in (word_rows or []):
+            words_by_seg[int(s_idx)].append(
+                (int(w_idx), float(w_start), float(w_end), str(token)))
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                seg_ids = await conn.fetch(
+                    """
+                    INSERT INTO transcript_segments
+                        (episode_id, seg_idx, start_s, end_s, text)
+                    SELECT $1, u.seg_idx, u.start_s, u.end_s, u.text
+                      FROM unnest($2::int[], $3::float8[], $4::float8[], $5::text[])
+                           AS u(seg_idx, start_s, end_s, text)
+                    ON CONFLICT (episode_id, seg_idx) DO UPDATE
+                        SET start_s = EXCLUDED.start_s,
+                            end_s   = EXCLUDED.end_s,
+                            text    = EXCLUDED.text
+                    RETURNING seg_idx, id
+                    """,
+                    episode_id, seg_idx, seg_start, seg_end, seg_text,
+                )
+
+                w_seg, w_idx, w_start, w_end, w_text = [], [], [], [], []
+                for r in seg_ids:
+                    for (widx, sw, ew, wtxt) in words_by_seg.get(r["seg_idx"], []):
+                        w_seg.append(r["id"])
+                        w_idx.append(widx)
+                        w_start.append(sw)
+                        w_end.append(ew)
+                        w_text.append(wtxt)
+
+                if w_seg:
+                    await conn.execute(
+                        """
+                        INSERT INTO transcript_words
+                            (seg_id, word_idx, start_s, end_s, word)
+                        SELECT * FROM unnest($1::bigint[], $2::int[], $3::float8[],
+                                             $4::float8[], $5::text[])
+                        ON CONFLICT (seg_id, word_idx) DO NOTHING
+                        """,
+                        w_seg, w_idx, w_start, w_end, w_text,
+                    )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,340 @@
+"""
+Decode episode audio straight from SFTP into memory.
+
+fetch_audio() opens the remote file with paramiko (pipelined prefetch), feeds
+it to an ffmpeg subprocess on stdin and gets back 16 kHz mono float32 PCM.
+Containers that need seeking to decode (MP4/M4A with the index at the end)
+and anything ffmpeg fails on from a pipe fall back to a tempfile (ASR_TMP_DIR,
+default system temp) that is deleted as soon as it is decoded.
+
+Decoding is its own stage: at most ASR_DECODERS ffmpeg processes run at once,
+independent of how many downloaders or model slots there are. When
+ASR_PCM_DIR is usable (default /dev/shm on Linux) ffmpeg writes the PCM into
+a file there and the caller gets a copy-on-write np.memmap of it, so samples
+are never copied through a pipe or the Python heap; CPU worker processes map
+the same file (pcm_ref) instead of receiving a pickled array. Call release()
+when done with the audio to delete the file. Without a PCM dir (e.g. Windows)
+PCM comes back over stdout into a regular array as before. The same happens
+when the PCM dir can't hold the episode (Docker gives /dev/shm 64 MB, under
+an hour of PCM): checked against the expected size up front, and an ffmpeg
+run that still fills the dir is redone into memory.
+
+fetch_audio() can fill a `timings` dict with download_s (until ffmpeg has
+read the last byte) and decode_s (waiting for a decoder slot plus decoding
+after the last byte), which transcribe.py records per episode.
+
+fetch_head() decodes just the start of a file from a partial read (language
+ID, langid.py) without downloading the rest.
+"""
+import io
+import os
+import glob
+import errno
+import shutil
+import tempfile
+import time
+import threading
+import subprocess
+
+import numpy as np
+
+from whisper_runtime import SAMPLE_RATE  # also puts FFMPEG_DIR on PATH
+
+FFMPEG = os.getenv("FFMPEG_BIN", "ffmpeg")
+TMP_DIR = os.getenv("ASR_TMP_DIR") or None
+PCM_DIR = os.getenv("ASR_PCM_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else "")
+MAX_DECODERS = int(os.getenv("ASR_DECODERS", str(min(4, os.cpu_count() or 1))))
+READ_BLOCK = 1 << 20
+HEAD_BYTES = int(float(os.getenv("ASR_HEAD_KB", "2048")) * 1024)  # partial read for fetch_head()
+PCM_PREFIX = "podscrape_pcm_"
+PCM_BYTES_PER_S = SAMPLE_RATE * 4
+PCM_PER_BYTE = PCM_BYTES_PER_S / 8000  # PCM per compressed byte when the length is unknown (64 kbit/s)
+
+# moov atom may sit at the end of the file; ffmpeg can't read these from a pipe
+SEEK_EXTS = {".m4a", ".m4b", ".mp4", ".mov", ".3gp"}
+
+_decode_slots = threading.BoundedSemaphore(MAX_DECODERS)
+
+
+class AudioDecodeError(RuntimeError):
+    pass
+
+
+def _ffmpeg_cmd(src: str, dst: str = "pipe:1", seconds: float = None):
+    limit = ["-t", str(seconds)] if seconds else []
+    return [FFMPEG, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", src, "-vn", *limit, "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), dst]
+
+
+# ---------------- PCM files ----------------
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def purge_stale_pcm():
+    """Delete PCM files left behind by processes that no longer exist."""
+    if not PCM_DIR:
+        return
+    for path in glob.glob(os.path.join(PCM_DIR, PCM_PREFIX + "*.f32")):
+        try:
+            pid = int(os.path.basename(path)[len(PCM_PREFIX):].split("_", 1)[0])
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _map_pcm(path: str, offset: int = 0, length: int = None) -> np.ndarray:
+    if length is None:
+        length = os.path.getsize(path) // 4 - offset
+    if length <= 0:
+        return np.zeros(0, dtype=np.float32)
+    # "c": copy-on-write, so a model that scribbles on its input can't corrupt the file
+    return np.memmap(path, dtype=np.float32, mode="c", offset=offset * 4, shape=(length,))
+
+
+def pcm_ref(audio):
+    """(path, start_sample, n_samples) if `audio` (or a slice of it) is a PCM-file map, else None."""
+    if not isinstance(audio, np.memmap) or audio.ndim != 1 or audio.strides != (4,):
+        return None
+    root = audio
+    while isinstance(root.base, np.memmap):
+        root = root.base
+    if not getattr(root, "filename", None):
+        return None
+    start = (audio.__array_interface__["data"][0] - root.__array_interface__["data"][0]) // 4
+    return root.filename, int(root.offset // 4 + start), len(audio)
+
+
+def open_pcm_ref(ref) -> np.ndarray:
+    """Map a pcm_ref() triple (used by CPU worker processes)."""
+    path, start, length = ref
+    return _map_pcm(path, start, length)
+
+
+def release(audio):
+    """Delete the PCM file behind `audio`, if any. Existing maps stay valid until dropped."""
+    ref = pcm_ref(audio)
+    if ref:
+        try:
+            os.remove(ref[0])
+        except OSError:
+            pass
+
+
+# ---------------- decoding ----------------
+
+def _add_time(timings, key: str, seconds: float):
+    if timings is not None:
+        timings[key] = timings.get(key, 0.0) + seconds
+
+
+def _pcm_room(expect_bytes) -> bool:
+    """Whether ASR_PCM_DIR can take expect_bytes of PCM (10% to spare); unknown sizes get a try."""
+    if not expect_bytes:
+        return True
+    try:
+        return shutil.disk_usage(PCM_DIR).free >= expect_bytes * 1.1
+    except OSError:
+        return False
+
+
+def _out_of_space(e) -> bool:
+    return getattr(e, "errno", None) == errno.ENOSPC or "No space left on device" in str(e)
+
+
+def _rewind(fileobj) -> bool:
+    """Back to the start of fileobj for a second ffmpeg run (True with no fileobj)."""
+    if fileobj is None:
+        return True
+    try:
+        fileobj.seek(0)
+        return True
+    except Exception:
+        return False
+
+
+def _remove(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _run_ffmpeg(src: str, fileobj=None, seconds: float = None, to_file: bool = True,
+                timings=None, expect_bytes: float = None) -> np.ndarray:
+    """
+    Run ffmpeg on `src` ("pipe:0" to feed it fileobj); return PCM as float32,
+    at most `seconds` of it. to_file=False keeps small outputs off ASR_PCM_DIR;
+    so does an expect_bytes (PCM size estimate) the dir has no room for.
+    """
+    t0 = time.monotonic()
+    with _decode_slots:
+        _add_time(timings, "decode_s", time.monotonic() - t0)
+        out_path = None
+        if PCM_DIR and to_file:
+            if _pcm_room(expect_bytes):
+                try:
+                    fd, out_path = tempfile.mkstemp(prefix=f"{PCM_PREFIX}{os.getpid()}_",
+                                                    suffix=".f32", dir=PCM_DIR)
+                    os.close(fd)
+                except OSError as e:
+                    print(f"[audio] can't create PCM file in {PCM_DIR} ({e}); decoding into memory")
+            else:
+                print(f"[audio] no room in {PCM_DIR} for ~{expect_bytes / 2**20:.0f} MB of PCM; "
+                      f"decoding into memory")
+        try:
+            buf = _ffmpeg_to(src, fileobj, out_path, seconds, timings)
+        except BaseException as e:
+            _remove(out_path)
+            if not (out_path and _out_of_space(e) and _rewind(fileobj)):
+                raise
+            print(f"[audio] {PCM_DIR} filled up; decoding into memory instead")
+            out_path = None
+            buf = _ffmpeg_to(src, fileobj, None, seconds, timings)
+    if out_path:
+        audio = _map_pcm(out_path)
+        if not len(audio):
+            os.remove(out_path)
+        return audio
+    usable = len(buf) - len(buf) % 4
+    return np.frombuffer(buf, dtype=np.float32, count=usable // 4)
+
+
+def _ffmpeg_to(src: str, fileobj, out_path, seconds: float = None, timings=None):
+    """ffmpeg src → out_path (returns None) or → stdout (returns the bytes)."""
+    t_start = time.monotonic()
+    fed_at = []
+    proc = subprocess.Popen(
+        _ffmpeg_cmd(src, out_path or "pipe:1", seconds),
+        stdin=subprocess.PIPE if fileobj is not None else subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL if out_path else subprocess.PIPE,
+        stderr=subprocess.PIPE)
+
+    errors, feed_error = [], []
+
+    def drain_stderr():
+        errors.append(proc.stderr.read())
+
+    def feed():
+        try:
+            while True:
+                block = fileobj.read(READ_BLOCK)
+                if not block:
+                    break
+                proc.stdin.write(block)
+        except BrokenPipeError:
+            pass  # ffmpeg quit early; its exit code tells us why
+        except Exception as e:
+            feed_error.append(e)
+        finally:
+            fed_at.append(time.monotonic())
+            try:
+                proc.stdin.close()
+            except Exception:
+                pass
+
+    threads = [threading.Thread(target=drain_stderr, daemon=True)]
+    if fileobj is not None:
+        threads.append(threading.Thread(target=feed, daemon=True))
+    for t in threads:
+        t.start()
+
+    buf = None if out_path else bytearray()
+    try:
+        while buf is not None:
+            chunk = proc.stdout.read(READ_BLOCK)
+            if not chunk:
+                break
+            buf += chunk
+    finally:
+        proc.wait()
+        for t in threads:
+            t.join()
+    t_end = time.monotonic()
+    t_fed = fed_at[0] if fed_at else t_start
+    _add_time(timings, "download_s", t_fed - t_start)
+    _add_time(timings, "decode_s", t_end - t_fed)
+
+    if feed_error:
+        raise feed_error[0]
+    if proc.returncode != 0:
+        msg = b"".join(errors).decode(errors="replace").strip()
+        raise AudioDecodeError(f"ffmpeg exited {proc.returncode}: {msg[-500:]}")
+    return buf
+
+
+def decode_file(path: str, timings=None, expect_bytes: float = None) -> np.ndarray:
+    if expect_bytes is None:
+        try:
+            expect_bytes = os.path.getsize(path) * PCM_PER_BYTE
+        except OSError:
+            pass
+    return _run_ffmpeg(str(path), timings=timings, expect_bytes=expect_bytes)
+
+
+def _decode_via_tempfile(sftp, remote_path: str, timings=None, expect_bytes: float = None) -> np.ndarray:
+    ext = os.path.splitext(remote_path)[1].lower()
+    fd, tmp = tempfile.mkstemp(prefix="podscrape_", suffix=ext, dir=TMP_DIR)
+    try:
+        t0 = time.monotonic()
+        with os.fdopen(fd, "wb") as dst:
+            sftp.sftp.getfo(remote_path, dst)
+        _add_time(timings, "download_s", time.monotonic() - t0)
+        return decode_file(tmp, timings, expect_bytes)
+    finally:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def fetch_audio(sftp, remote_path: str, timings=None, expected_s: float = None) -> np.ndarray:
+    """
+    Decoded 16 kHz mono float32 audio for a remote file (raises if missing).
+    expected_s (e.g. the feed's duration) sizes the PCM up front; without it
+    the size is guessed from the file size.
+    """
+    size = sftp.sftp.stat(remote_path).st_size  # raise if missing
+    expect_bytes = expected_s * PCM_BYTES_PER_S if expected_s else size * PCM_PER_BYTE
+    ext = os.path.splitext(remote_path)[1].lower()
+    if ext not in SEEK_EXTS:
+        try:
+            with sftp.sftp.open(remote_path, "rb") as f:
+                f.prefetch(size)
+                audio = _run_ffmpeg("pipe:0", f, timings=timings, expect_bytes=expect_bytes)
+            if len(audio):
+                return audio
+            print(f"[audio] {remote_path}: no samples from pipe; retrying via temp file")
+        except AudioDecodeError as e:
+            print(f"[audio] {remote_path}: {e}; retrying via temp file")
+    return _decode_via_tempfile(sftp, remote_path, timings, expect_bytes)
+
+
+def fetch_head(sftp, remote_path: str, seconds: float = 30.0, max_bytes: int = HEAD_BYTES):
+    """
+    First `seconds` of decoded audio from a partial read of at most max_bytes,
+    or None when the head alone doesn't decode (MP4 with its index at the end,
+    bitrate too high for max_bytes to hold anything).
+    """
+    if os.path.splitext(remote_path)[1].lower() in SEEK_EXTS:
+        return None
+    with sftp.sftp.open(remote_path, "rb") as f:
+        f.prefetch(min(f.stat().st_size, max_bytes))  # pipelined reads of just the head
+        head = f.read(max_bytes)
+    try:
+        audio = _run_ffmpeg("pipe:0", io.BytesIO(head), seconds=seconds, to_file=False)
+    except AudioDecodeError:
+        return None
+    return audio if len(audio) else None
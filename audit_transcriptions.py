@@ -5,8 +5,8 @@ Quick sanity checks for transcription recency + data health.
 What it checks:
 1) Counts: total episodes, done-by-timestamp, done-by-status, done-with-null-timestamp.
 2) Nth-most-recent sanity: fetches nth rows directly from DB; verifies uniqueness across a range.
-3) Transcript lengths: summarizes per-episode transcript duration (sum(end_s - start_s))
-   and flags suspicious masses of zero/identical durations.
+3) Transcript lengths: summarizes per-episode transcript duration (episodes.transcript_duration_s,
+   i.e. max(end_s) - min(start_s)) and flags suspicious masses of zero/identical durations.
 4) Cross-check: episodes marked done but missing segments.
 
 Usage:
@@ -118,7 +118,8 @@ def audit_nth(conn, max_n=300):
 
 def audit_transcript_lengths(conn):
     """
-    Summarize per-episode duration = sum(end_s - start_s) from transcript_segments.
+    Summarize per-episode duration from the summary columns written by mark_done
+    (transcript_duration_s / segment_count) — no scan of transcript_segments.
     Flags episodes with no segments and large groups of identical durations.
     """
     print("\n=== Transcript length summary (seconds) ===")
@@ -126,12 +127,10 @@ def audit_transcript_lengths(conn):
         # lengths for completed episodes only
         cur.execute(
             """
-            SELECT e.id, COALESCE(SUM(GREATEST(0, s.end_s - s.start_s)), 0) AS duration_s,
-                   COUNT(s.*) AS seg_count
-              FROM episodes e
-         LEFT JOIN transcript_segments s ON s.episode_id = e.id
-             WHERE e.transcription_timestamp_completed IS NOT NULL
-          GROUP BY e.id
+            SELECT id, COALESCE(transcript_duration_s, 0) AS duration_s,
+                   segment_count AS seg_count
+              FROM episodes
+             WHERE transcription_timestamp_completed IS NOT NULL
             """
         )
         rows = cur.fetchall()
@@ -178,12 +177,10 @@ def audit_done_without_segments(conn):
     with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT e.id
-              FROM episodes e
-         LEFT JOIN transcript_segments s ON s.episode_id = e.id
-             WHERE e.transcription_timestamp_completed IS NOT NULL
-          GROUP BY e.id
-            HAVING COUNT(s.*) = 0
+            SELECT id
+              FROM episodes
+             WHERE transcription_timestamp_completed IS NOT NULL
+               AND segment_count = 0
             """
         )
         rows = cur.fetchall()
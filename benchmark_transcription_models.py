@@ -1,4 +1,4 @@
-from transcribe import get_word_level_model
+from whisper_runtime import get_word_level_model
 from db_client import get_db_client
 from sftp_client import get_sftp_client
 import random
@@ -36,12 +36,8 @@ def transcribe_test():
     episodes = random.sample(episodes, 50)
     print(f'transcribing {len(episodes)} episodes')
 
-    # 2. load models
+    # 2. Cut a random clip from each episode
     model_names = ["oa_base", "fw_base", "fw_tiny"]
-    models = [(model_name, *get_word_level_model(model_name))
-              for model_name in model_names]
-
-    # 3. Transcribe each episodes
     transcripts = []
     with get_sftp_client as sftp:
         for ep in episodes:
@@ -52,28 +48,15 @@ def transcribe_test():
             fd_clip, temp_path_clip = tempfile.mkstemp(
                 suffix=".mp3")  # make temp file for clip
             os.close(fd_clip)
-            # save from sftp to temp file
-            with open(temp_path, "wb") as dst:
-                sftp.getfo(remote_path, dst)
-
-            _ = extract_random_clip(temp_path, 15, temp_path_clip)
-
             try:
-                episode_transcripts = {}
+                # save from sftp to temp file
+                with open(temp_path, "wb") as dst:
+                    sftp.getfo(remote_path, dst)
+                _ = extract_random_clip(temp_path, 15, temp_path_clip)
                 # need to save this so these clips can be merged later
-                episode_transcripts['clip_path'] = temp_path_clip
-                episode_transcripts['transcripts'] = {}
-                for model_name, model, run_fn in models:
-                    segs, words = run_fn(
-                        model, episode_transcripts['clip_path'])
-                    text = " ".join(w[-1] for w in words)
-                    episode_transcripts['transcripts'][model_name] = text
-                transcripts.append(episode_transcripts)
+                transcripts.append({'clip_path': temp_path_clip, 'transcripts': {}})
             except Exception as e:
                 print('error occurred:', e)
-                # delete both files if error occurs
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
                 if os.path.exists(temp_path_clip):
                     os.remove(temp_path_clip)
             finally:
@@ -81,6 +64,18 @@ def transcribe_test():
                 if os.path.exists(temp_path):
                     os.remove(temp_path)
 
+    # 3. Transcribe every clip with one model at a time, so with ASR_MODEL_CACHE_MB
+    # set only the model in use stays loaded
+    for model_name in model_names:
+        model, run_fn = get_word_level_model(model_name)
+        for episode_transcripts in transcripts:
+            try:
+                segs, words = run_fn(model, episode_transcripts['clip_path'])
+                episode_transcripts['transcripts'][model_name] = " ".join(w[-1] for w in words)
+            except Exception as e:
+                print(f'error occurred ({model_name}):', e)
+        del model
+
     episode_clips = []
     for episode_transcripts in transcripts:
         clip_path = episode_transcripts['clip_path']
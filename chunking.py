@@ -0,0 +1,151 @@
+"""
+Windowed, checkpointed transcription of long episodes.
+
+Episodes of at least ASR_CHECKPOINT_MIN_S seconds are cut into windows of
+about ASR_WINDOW_S seconds. With VAD regions, each cut moves to the middle of
+the longest silence near the nominal point so no word is split. Every
+finished window is saved to transcript_checkpoints; a worker that reclaims
+the episode (lease expired, crash) loads those and only transcribes the rest.
+
+The plan is a pure function of (duration, VAD regions, settings), so any
+worker computes the same windows; a checkpoint is reused only if its bounds
+match the planned window. stitch() renumbers seg_idx across windows so the
+final (seg_rows, word_rows) is continuous, exactly like a single-pass run.
+
+Windows are independent, so with shards > 1 they double as intra-episode
+shards: up to `shards` of them run at once, each borrowing its own model
+slot (GPU instance or CPU process). Each window is decoded with
+ASR_SHARD_OVERLAP_S of extra audio before its cut for context; segments are
+then kept only if their midpoint falls inside the window, which removes the
+duplicates the overlap produces at every boundary.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from whisper_runtime import SAMPLE_RATE
+
+WINDOW_S = float(os.getenv("ASR_WINDOW_S", "600"))
+CHECKPOINT_MIN_S = float(os.getenv("ASR_CHECKPOINT_MIN_S", "1800"))  # 0 = never window
+CUT_SEARCH_S = 60.0  # how far from the nominal cut to look for silence
+OVERLAP_S = float(os.getenv("ASR_SHARD_OVERLAP_S", "1.0"))
+
+
+def _best_silence(regions, lo: float, hi: float):
+    """Middle of the longest non-speech stretch overlapping [lo, hi], or None."""
+    best, best_len = None, 0.0
+    prev_end = 0.0
+    for start, end in list(regions) + [(float("inf"), float("inf"))]:
+        gap_lo, gap_hi = max(prev_end, lo), min(start, hi)
+        if gap_hi - gap_lo > best_len:
+            best, best_len = (gap_lo + gap_hi) / 2, gap_hi - gap_lo
+        prev_end = max(prev_end, end)
+        if prev_end >= hi:
+            break
+    return best
+
+
+def plan_windows(duration_s: float, regions=None, window_s: float = WINDOW_S):
+    """[(start_s, end_s), ...] covering [0, duration_s] in ~window_s pieces."""
+    if duration_s <= window_s * 1.5:
+        return [(0.0, duration_s)]
+    cuts = [0.0]
+    while duration_s - cuts[-1] > window_s * 1.5:
+        nominal = cuts[-1] + window_s
+        search = min(CUT_SEARCH_S, window_s / 4)
+        cut = None
+        if regions:
+            cut = _best_silence(regions, nominal - search, nominal + search)
+        cuts.append(round(cut if cut is not None else nominal, 3))
+    return list(zip(cuts, cuts[1:] + [duration_s]))
+
+
+def clip_regions(regions, start_s: float, end_s: float):
+    """Speech regions inside [start_s, end_s], shifted to window time (None stays None)."""
+    if regions is None:
+        return None
+    out = []
+    for a, b in regions:
+        a, b = max(a, start_s), min(b, end_s)
+        if b > a:
+            out.append((a - start_s, b - start_s))
+    return out
+
+
+def _trim(segs, words, start_s: float, end_s: float, last: bool):
+    """Keep segments whose midpoint lies in [start_s, end_s) (closed at the episode end)."""
+    keep = {}
+    for i, (a, b, _) in enumerate(segs):
+        mid = (a + b) / 2
+        if start_s <= mid and (mid < end_s or (last and mid <= end_s)):
+            keep[i] = len(keep)
+    return ([segs[i] for i in keep],
+            [(keep[si], wi, a, b, w) for si, wi, a, b, w in words if si in keep])
+
+
+def transcribe_window(run_window, audio, start_s: float, end_s: float, regions=None,
+                      overlap_s: float = OVERLAP_S):
+    """
+    Run one window. run_window(audio_slice, regions) → (seg_rows, word_rows) in
+    window time; returned rows are shifted back onto the episode timeline and
+    trimmed to the window (the overlap before start_s is context only).
+    """
+    lo = max(0.0, start_s - overlap_s)
+    piece = audio[int(lo * SAMPLE_RATE):int(end_s * SAMPLE_RATE)]  # a view, not a copy
+    segs, words = run_window(piece, clip_regions(regions, lo, end_s))
+    segs = [(a + lo, b + lo, text) for a, b, text in segs]
+    words = [(si, wi, a + lo, b + lo, w) for si, wi, a, b, w in words]
+    return _trim(segs, words, start_s, end_s, last=end_s >= len(audio) / SAMPLE_RATE)
+
+
+def stitch(parts):
+    """[(seg_rows, word_rows), ...] in timeline order → one result with continuous seg_idx."""
+    seg_rows, word_rows = [], []
+    for segs, words in parts:
+        base = len(seg_rows)
+        seg_rows.extend(tuple(s) for s in segs)
+        word_rows.extend((base + si, wi, a, b, w) for si, wi, a, b, w in words)
+    return seg_rows, word_rows
+
+
+def _same_window(ckpt: dict, start_s: float, end_s: float) -> bool:
+    return abs(ckpt["start_s"] - start_s) < 1e-3 and abs(ckpt["end_s"] - end_s) < 1e-3
+
+
+def transcribe_checkpointed(db, episode_id: str, model_name: str, audio, regions,
+                            run_window, window_s: float = WINDOW_S, shards: int = 1):
+    """
+    Transcribe `audio` window by window, saving each to transcript_checkpoints
+    and skipping windows a previous attempt already finished. With shards > 1,
+    up to that many windows run concurrently (run_window must borrow its own
+    model slot per call).
+    """
+    windows = plan_windows(len(audio) / SAMPLE_RATE, regions, window_s)
+    saved = {c["window_idx"]: c for c in db.get_checkpoints(episode_id, model_name)}
+    db_lock = threading.Lock()  # one connection, possibly several shard threads
+
+    parts = {}
+    todo = []
+    for idx, (start, end) in enumerate(windows):
+        ckpt = saved.get(idx)
+        if ckpt is not None and _same_window(ckpt, start, end):
+            parts[idx] = (ckpt["seg_rows"], ckpt["word_rows"])
+        else:
+            todo.append((idx, start, end))
+    if len(todo) < len(windows):
+        print(f"[checkpoint] {episode_id}: resumed {len(windows) - len(todo)}/{len(windows)} windows")
+
+    def work(job):
+        idx, start, end = job
+        segs, words = transcribe_window(run_window, audio, start, end, regions)
+        with db_lock:
+            db.save_checkpoint(episode_id, model_name, idx, start, end, segs, words)
+        return idx, (segs, words)
+
+    if shards > 1 and len(todo) > 1:
+        print(f"[shards] {episode_id}: {len(todo)} windows across {min(shards, len(todo))} slots")
+        with ThreadPoolExecutor(max_workers=min(shards, len(todo))) as ex:
+            parts.update(ex.map(work, todo))
+    else:
+        parts.update(map(work, todo))
+    return stitch(parts[i] for i in range(len(windows)))
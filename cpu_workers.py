@@ -0,0 +1,368 @@
+"""
+Process-pool CPU transcription for many-core hosts (ASR_MODE=procs).
+
+Threads sharing one CTranslate2/torch model on CPU scale poorly (and
+whisper_runtime pins OMP_NUM_THREADS=1 at import). Here every worker is a
+separate process with its own model and its own thread budget, chosen so
+that procs x cpu_threads == cores. ProcessModelPool exposes the same
+acquire() interface as whisper_runtime.ModelPool, so transcribe.py's
+claim/download producer and worker threads stay unchanged: each worker
+thread borrows a process and ships it the audio over a Pipe (just a file
+reference when the audio is a /dev/shm PCM map, see audio_stream.py).
+
+The procs/threads split comes from ASR_PROCS / ASR_CPU_THREADS, or from a
+short calibration run (first CALIBRATION_S seconds of a real episode, each
+candidate split timed with all processes busy) that is recorded in
+ASR_CPU_TUNE_FILE and reused on later runs.
+
+Nothing heavy is imported at module level: spawned children must set their
+thread env vars before ctranslate2/torch load.
+"""
+import os
+import json
+import time
+import queue
+import socket
+import traceback
+import threading
+import multiprocessing as mp
+from contextlib import contextmanager
+
+CPU_TUNE_FILE = os.getenv("ASR_CPU_TUNE_FILE", "cpu_tuning.json")
+CALIBRATION_S = float(os.getenv("ASR_CALIBRATION_S", "60"))
+RETUNE = os.getenv("ASR_RETUNE") == "1"
+
+
+# ---------------- child process ----------------
+
+def _local_audio(audio):
+    """Map a ("pcm", ref) handle from _ship() back to an array; anything else passes through."""
+    if isinstance(audio, tuple) and audio and audio[0] == "pcm":
+        from audio_stream import open_pcm_ref
+        return open_pcm_ref(audio[1])
+    return audio
+
+
+def _proc_main(model_name: str, cpu_threads: int, conn):
+    # must happen before ctranslate2 / torch initialise their thread pools
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(cpu_threads)
+
+    import whisper_runtime
+    try:
+        model = whisper_runtime.MODELS[model_name]["build"](
+            device="cpu", cpu_threads=cpu_threads, num_workers=1)
+        if model_name.startswith("oa_"):
+            import torch
+            torch.set_num_threads(cpu_threads)
+        run_fn = whisper_runtime.MODELS[model_name]["word_runner"]
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+        return
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        op, payload = msg
+        try:
+            if op == "run":
+                audio, regions, language = payload
+                conn.send(("ok", run_fn(model, _local_audio(audio), regions=regions,
+                                        language=language)))
+            elif op == "calibrate":
+                audio, seconds = payload
+                audio = _local_audio(audio)
+                if not hasattr(audio, "shape"):
+                    audio = whisper_runtime.decode_audio(audio)
+                audio = audio[:int(seconds * whisper_runtime.SAMPLE_RATE)]
+                t0 = time.perf_counter()
+                run_fn(model, audio)
+                conn.send(("ok", (len(audio) / whisper_runtime.SAMPLE_RATE,
+                                  time.perf_counter() - t0)))
+            else:
+                conn.send(("error", f"unknown op {op!r}"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+
+
+# ---------------- parent side ----------------
+
+class _ProcHandle:
+    """One worker process plus its end of the Pipe."""
+
+    def __init__(self, idx: int, proc, conn):
+        self.idx = idx
+        self.proc = proc
+        self.conn = conn
+        self.dead = False
+
+    def call(self, op: str, payload):
+        try:
+            self.conn.send((op, payload))
+            status, result = self.conn.recv()
+        except (EOFError, OSError) as e:  # the child died (OOM kill, crash in CTranslate2)
+            self.dead = True
+            raise RuntimeError(f"[cpu proc {self.idx}] process died "
+                               f"(exit code {self.proc.exitcode}): {e!r}") from e
+        if status != "ok":
+            raise RuntimeError(f"[cpu proc {self.idx}] {result}")
+        return result
+
+
+def _ship(audio):
+    """
+    What to send over the Pipe: a ("pcm", (path, start, n)) handle when the audio
+    is a map of a PCM file (the child maps the same pages, nothing is copied),
+    otherwise the array/path itself.
+    """
+    from audio_stream import pcm_ref
+    ref = pcm_ref(audio)
+    return ("pcm", ref) if ref else audio
+
+
+def _run_remote(handle: _ProcHandle, audio, regions=None, language=None):
+    """run_fn handed out by ProcessModelPool.acquire(): same contract as the in-process runners."""
+    return handle.call("run", (_ship(audio), regions, language))
+
+
+class ProcessModelPool:
+    """
+    `procs` CPU worker processes, each with its own model and cpu_threads threads.
+        pool = ProcessModelPool("fw_base", procs=4, cpu_threads=8)
+        with pool.acquire() as (handle, run_fn):
+            segs, words = run_fn(handle, path)
+    """
+
+    def __init__(self, name: str, procs: int, cpu_threads: int):
+        self.name = name
+        self.procs = procs
+        self.cpu_threads = cpu_threads
+        self.slots = []
+        self.batch_fn = None  # batched decoding is a GPU win; each process runs one episode
+        self.device = "cpu"
+        self._free = queue.Queue()
+        self._live = procs  # slots with a working process
+        self._lock = threading.Lock()
+        self._ctx = mp.get_context("spawn")
+        for i in range(procs):
+            self.slots.append(self._spawn(i + 1))
+        try:
+            for h in self.slots:
+                self._wait_ready(h)
+                self._free.put(h)
+        except BaseException:
+            self.close()
+            raise
+
+    def _spawn(self, idx: int) -> _ProcHandle:
+        parent, child = self._ctx.Pipe()
+        p = self._ctx.Process(target=_proc_main, args=(self.name, self.cpu_threads, child),
+                              name=f"asr-cpu-{idx}", daemon=True)
+        p.start()
+        child.close()
+        return _ProcHandle(idx, p, parent)
+
+    def _wait_ready(self, h: _ProcHandle):
+        try:
+            status, info = h.conn.recv()
+        except EOFError:
+            h.proc.join(timeout=1)
+            status, info = "error", f"exited with code {h.proc.exitcode}"
+        if status != "ready":
+            raise RuntimeError(f"[cpu proc {h.idx}] failed to load {self.name}: {info}")
+
+    def _replace(self, h: _ProcHandle):
+        """A fresh process for a dead slot; None (slot dropped) if it can't start either."""
+        h.proc.join(timeout=1)
+        print(f"[cpu proc {h.idx}] died (exit code {h.proc.exitcode}); restarting it")
+        new = None
+        try:
+            new = self._spawn(h.idx)
+            self._wait_ready(new)
+        except Exception as e:
+            print(f"[cpu proc {h.idx}] restart failed, running with one process fewer: {e}")
+            if new is not None and new.proc.is_alive():
+                new.proc.terminate()
+            with self._lock:
+                self._live -= 1
+            return None
+        self.slots[h.idx - 1] = new
+        return new
+
+    @property
+    def size(self) -> int:
+        return len(self.slots)
+
+    def _get(self, timeout: float = None) -> _ProcHandle:
+        """Next free process; polls so waiters notice when every slot is gone."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not self._live:
+                raise RuntimeError(f"every {self.name} CPU worker process has died")
+            wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+            try:
+                return self._free.get(timeout=max(0.0, wait))
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        h = self._get(timeout)
+        try:
+            yield h, _run_remote
+        finally:
+            if h.dead or not h.proc.is_alive():
+                h = self._replace(h)  # don't hand a dead process to the next item
+            if h is not None:
+                self._free.put(h)
+
+    def calibrate(self, sample, seconds: float) -> float:
+        """
+        Run the sample (path or decoded array) on every process at once;
+        return audio-seconds per wall-second.
+        """
+        if hasattr(sample, "shape"):
+            from whisper_runtime import SAMPLE_RATE
+            sample = sample[:int(seconds * SAMPLE_RATE)]  # don't ship the whole episode
+        results = [None] * self.size
+
+        def one(i, h):
+            results[i] = h.call("calibrate", (_ship(sample), seconds))
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=one, args=(i, h)) for i, h in enumerate(self.slots)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        return sum(r[0] for r in results) / wall
+
+    def close(self):
+        for h in self.slots:
+            try:
+                h.conn.send(None)
+            except Exception:
+                pass
+        for h in self.slots:
+            h.proc.join(timeout=10)
+            if h.proc.is_alive():
+                h.proc.terminate()
+
+
+# ---------------- tuning ----------------
+
+def _cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def max_procs_for_memory(model_name: str) -> int:
+    """How many model copies fit in currently available RAM (keeps 20% headroom)."""
+    from whisper_runtime import MODELS
+    approx_mb = MODELS[model_name].get("approx_mb", 500)
+    try:
+        import psutil
+        avail_mb = psutil.virtual_memory().available / (1024 * 1024)
+    except Exception:
+        return _cores()
+    return max(1, int(avail_mb * 0.8 // approx_mb))
+
+
+def candidate_splits(cores: int, max_procs: int):
+    """(procs, cpu_threads) pairs using all cores, e.g. 16 → (1,16) (2,8) (4,4) (8,2) (16,1)."""
+    out = []
+    for procs in range(1, min(cores, max_procs) + 1):
+        if cores % procs == 0:
+            out.append((procs, cores // procs))
+    if not out or out[-1][0] < min(cores, max_procs):
+        procs = min(cores, max_procs)
+        out.append((procs, max(1, cores // procs)))
+    return out
+
+
+def _tune_key(model_name: str, cores: int) -> str:
+    return f"{socket.gethostname()}/{model_name}/{cores}"
+
+
+def load_tuning(model_name: str, cores: int):
+    if not os.path.exists(CPU_TUNE_FILE):
+        return None
+    with open(CPU_TUNE_FILE) as f:
+        return json.load(f).get(_tune_key(model_name, cores))
+
+
+def save_tuning(model_name: str, cores: int, record: dict):
+    data = {}
+    if os.path.exists(CPU_TUNE_FILE):
+        with open(CPU_TUNE_FILE) as f:
+            data = json.load(f)
+    data[_tune_key(model_name, cores)] = record
+    tmp = CPU_TUNE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, CPU_TUNE_FILE)
+
+
+def autotune(model_name: str, sample, cores: int = None):
+    """
+    Time each candidate split on `sample` (path or decoded audio) and return the fastest
+    (procs, cpu_threads). Candidates that fail (e.g. out of memory) are skipped.
+    """
+    cores = cores or _cores()
+    results = []
+    for procs, threads in candidate_splits(cores, max_procs_for_memory(model_name)):
+        pool = None
+        try:
+            pool = ProcessModelPool(model_name, procs, threads)
+            rate = pool.calibrate(sample, CALIBRATION_S)
+            results.append({"procs": procs, "cpu_threads": threads, "audio_s_per_s": round(rate, 2)})
+            print(f"[cpu tune] {procs} proc x {threads} threads → {rate:.1f} audio-s/s")
+        except Exception as e:
+            print(f"[cpu tune] {procs} proc x {threads} threads failed: {e}")
+        finally:
+            if pool:
+                pool.close()
+    if not results:
+        raise RuntimeError("CPU calibration failed for every process/thread split")
+    best = max(results, key=lambda r: r["audio_s_per_s"])
+    save_tuning(model_name, cores, {
+        "procs": best["procs"],
+        "cpu_threads": best["cpu_threads"],
+        "calibration_s": CALIBRATION_S,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    })
+    print(f"[cpu tune] chose {best['procs']} x {best['cpu_threads']} (saved to {CPU_TUNE_FILE})")
+    return best["procs"], best["cpu_threads"]
+
+
+def resolve_cpu_split(model_name: str, procs: int = 0, cpu_threads: int = 0, sample_fn=None):
+    """
+    Decide (procs, cpu_threads): explicit settings win, then a saved tuning for
+    this host/model/core count, then a fresh calibration on sample_fn()'s audio.
+    """
+    cores = _cores()
+    if procs and cpu_threads:
+        return procs, cpu_threads
+    if procs:
+        return procs, max(1, cores // procs)
+    if cpu_threads:
+        return max(1, cores // cpu_threads), cpu_threads
+    saved = None if RETUNE else load_tuning(model_name, cores)
+    if saved:
+        return saved["procs"], saved["cpu_threads"]
+    sample = sample_fn() if sample_fn else None
+    if sample is None or not len(sample):
+        procs = min(max_procs_for_memory(model_name), max(1, cores // 4))
+        print(f"[cpu tune] no sample audio; defaulting to {procs} x {cores // procs}")
+        return procs, max(1, cores // procs)
+    return autotune(model_name, sample, cores)
@@ -1,7 +1,8 @@
 import os
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor, execute_values
-from datetime import datetime, timezone, timedelta
+from psycopg2.extras import RealDictCursor, execute_values, Json
+from datetime import datetime
 from email.utils import parsedate_to_datetime
 from collections import defaultdict
 from typing import Optional, Tuple
@@ -9,10 +10,61 @@ from dotenv import load_dotenv
 from contextlib import contextmanager
 from sshtunnel import SSHTunnelForwarder
 
+import db_stats
+
 
 load_dotenv()
 
-LEASE_MINUTES = 180  # how long eps are checked-out for transcription
+# How long eps are checked out for transcription: scaled to the episode's audio
+# length (ASR_LEASE_PER_AUDIO lease seconds per audio second), between
+# ASR_LEASE_FLOOR_MIN and ASR_LEASE_MIN minutes; unknown lengths get the maximum.
+# transcribe.py's heartbeat extends by the same amount while it works.
+LEASE_MINUTES = float(os.getenv("ASR_LEASE_MIN", "180"))
+LEASE_FLOOR_MINUTES = float(os.getenv("ASR_LEASE_FLOOR_MIN", "20"))
+LEASE_PER_AUDIO_S = float(os.getenv("ASR_LEASE_PER_AUDIO", "1.0"))
+
+
+def lease_minutes(audio_s: Optional[float] = None) -> float:
+    """Lease length for an episode of audio_s seconds (same rule as claim_episodes)."""
+    if audio_s is None:
+        return LEASE_MINUTES
+    return max(LEASE_FLOOR_MINUTES, min(LEASE_MINUTES, audio_s * LEASE_PER_AUDIO_S / 60))
+
+# claim order: episodes.priority first, then round-robin across podcasts
+# (fair_seq = position within its podcast and priority, set by resequence_claims),
+# newest first within a turn. Must match episodes_claim_idx.
+CLAIM_ORDER = "priority DESC, fair_seq, date_entered DESC"
+
+# per-episode pipeline stages timed by transcribe.py (transcription_runs.<stage>_s)
+RUN_STAGES = ("claim", "queue", "download", "decode", "inference", "db_write", "finalize")
+
+# transcript summary columns are computed from this episode's rows only
+# (seg_time_idx / transcript_words PK), in the same UPDATE that marks it done.
+# With a worker_id it only touches an episode that worker still holds: a late
+# result from an expired lease mustn't finish one another worker re-claimed.
+MARK_DONE_SQL = """
+    UPDATE episodes e
+       SET transcript_status = 'done',
+           worker_id = NULL,
+           lease_expires_at = NULL,
+           transcription_timestamp_completed = NOW(),
+           segment_count = s.segment_count,
+           word_count = s.word_count,
+           transcript_duration_s = s.transcript_duration_s,
+           audio_duration_s = COALESCE(%(audio_duration_s)s, e.audio_duration_s),
+           transcript_model = COALESCE(%(model)s, e.transcript_model),
+           language = COALESCE(%(language)s, e.language)
+      FROM (
+            SELECT COUNT(*) AS segment_count,
+                   COALESCE(SUM((SELECT COUNT(*) FROM transcript_words w
+                                  WHERE w.seg_id = ts.id)), 0) AS word_count,
+                   COALESCE(MAX(ts.end_s) - MIN(ts.start_s), 0) AS transcript_duration_s
+              FROM transcript_segments ts
+             WHERE ts.episode_id = %(episode_id)s
+           ) s
+     WHERE e.id = %(episode_id)s
+       AND (%(worker_id)s::text IS NULL OR e.worker_id = %(worker_id)s)
+"""
 
 @contextmanager
 def get_db_client():
@@ -77,6 +129,20 @@ def load_credentials_from_env(credential_map: dict) -> dict:
     return loaded_credentials
 
 
+def parse_pub_date(pub_dt):
+    """Parse an RSS pubDate robustly (datetime passthrough, RFC 2822, then strptime)."""
+    if isinstance(pub_dt, datetime):
+        return pub_dt
+    if not pub_dt:
+        return None
+    # Try RFC 2822 (common in RSS) first, then your original format
+    try:
+        return parsedate_to_datetime(pub_dt)
+    except Exception:
+        return datetime.strptime(pub_dt, '%a, %d %b %Y %H:%M:%S %z')
+
+
+@db_stats.instrument
 class DBClient:
     """
     usage should generally be:
@@ -91,7 +157,8 @@ class DBClient:
             user=user,
             password=password,
             host=host,
-            port=port
+            port=port,
+            **db_stats.connect_kwargs()
         )
 
     def close(self):
@@ -104,7 +171,10 @@ class DBClient:
                     id           SERIAL PRIMARY KEY,
                     date_entered TIMESTAMP DEFAULT current_timestamp,
                     title        TEXT NOT NULL,
-                    rss_url      TEXT
+                    rss_url      TEXT,
+                    priority     INT NOT NULL DEFAULT 0,  -- routing.py: higher = more accurate model
+                    language       TEXT,                  -- langid.py: detected feed language
+                    language_votes INT NOT NULL DEFAULT 0 -- consecutive episodes agreeing
                     );
              """)
             cur.execute("""
@@ -119,10 +189,21 @@ class DBClient:
                     pub_date          TIMESTAMP,
                     download_url      TEXT,
                     podcast_id        INTEGER REFERENCES podcasts(id),
-                    transcript_status TEXT NOT NULL DEFAULT 'pending',      -- 'pending' | 'processing' | 'done' | 'failed'
+                    transcript_status TEXT NOT NULL DEFAULT 'pending',      -- 'pending' | 'processing' | 'done' | 'failed' | 'skipped'
                     lease_expires_at  TIMESTAMPTZ,
                     worker_id         TEXT,
-                    transcription_timestamp_completed TIMESTAMPTZ
+                    transcription_timestamp_completed TIMESTAMPTZ,
+                    -- transcript summary, filled by mark_done()
+                    segment_count         INT NOT NULL DEFAULT 0,
+                    word_count            INT NOT NULL DEFAULT 0,
+                    transcript_duration_s NUMERIC,            -- max(end_s) - min(start_s)
+                    audio_duration_s      NUMERIC,            -- decoded audio length
+                    transcript_model      TEXT,               -- whisper_runtime.MODELS key
+                    language              TEXT,               -- detected / transcribed language
+                    -- claim order (claim_episodes): priority, then fair_seq round-robin
+                    priority              INT NOT NULL DEFAULT 0,  -- higher = claimed first
+                    relevance_score       REAL,               -- keyword relevance, set_relevance()
+                    fair_seq              INT                 -- resequence_claims(); NULL = last
                 );
             """)
             cur.execute("""
@@ -162,6 +243,50 @@ class DBClient:
                     ON episodes
                     USING GIN (to_tsvector('english', replace(description, '''', '')));
             """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS transcript_checkpoints (
+                    episode_id  TEXT REFERENCES episodes(id) ON DELETE CASCADE,
+                    window_idx  INT,                -- position in chunking.plan_windows()
+                    model       TEXT NOT NULL,
+                    start_s     NUMERIC NOT NULL,   -- window bounds on the episode timeline
+                    end_s       NUMERIC NOT NULL,
+                    seg_rows    JSONB NOT NULL,     -- [[start_s, end_s, text], ...]
+                    word_rows   JSONB NOT NULL,     -- [[seg_idx, word_idx, start_s, end_s, word], ...]
+                    created_at  TIMESTAMPTZ DEFAULT NOW(),
+                    PRIMARY KEY (episode_id, window_idx)
+                );
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS transcription_runs (
+                    id           BIGSERIAL PRIMARY KEY,
+                    episode_id   TEXT REFERENCES episodes(id) ON DELETE CASCADE,
+                    worker_id    TEXT NOT NULL,
+                    model        TEXT,
+                    device       TEXT,
+                    status       TEXT NOT NULL,      -- 'done' | 'failed'
+                    audio_s      REAL,
+                    claim_s      REAL,               -- share of the claim query
+                    queue_s      REAL,               -- fetched, waiting for a worker
+                    download_s   REAL,
+                    decode_s     REAL,
+                    inference_s  REAL,               -- VAD + model, share of a batched run
+                    db_write_s   REAL,               -- word_level_insert
+                    finalize_s   REAL,               -- mark_done + checkpoint cleanup
+                    rtf          REAL,               -- inference_s / audio_s
+                    queue_depth  INT,                -- items fetched ahead when this one was taken
+                    finished_at  TIMESTAMPTZ DEFAULT NOW()
+                );
+                CREATE INDEX IF NOT EXISTS transcription_runs_worker_idx
+                    ON transcription_runs (worker_id, finished_at);
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id    TEXT PRIMARY KEY,
+                    throughput   REAL,               -- audio s transcribed per wall s (prefetch.py)
+                    slots        INT,                -- transcribe threads
+                    updated_at   TIMESTAMPTZ DEFAULT NOW()
+                );
+            """)
             cur.execute(
                 '''CREATE INDEX IF NOT EXISTS title_ts_idx ON episodes USING GIN (title_ts);''')
             cur.execute(
@@ -171,6 +296,16 @@ class DBClient:
             cur.execute(
                 '''CREATE INDEX IF NOT EXISTS episodes_transcribe_queue_idx
                     ON episodes (transcript_status, lease_expires_at)''')
+            cur.execute(
+                f'''CREATE INDEX IF NOT EXISTS episodes_claim_idx
+                    ON episodes ({CLAIM_ORDER})
+                    WHERE transcript_status IN ('pending', 'processing')''')
+            cur.execute(
+                '''CREATE INDEX IF NOT EXISTS episodes_with_transcript_idx
+                    ON episodes (pub_date DESC NULLS LAST) WHERE segment_count > 0''')
+            cur.execute(
+                '''CREATE INDEX IF NOT EXISTS episodes_no_transcript_idx
+                    ON episodes (pub_date DESC NULLS LAST) WHERE segment_count = 0''')
         self.conn.commit()
 
     def insert_episode(self, episode_data):
@@ -196,18 +331,7 @@ class DBClient:
                 )
                 podcast_id = cur.fetchone()[0]
 
-            # Parse pubDate robustly
-            pub_dt = episode_data.get('pubDate')
-            if isinstance(pub_dt, datetime):
-                pub_date = pub_dt
-            else:
-                # Try RFC 2822 (common in RSS) first, then your original format
-                try:
-                    pub_date = parsedate_to_datetime(pub_dt) if pub_dt else None
-                except Exception:
-                    pub_date = datetime.strptime(
-                        pub_dt, '%a, %d %b %Y %H:%M:%S %z'
-                    ) if pub_dt else None
+            pub_date = parse_pub_date(episode_data.get('pubDate'))
 
             # Prepare fields
             ep_id       = episode_data['unique_id']
@@ -263,24 +387,20 @@ class DBClient:
     def get_episodes_with_no_transcript(self):
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT e.*, COUNT(s.id) AS segment_count
-                FROM episodes e
-                LEFT JOIN transcript_segments s ON e.id = s.episode_id
-                GROUP BY e.id
-                HAVING COUNT(s.id) = 0
-                ORDER BY e.pub_date DESC NULLS LAST
+                SELECT *
+                FROM episodes
+                WHERE segment_count = 0
+                ORDER BY pub_date DESC NULLS LAST
             """)
             return cur.fetchall()
 
     def get_episodes_with_transcript(self):
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT e.*, COUNT(s.id) AS segment_count
-                FROM episodes e
-                LEFT JOIN transcript_segments s ON e.id = s.episode_id
-                GROUP BY e.id
-                HAVING COUNT(s.id) > 0
-                ORDER BY e.pub_date DESC NULLS LAST
+                SELECT *
+                FROM episodes
+                WHERE segment_count > 0
+                ORDER BY pub_date DESC NULLS LAST
             """)
             return cur.fetchall()
 
@@ -405,6 +525,278 @@ class DBClient:
 
         self.conn.commit()
         
+    def write_transcripts(self, results, worker_id: Optional[str] = None) -> dict:
+        """
+        Store several finished episodes in one transaction: their segments and
+        words (same upsert semantics as word_level_insert, but one round trip
+        per table instead of one per segment), then mark_done and checkpoint
+        cleanup for each.
+
+        results: [{'episode_id', 'seg_rows', 'word_rows', 'audio_duration_s',
+                   'model', 'language'}, ...] with distinct episode ids.
+        Returns {'db_write_s', 'finalize_s', 'lost'} for the whole batch. With
+        a worker_id, episodes that worker no longer holds (lease expired and
+        re-claimed, or already finished) are left untouched and listed in
+        'lost'. Raises ValueError, writing nothing, if a word row names a
+        seg_idx its episode has no segment for.
+        """
+        seg_rows, word_rows = [], []
+        for r in results:
+            eid = r["episode_id"]
+            seg_rows.extend((eid, int(idx), float(start), float(end), str(text))
+                            for idx, (start, end, text) in enumerate(r["seg_rows"] or []))
+            word_rows.extend((eid, int(si), int(wi), float(ws), float(we), str(w))
+                             for si, wi, ws, we, w in (r["word_rows"] or []))
+        seg_keys = {(eid, idx) for eid, idx, *_ in seg_rows}
+        orphans = sorted({(eid, si) for eid, si, *_ in word_rows if (eid, si) not in seg_keys})
+        if orphans:
+            raise ValueError(f"{len(orphans)} word segment(s) have no segment row: "
+                             + ", ".join(f"{eid}#{si}" for eid, si in orphans[:10]))
+
+        t0 = time.monotonic()
+        lost = []
+        with self.conn:
+            with self.conn.cursor() as cur:
+                if worker_id is not None:
+                    # lock the rows still ours so no one re-claims them mid-write
+                    cur.execute("""
+                        SELECT id FROM episodes
+                         WHERE id = ANY(%s) AND worker_id = %s
+                           AND transcript_status = 'processing'
+                           FOR UPDATE
+                    """, ([r["episode_id"] for r in results], worker_id))
+                    held = {row[0] for row in cur.fetchall()}
+                    lost = [r["episode_id"] for r in results if r["episode_id"] not in held]
+                    if lost:
+                        results = [r for r in results if r["episode_id"] in held]
+                        seg_rows = [row for row in seg_rows if row[0] in held]
+                        word_rows = [row for row in word_rows if row[0] in held]
+                seg_ids = {}
+                if seg_rows:
+                    returned = execute_values(cur, """
+                        INSERT INTO transcript_segments (episode_id, seg_idx, start_s, end_s, text)
+                        VALUES %s
+                        ON CONFLICT (episode_id, seg_idx) DO UPDATE
+                            SET start_s = EXCLUDED.start_s,
+                                end_s   = EXCLUDED.end_s,
+                                text    = EXCLUDED.text
+                        RETURNING episode_id, seg_idx, id
+                    """, seg_rows, page_size=1000, fetch=True)
+                    seg_ids = {(eid, idx): sid for eid, idx, sid in returned}
+                if word_rows:
+                    execute_values(cur, """
+                        INSERT INTO transcript_words (seg_id, word_idx, start_s, end_s, word)
+                        VALUES %s
+                        ON CONFLICT (seg_id, word_idx) DO NOTHING
+                    """, [(seg_ids[(eid, si)], wi, ws, we, w)
+                          for eid, si, wi, ws, we, w in word_rows], page_size=1000)
+                t1 = time.monotonic()
+                for r in results:
+                    cur.execute(MARK_DONE_SQL, {
+                        "audio_duration_s": (None if r.get("audio_duration_s") is None
+                                             else float(r["audio_duration_s"])),
+                        "model": r.get("model"),
+                        "language": r.get("language"),
+                        "episode_id": r["episode_id"],
+                        "worker_id": worker_id,
+                    })
+                cur.execute("DELETE FROM transcript_checkpoints WHERE episode_id = ANY(%s)",
+                            ([r["episode_id"] for r in results],))
+        t2 = time.monotonic()  # includes the commit
+        return {"db_write_s": t1 - t0, "finalize_s": t2 - t1, "lost": lost}
+
+    def get_episode_meta(self, episode_id: str) -> Optional[dict]:
+        """{'id','audio_path','podcast_id','duration_s'} for one episode, or None."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT id, audio_path, podcast_id, duration_s::float8 AS duration_s
+                  FROM episodes
+                 WHERE id = %s
+            """, (episode_id,))
+            row = cur.fetchone()
+        self.conn.commit()
+        return dict(row) if row else None
+
+    def backlog_stats(self) -> dict:
+        """
+        Untranscribed work: {'episodes', 'audio_s'}. Episodes without a known
+        length count as the average of those with one.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*),
+                       COALESCE(SUM(COALESCE(audio_duration_s, duration_s)), 0)::float8,
+                       COUNT(COALESCE(audio_duration_s, duration_s))
+                  FROM episodes
+                 WHERE transcript_status IN ('pending', 'processing')
+            """)
+            episodes, known_s, known_n = cur.fetchone()
+            avg_s = known_s / known_n if known_n else None
+            if avg_s is None:
+                cur.execute("""
+                    SELECT AVG(audio_duration_s)::float8 FROM episodes
+                     WHERE audio_duration_s IS NOT NULL
+                """)
+                avg_s = cur.fetchone()[0] or 3600.0
+        self.conn.commit()
+        return {"episodes": int(episodes),
+                "audio_s": known_s + (episodes - known_n) * avg_s}
+
+    def podcast_priorities(self) -> dict:
+        """{podcast_id: priority} for podcasts with a non-default priority."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT id, priority FROM podcasts WHERE priority <> 0")
+            rows = cur.fetchall()
+        self.conn.commit()
+        return {pid: prio for pid, prio in rows}
+
+    def resequence_claims(self) -> int:
+        """
+        Renumber fair_seq for unfinished episodes: 1, 2, 3… within each
+        (podcast, priority), most relevant then newest first. Claiming in
+        fair_seq order then takes one episode from every podcast before any
+        podcast's second, so a burst from one feed can't starve the rest.
+        Run after scraping (new episodes have NULL and wait at the back) and
+        after changing priorities. Returns the number of rows renumbered.
+        """
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE episodes e
+                       SET fair_seq = r.seq
+                      FROM (
+                        SELECT id,
+                               row_number() OVER (
+                                   PARTITION BY podcast_id, priority
+                                   ORDER BY relevance_score DESC NULLS LAST, date_entered DESC
+                               ) AS seq
+                          FROM episodes
+                         WHERE transcript_status IN ('pending', 'processing')
+                      ) r
+                     WHERE e.id = r.id
+                       AND e.fair_seq IS DISTINCT FROM r.seq
+                    """
+                )
+                return cur.rowcount
+
+    def set_relevance(self, keywords, min_score: float = 0.1, boost: int = 1) -> dict:
+        """
+        Score every episode's title + description against `keywords` (words or
+        phrases, any of which may match) into relevance_score (0..1, title
+        weighted above description). Unfinished episodes scoring at least
+        min_score are raised to priority `boost` (a higher priority set by
+        hand is kept). Returns {'scored', 'boosted'}.
+        """
+        terms = [k.replace('"', " ").strip() for k in keywords]
+        query = " or ".join(f'"{t}"' for t in terms if t)
+        if not query:
+            raise ValueError("no keywords")
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE episodes e
+                       SET relevance_score = r.score
+                      FROM (
+                        SELECT id,
+                               ts_rank_cd(
+                                   setweight(to_tsvector('english', COALESCE(title, '')), 'A')
+                                || setweight(to_tsvector('english', COALESCE(description, '')), 'B'),
+                                   websearch_to_tsquery('english', %s),
+                                   32  -- rank / (rank + 1)
+                               )::real AS score
+                          FROM episodes
+                      ) r
+                     WHERE e.id = r.id
+                       AND e.relevance_score IS DISTINCT FROM r.score
+                    """,
+                    (query,),
+                )
+                scored = cur.rowcount
+                cur.execute(
+                    """
+                    UPDATE episodes
+                       SET priority = %s
+                     WHERE transcript_status IN ('pending', 'processing')
+                       AND relevance_score >= %s
+                       AND priority < %s
+                    """,
+                    (boost, min_score, boost),
+                )
+                boosted = cur.rowcount
+        return {"scored": scored, "boosted": boosted}
+
+    def get_podcast_language(self, podcast_id: int):
+        """(language, votes) detected so far for a podcast; (None, 0) if none."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT language, language_votes FROM podcasts WHERE id = %s",
+                        (podcast_id,))
+            row = cur.fetchone()
+        self.conn.commit()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def record_podcast_language(self, podcast_id: int, language: str) -> int:
+        """
+        Count one more episode detected as `language`; a different language
+        restarts the count. Returns the podcast's vote count afterwards.
+        """
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE podcasts
+                       SET language_votes = CASE WHEN language = %(language)s
+                                                 THEN language_votes + 1 ELSE 1 END,
+                           language = %(language)s
+                     WHERE id = %(podcast_id)s
+                 RETURNING language_votes
+                    """,
+                    {"language": language, "podcast_id": podcast_id},
+                )
+                row = cur.fetchone()
+        return row[0] if row else 0
+
+    def get_checkpoints(self, episode_id: str, model: str):
+        """Finished windows for this episode/model: [{'window_idx','start_s','end_s','seg_rows','word_rows'}]."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT window_idx, start_s::float8 AS start_s, end_s::float8 AS end_s,
+                       seg_rows, word_rows
+                  FROM transcript_checkpoints
+                 WHERE episode_id = %s AND model = %s
+              ORDER BY window_idx
+            """, (episode_id, model))
+            rows = cur.fetchall()
+        self.conn.commit()
+        return rows
+
+    def save_checkpoint(self, episode_id: str, model: str, window_idx: int,
+                        start_s: float, end_s: float, seg_rows, word_rows):
+        """Persist one finished window (timestamps on the episode timeline, seg_idx local to the window)."""
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO transcript_checkpoints
+                        (episode_id, window_idx, model, start_s, end_s, seg_rows, word_rows)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (episode_id, window_idx) DO UPDATE
+                        SET model     = EXCLUDED.model,
+                            start_s   = EXCLUDED.start_s,
+                            end_s     = EXCLUDED.end_s,
+                            seg_rows  = EXCLUDED.seg_rows,
+                            word_rows = EXCLUDED.word_rows,
+                            created_at = NOW()
+                """, (episode_id, int(window_idx), model, float(start_s), float(end_s),
+                      Json([[float(a), float(b), str(t)] for a, b, t in seg_rows]),
+                      Json([[int(si), int(wi), float(a), float(b), str(w)]
+                            for si, wi, a, b, w in word_rows])))
+
+    def clear_checkpoints(self, episode_id: str):
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute("DELETE FROM transcript_checkpoints WHERE episode_id = %s", (episode_id,))
+
     def get_transcript_for_episode_audio_path(self, audio_path):
         with self.conn.cursor() as cur:
             cur.execute("""
@@ -430,15 +822,14 @@ class DBClient:
         """
         claim eps to transcribe them so as to prevent other transcribers from overlapping jobs
         Atomically claim up to batch_size 'pending' (or expired) episodes for this worker.
-        Uses SKIP LOCKED so concurrent workers don't collide.
+        Uses SKIP LOCKED so concurrent workers don't collide. Each lease is
+        scaled to the episode's known length (see lease_minutes).
+        Episodes come in CLAIM_ORDER, read straight off episodes_claim_idx.
         """
-        now = datetime.now(timezone.utc)
-        lease_until = now + timedelta(minutes=LEASE_MINUTES)
-
         with self.conn:
             with self.conn.cursor() as cur:
                 cur.execute(
-                    """
+                    f"""
                     WITH cte AS (
                       SELECT id
                         FROM episodes
@@ -448,60 +839,159 @@ class DBClient:
                             OR lease_expires_at IS NULL
                             OR lease_expires_at < NOW()
                          )
-                       ORDER BY date_entered DESC
+                       ORDER BY {CLAIM_ORDER}
                        FOR UPDATE SKIP LOCKED
                        LIMIT %s
                     )
                     UPDATE episodes e
                        SET transcript_status = 'processing',
                            worker_id = %s,
-                           lease_expires_at = %s
+                           lease_expires_at = NOW() + make_interval(secs => GREATEST(%s, LEAST(%s,
+                               COALESCE(e.audio_duration_s, e.duration_s)::float8 * %s)))
                       FROM cte
                      WHERE e.id = cte.id
                  RETURNING e.id
                     """,
-                    (batch_size, worker_id, lease_until),
+                    (batch_size, worker_id, LEASE_FLOOR_MINUTES * 60, LEASE_MINUTES * 60,
+                     LEASE_PER_AUDIO_S),
                 )
                 rows = cur.fetchall()
                 return [r[0] for r in rows]
 
-    def mark_done(self, episode_id: str):
+    def mark_done(self, episode_id: str, audio_duration_s: Optional[float] = None,
+                  model: Optional[str] = None, language: Optional[str] = None,
+                  worker_id: Optional[str] = None) -> bool:
+        """
+        Mark an episode done and, in the same statement, store its transcript
+        summary (segment/word counts, transcript span, audio length) and the
+        model and language that produced it, so reports never have to
+        aggregate transcript_segments/transcript_words. With a worker_id it's
+        a no-op unless that worker still holds the episode; returns whether
+        the row was updated.
+        """
         with self.conn:
             with self.conn.cursor() as cur:
-                cur.execute("""
+                cur.execute(MARK_DONE_SQL, {
+                    "audio_duration_s": None if audio_duration_s is None else float(audio_duration_s),
+                    "model": model,
+                    "language": language,
+                    "episode_id": episode_id,
+                    "worker_id": worker_id,
+                })
+                return cur.rowcount > 0
+
+    def mark_skipped(self, episode_id: str, language: Optional[str] = None,
+                     worker_id: Optional[str] = None):
+        """Release an episode that won't be transcribed (e.g. not a target language)."""
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
                     UPDATE episodes
-                       SET transcript_status = 'done',
+                       SET transcript_status = 'skipped',
                            worker_id = NULL,
                            lease_expires_at = NULL,
-                           transcription_timestamp_completed = NOW()
+                           language = COALESCE(%s, language)
                      WHERE id = %s
-                """, (episode_id,))
+                       AND (%s::text IS NULL OR worker_id = %s)
+                    """,
+                    (language, episode_id, worker_id, worker_id),
+                )
 
-    def mark_failed(self, episode_id: str, retry: bool = True):
+    def mark_failed(self, episode_id: str, retry: bool = True,
+                    worker_id: Optional[str] = None) -> bool:
+        """
+        Give an episode up: back to 'pending' (retry) or 'failed'. With a
+        worker_id only if that worker still holds it, so a late failure from
+        an expired lease can't reset an episode someone else has re-claimed.
+        Returns whether the row was updated.
+        """
         with self.conn:
             with self.conn.cursor() as cur:
-                if retry:
-                    cur.execute(
-                        """
-                        UPDATE episodes
-                           SET transcript_status = 'pending',
-                               worker_id = NULL,
-                               lease_expires_at = NULL
-                         WHERE id = %s
-                        """,
-                        (episode_id,),
-                    )
-                else:
-                    cur.execute(
-                        """
-                        UPDATE episodes
-                           SET transcript_status = 'failed',
-                               worker_id = NULL,
-                               lease_expires_at = NULL
-                         WHERE id = %s
-                        """,
-                        (episode_id,),
-                    )
+                cur.execute(
+                    """
+                    UPDATE episodes
+                       SET transcript_status = %s,
+                           worker_id = NULL,
+                           lease_expires_at = NULL
+                     WHERE id = %s
+                       AND (%s::text IS NULL OR worker_id = %s)
+                    """,
+                    ("pending" if retry else "failed", episode_id, worker_id, worker_id),
+                )
+                return cur.rowcount > 0
+
+    def release_leases(self, worker_id: str, episode_ids) -> int:
+        """
+        Hand claimed episodes back to the queue in one statement (shutdown).
+        Only episodes still 'processing' under this worker_id are touched, so
+        ones already done or re-claimed elsewhere stay as they are.
+        """
+        ids = list(episode_ids)
+        if not ids:
+            return 0
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE episodes
+                       SET transcript_status = 'pending',
+                           worker_id = NULL,
+                           lease_expires_at = NULL
+                     WHERE id = ANY(%s)
+                       AND worker_id = %s
+                       AND transcript_status = 'processing'
+                    """,
+                    (ids, worker_id),
+                )
+                return cur.rowcount
+
+    def reclaim_stale_leases(self, worker_id: str) -> int:
+        """
+        Startup: anything still 'processing' under this worker_id was left by a
+        previous run that crashed; put it back to 'pending' (its checkpoints stay,
+        so long episodes resume). Live leases are reset too, so only call this
+        for an id no running process can share (a pinned ASR_WORKER_ID).
+        """
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE episodes
+                       SET transcript_status = 'pending',
+                           worker_id = NULL,
+                           lease_expires_at = NULL
+                     WHERE worker_id = %s
+                       AND transcript_status = 'processing'
+                    """,
+                    (worker_id,),
+                )
+                return cur.rowcount
+
+    def extend_leases(self, worker_id: str, episode_ids) -> int:
+        """
+        Heartbeat: renew every lease this worker holds in one UPDATE, each by
+        its episode's lease length (same rule as claim_episodes). Episodes
+        finished or re-claimed elsewhere in the meantime are left alone.
+        """
+        ids = list(episode_ids)
+        if not ids:
+            return 0
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE episodes e
+                       SET lease_expires_at = NOW() + make_interval(secs => GREATEST(%s, LEAST(%s,
+                               COALESCE(e.audio_duration_s, e.duration_s)::float8 * %s)))
+                     WHERE e.id = ANY(%s)
+                       AND e.worker_id = %s
+                       AND e.transcript_status = 'processing'
+                    """,
+                    (LEASE_FLOOR_MINUTES * 60, LEASE_MINUTES * 60, LEASE_PER_AUDIO_S,
+                     ids, worker_id),
+                )
+                return cur.rowcount
 
     def extend_lease(self, episode_id: str, minutes: int = 30):
         with self.conn:
@@ -555,6 +1045,93 @@ class DBClient:
             })
         return {"pending_total": int(pending_total), "workers": rows}
 
+    def report_worker(self, worker_id: str, throughput: float, slots: int):
+        """Store this worker's measured throughput (sizes its claims, see prefetch.py)."""
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO workers (worker_id, throughput, slots, updated_at)
+                    VALUES (%s, %s, %s, NOW())
+                    ON CONFLICT (worker_id) DO UPDATE
+                       SET throughput = EXCLUDED.throughput,
+                           slots = EXCLUDED.slots,
+                           updated_at = NOW()
+                    """,
+                    (worker_id, float(throughput), slots),
+                )
+
+    def get_worker_throughput(self, worker_id: str) -> Optional[float]:
+        """Last throughput report_worker() stored for this worker, or None."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT throughput FROM workers WHERE worker_id = %s", (worker_id,))
+            row = cur.fetchone()
+        self.conn.commit()
+        return row[0] if row else None
+
+    def worker_throughputs(self) -> dict:
+        """{worker_id: {'throughput','slots','updated_at'}} for every worker that reported."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT worker_id, throughput, slots, updated_at FROM workers")
+            rows = cur.fetchall()
+        self.conn.commit()
+        return {r["worker_id"]: dict(r) for r in rows}
+
+    def record_run(self, run: dict):
+        """
+        Insert one transcription_runs row: run has episode_id, worker_id, model,
+        device, status, audio_s, queue_depth and <stage>_s for RUN_STAGES
+        (missing stages are stored as NULL).
+        """
+        self.record_runs([run])
+
+    def record_runs(self, runs):
+        """record_run() for several runs in one statement."""
+        cols = (["episode_id", "worker_id", "model", "device", "status", "audio_s", "queue_depth"]
+                + [f"{stage}_s" for stage in RUN_STAGES])
+        rows = []
+        for run in runs:
+            audio_s, inference_s = run.get("audio_s"), run.get("inference_s")
+            rtf = inference_s / audio_s if audio_s and inference_s is not None else None
+            rows.append(tuple(run.get(c) for c in cols) + (rtf,))
+        if not rows:
+            return
+        with self.conn:
+            with self.conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    f"INSERT INTO transcription_runs ({', '.join(cols)}, rtf) VALUES %s",
+                    rows,
+                )
+
+    def worker_run_stats(self, minutes: int = 15):
+        """
+        Per worker over the last `minutes`: runs, failures, audio hours, RTF
+        (inference / audio), latest queue depth, models/devices seen and the
+        summed seconds of every RUN_STAGES stage (key '<stage>_s').
+        """
+        stage_sums = ", ".join(f"COALESCE(SUM({st}_s), 0)::float8 AS {st}_s" for st in RUN_STAGES)
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT worker_id,
+                       COUNT(*) AS runs,
+                       COUNT(*) FILTER (WHERE status <> 'done') AS failed,
+                       COALESCE(SUM(audio_s), 0)::float8 AS audio_s,
+                       (SUM(inference_s) / NULLIF(SUM(audio_s) FILTER (WHERE inference_s IS NOT NULL), 0))::float8 AS rtf,
+                       (ARRAY_AGG(queue_depth ORDER BY finished_at DESC))[1] AS queue_depth,
+                       STRING_AGG(DISTINCT model, ',') AS models,
+                       STRING_AGG(DISTINCT device, ',') AS devices,
+                       MAX(finished_at) AS last_finished,
+                       {stage_sums}
+                  FROM transcription_runs
+                 WHERE finished_at > NOW() - (%s || ' minutes')::interval
+              GROUP BY worker_id
+              ORDER BY worker_id
+            """, (minutes,))
+            rows = [dict(r) for r in cur.fetchall()]
+        self.conn.commit()
+        return rows
+
     def nth_most_recent_transcription(self, n: int = 1) -> Optional[dict]:
         """
         Returns a dict with episode id, audio_path, and completion timestamp.
@@ -581,8 +1158,19 @@ class DBClient:
         """
         duration_s: (max end_s - min start_s) over segments (0 if none)
         word_count: count(*) from transcript_words joined to this episode
+        Read from the summary columns; recomputed only for episodes that
+        predate them (transcript_duration_s still NULL).
         """
         with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT transcript_duration_s, word_count
+                  FROM episodes
+                 WHERE id = %s
+            """, (episode_id,))
+            row = cur.fetchone()
+            if row and row[0] is not None:
+                return {"duration_s": float(row[0]), "word_count": int(row[1])}
+
             cur.execute("""
                 SELECT COALESCE(MIN(start_s),0), COALESCE(MAX(end_s),0)
                   FROM transcript_segments
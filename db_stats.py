@@ -0,0 +1,290 @@
+"""
+Low-overhead timing for DBClient.
+
+Enable with DB_STATS=1 (or call enable() before opening clients). When it is
+off nothing is wrapped and connections use the stock psycopg2 classes, so the
+cost is zero. When it is on:
+  * every public DBClient method records call count, errors, a latency
+    histogram, rows affected/returned and bytes of SQL sent
+  * every statement slower than DB_SLOW_QUERY_MS is printed with its SQL and
+    the *shape* of its parameters (types/lengths, never values)
+  * stats are dumped as JSON to DB_STATS_DIR/<host>-<pid>.json every
+    DB_STATS_DUMP_S seconds and at exit; `podscrape.py dbstats` merges them
+"""
+import os
+import re
+import json
+import time
+import socket
+import atexit
+import threading
+from functools import wraps
+
+import psycopg2.extensions
+
+ENABLED = False
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "1000"))
+DB_STATS_DIR = os.getenv("DB_STATS_DIR", "dbstats")
+DB_STATS_DUMP_S = float(os.getenv("DB_STATS_DUMP_S", "60"))
+
+# histogram upper bounds in ms; last bucket catches everything above
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_lock = threading.Lock()
+_stats = {}                      # method name -> dict
+_local = threading.local()       # .method = name of DBClient method running on this thread
+_classes = []                    # classes registered via instrument()
+_dumper = None
+
+
+def _new_entry():
+    return {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "rows": 0, "bytes": 0, "statements": 0,
+            "hist": [0] * (len(BUCKETS_MS) + 1)}
+
+
+def _bucket(ms: float) -> int:
+    for i, upper in enumerate(BUCKETS_MS):
+        if ms <= upper:
+            return i
+    return len(BUCKETS_MS)
+
+
+def record_call(name: str, ms: float, error: bool = False):
+    with _lock:
+        e = _stats.get(name)
+        if e is None:
+            e = _stats[name] = _new_entry()
+        e["calls"] += 1
+        e["errors"] += int(error)
+        e["total_ms"] += ms
+        e["max_ms"] = max(e["max_ms"], ms)
+        e["hist"][_bucket(ms)] += 1
+
+
+def record_statement(rows: int, nbytes: int):
+    name = getattr(_local, "method", None) or "(direct)"
+    with _lock:
+        e = _stats.get(name)
+        if e is None:
+            e = _stats[name] = _new_entry()
+        e["statements"] += 1
+        e["rows"] += max(0, rows)
+        e["bytes"] += nbytes
+
+
+def param_shape(params) -> str:
+    """Describe parameters without leaking values: (str, int, list[1200], ...)."""
+    def one(p):
+        if isinstance(p, (list, tuple, set)):
+            return f"{type(p).__name__}[{len(p)}]"
+        if isinstance(p, dict):
+            return f"dict[{len(p)}]"
+        if isinstance(p, (str, bytes)):
+            return f"{type(p).__name__}({len(p)})"
+        return type(p).__name__
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {one(v)}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(one(p) for p in params) + ")"
+
+
+def _log_slow(sql, params, ms: float):
+    sql_text = sql.decode(errors="replace") if isinstance(sql, bytes) else str(sql)
+    sql_text = re.sub(r"\s+", " ", sql_text).strip()
+    if len(sql_text) > 300:
+        sql_text = sql_text[:300] + "…"
+    method = getattr(_local, "method", None) or "(direct)"
+    print(f"[slow query] {ms:.0f} ms in {method}: {sql_text}  params={param_shape(params)}")
+
+
+# ---------------- cursor / connection hooks ----------------
+
+class _TimedCursorMixin:
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            record_statement(self.rowcount, len(self.query or b""))
+            if ms >= SLOW_QUERY_MS:
+                _log_slow(query, vars, ms)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            record_statement(self.rowcount, len(self.query or b""))
+            if ms >= SLOW_QUERY_MS:
+                _log_slow(query, [vars_list], ms)
+
+    def copy_expert(self, sql, file, size=8192):
+        t0 = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            record_statement(self.rowcount, len(sql))
+            if ms >= SLOW_QUERY_MS:
+                _log_slow(sql, None, ms)
+
+
+_timed_cursor_classes = {}
+
+
+def _timed_cursor_class(base):
+    cls = _timed_cursor_classes.get(base)
+    if cls is None:
+        cls = type("Timed" + base.__name__, (_TimedCursorMixin, base), {})
+        _timed_cursor_classes[base] = cls
+    return cls
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors (any cursor_factory) time their statements."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+def connect_kwargs() -> dict:
+    """Extra psycopg2.connect kwargs: empty when disabled."""
+    return {"connection_factory": InstrumentedConnection} if ENABLED else {}
+
+
+# ---------------- method wrapping ----------------
+
+def _wrap(name, fn):
+    @wraps(fn)
+    def timed(*args, **kwargs):
+        outer = getattr(_local, "method", None)
+        if outer is None:
+            _local.method = name
+        t0 = time.perf_counter()
+        error = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            if outer is None:
+                _local.method = None
+                # nested DBClient calls are attributed to the outermost method
+                record_call(name, (time.perf_counter() - t0) * 1000.0, error)
+    timed._db_stats_wrapped = True
+    return timed
+
+
+def _wrap_class(cls):
+    for attr, fn in list(vars(cls).items()):
+        if attr.startswith("_") or not callable(fn) or getattr(fn, "_db_stats_wrapped", False):
+            continue
+        setattr(cls, attr, _wrap(attr, fn))
+
+
+def instrument(cls):
+    """Class decorator: register cls so enable() wraps its public methods."""
+    _classes.append(cls)
+    if ENABLED:
+        _wrap_class(cls)
+    return cls
+
+
+def enable(dump_dir: str = None, dump_every_s: float = None):
+    """Turn instrumentation on for this process (affects connections opened afterwards)."""
+    global ENABLED, DB_STATS_DIR, DB_STATS_DUMP_S, _dumper
+    if dump_dir:
+        DB_STATS_DIR = dump_dir
+    if dump_every_s:
+        DB_STATS_DUMP_S = dump_every_s
+    if ENABLED:
+        return
+    ENABLED = True
+    for cls in _classes:
+        _wrap_class(cls)
+    if DB_STATS_DUMP_S > 0:
+        _dumper = threading.Thread(target=_dump_loop, daemon=True)
+        _dumper.start()
+    atexit.register(dump)
+
+
+# ---------------- export ----------------
+
+def snapshot() -> dict:
+    with _lock:
+        methods = {k: dict(v, hist=list(v["hist"])) for k, v in _stats.items()}
+    return {
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "written_at": time.time(),
+        "buckets_ms": list(BUCKETS_MS),
+        "methods": methods,
+    }
+
+
+def dump(path: str = None):
+    if not _stats:
+        return None
+    os.makedirs(DB_STATS_DIR, exist_ok=True)
+    path = path or os.path.join(DB_STATS_DIR, f"{socket.gethostname()}-{os.getpid()}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def _dump_loop():
+    while True:
+        time.sleep(DB_STATS_DUMP_S)
+        try:
+            dump()
+        except Exception as e:
+            print(f"[db_stats] dump failed: {e}")
+
+
+def load_dumps(dump_dir: str = None) -> dict:
+    """Merge every JSON dump in dump_dir into one {method: entry} dict."""
+    dump_dir = dump_dir or DB_STATS_DIR
+    merged = {}
+    if not os.path.isdir(dump_dir):
+        return merged
+    for fn in sorted(os.listdir(dump_dir)):
+        if not fn.endswith(".json"):
+            continue
+        with open(os.path.join(dump_dir, fn)) as f:
+            data = json.load(f)
+        for name, e in data.get("methods", {}).items():
+            m = merged.setdefault(name, _new_entry())
+            for k in ("calls", "errors", "total_ms", "rows", "bytes", "statements"):
+                m[k] += e.get(k, 0)
+            m["max_ms"] = max(m["max_ms"], e.get("max_ms", 0.0))
+            for i, c in enumerate(e.get("hist", [])[:len(m["hist"])]):
+                m["hist"][i] += c
+    return merged
+
+
+def percentile_ms(hist, q: float) -> float:
+    """Upper bound of the histogram bucket holding the q-quantile."""
+    total = sum(hist)
+    if not total:
+        return 0.0
+    target = q * total
+    seen = 0
+    for i, c in enumerate(hist):
+        seen += c
+        if seen >= target:
+            return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else float("inf")
+    return float("inf")
+
+
+if os.getenv("DB_STATS") == "1":
+    enable()
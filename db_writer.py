@@ -0,0 +1,252 @@
+"""
+Background writer for finished transcripts.
+
+Transcribe workers hand each result to DBWriter.submit() and go straight on to
+the next episode instead of waiting for the DB round trips (several seconds an
+episode over the SSH tunnel). One writer thread, with its own connection,
+takes up to ASR_WRITE_BATCH episodes at a time (waiting at most
+ASR_WRITE_LINGER_S for a batch to fill) and stores their segments, words and
+completion in one transaction (DBClient.write_transcripts).
+
+Memory is bounded: submit() blocks while more than ASR_WRITE_MAX_MB of rows,
+or ASR_WRITE_QUEUE episodes, are waiting, so a DB outage slows the workers
+down instead of piling up transcripts. A lost connection is reopened and the
+batch retried with backoff up to ASR_WRITE_RETRIES times; a batch that fails
+for any other reason is retried one episode at a time so a single bad
+transcript can't hold back the others. Episodes that still can't be stored
+are released for retry (mark_failed(retry=True)). Both are scoped to
+`worker_id`: an episode whose lease expired and was re-claimed elsewhere is
+neither written nor reset.
+
+An episode's lease is still this worker's until the writer has stored or
+released it: pending_ids() lists those episodes (queued or being written) so
+the lease heartbeat keeps renewing them and shutdown can hand back any left.
+
+    writer = DBWriter(worker_id)
+    writer.start()
+    writer.submit({"episode_id": ..., "seg_rows": ..., "word_rows": ...,
+                   "audio_duration_s": ..., "model": ..., "language": ..., "run": {...}})
+    ...
+    writer.close()   # flushes everything still queued
+"""
+import os
+import time
+import threading
+import traceback
+from collections import Counter, deque
+from contextlib import ExitStack
+
+import psycopg2
+
+WRITE_BATCH = int(os.getenv("ASR_WRITE_BATCH", "8"))
+WRITE_LINGER_S = float(os.getenv("ASR_WRITE_LINGER_S", "0.5"))
+WRITE_QUEUE = int(os.getenv("ASR_WRITE_QUEUE", "64"))
+WRITE_MAX_BYTES = int(float(os.getenv("ASR_WRITE_MAX_MB", "256")) * 1024 * 1024)
+WRITE_RETRIES = int(os.getenv("ASR_WRITE_RETRIES", "5"))
+RECORD_RUNS = os.getenv("ASR_RUNS", "1") != "0"
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+_runs_off = threading.Event()  # set when transcription_runs hasn't been migrated yet
+
+
+def record_runs(db, runs):
+    """Write transcription_runs rows; never raises (telemetry must not fail an episode)."""
+    if not RECORD_RUNS or _runs_off.is_set() or not runs:
+        return
+    try:
+        db.record_runs(runs)
+    except Exception as e:
+        if getattr(e, "pgcode", None) == "42P01":  # undefined_table
+            _runs_off.set()
+            print("[runs] no transcription_runs table (python -m migrations.runner up); not recording")
+        else:
+            print(f"[runs] record failed for {[r['episode_id'] for r in runs]}: {e}")
+
+
+def _approx_bytes(result) -> int:
+    """Rough in-memory size of a result's rows (tuples, floats and str objects)."""
+    segs, words = result["seg_rows"] or [], result["word_rows"] or []
+    return (sum(150 + len(text) for _, _, text in segs)
+            + sum(200 + len(w) for *_, w in words))
+
+
+class DBWriter:
+    def __init__(self, worker_id: str = None, batch: int = WRITE_BATCH, max_queue: int = WRITE_QUEUE,
+                 max_bytes: int = WRITE_MAX_BYTES, linger_s: float = WRITE_LINGER_S):
+        self.worker_id = worker_id
+        self.batch = max(1, batch)
+        self.max_queue = max(1, max_queue)
+        self.max_bytes = max_bytes
+        self.linger_s = linger_s
+        self._pending = deque()
+        self._ids = Counter()  # episode id -> results submitted, not yet stored or released
+        self._bytes = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._stack = None
+        self._db = None
+        self.written = 0
+        self.failed = 0
+
+    # ---------------- producer side ----------------
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, result: dict):
+        """Queue one finished episode; blocks while the writer is over its memory bound."""
+        size = _approx_bytes(result)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("DBWriter is closed")
+            # an episode bigger than the whole bound still goes through on an empty queue
+            while self._pending and (len(self._pending) >= self.max_queue
+                                     or self._bytes + size > self.max_bytes):
+                self._cond.wait()
+            result["_bytes"] = size
+            self._pending.append(result)
+            self._ids[result["episode_id"]] += 1
+            self._bytes += size
+            self._cond.notify_all()
+
+    def close(self, timeout: float = None):
+        """Write everything still queued, then stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def backlog(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def pending_ids(self):
+        """Episode ids submitted and not yet stored or released (their leases are still ours)."""
+        with self._cond:
+            return list(self._ids)
+
+    # ---------------- writer thread ----------------
+
+    def _next_batch(self):
+        """Up to self.batch results (lingering briefly to fill it); None once closed and drained."""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            deadline = time.monotonic() + self.linger_s
+            while len(self._pending) < self.batch and not self._closed:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            batch = {}
+            while self._pending and len(batch) < self.batch:
+                r = self._pending.popleft()
+                if r["episode_id"] in batch:  # same episode twice: the later one waits a batch
+                    self._pending.appendleft(r)
+                    break
+                batch[r["episode_id"]] = r
+            return list(batch.values())
+
+    def _done(self, batch):
+        with self._cond:
+            for r in batch:
+                self._bytes -= r["_bytes"]
+                self._ids[r["episode_id"]] -= 1
+                if not self._ids[r["episode_id"]]:
+                    del self._ids[r["episode_id"]]
+            self._cond.notify_all()
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                try:
+                    self._write(batch)
+                except Exception:
+                    traceback.print_exc()
+                finally:
+                    self._done(batch)
+        finally:
+            self._disconnect()
+
+    def _connect(self):
+        if self._db is None:
+            from db_client import get_db_client
+            stack = ExitStack()
+            self._db = stack.enter_context(get_db_client())
+            self._stack = stack
+        return self._db
+
+    def _disconnect(self):
+        stack, self._stack, self._db = self._stack, None, None
+        if stack is not None:
+            try:
+                stack.close()
+            except Exception:
+                pass
+
+    def _write(self, batch):
+        """Store a batch, reconnecting on connection loss; isolate bad episodes."""
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                timings = self._connect().write_transcripts(batch, self.worker_id)
+                break
+            except CONNECTION_ERRORS as e:
+                self._disconnect()
+                if attempt == WRITE_RETRIES:
+                    print(f"[writer] giving up on {len(batch)} episode(s) after {attempt + 1} tries: {e}")
+                    self._release(batch)
+                    return
+                wait = min(60.0, 2.0 ** attempt)
+                print(f"[writer] DB connection lost ({e}); retrying in {wait:.0f}s")
+                time.sleep(wait)
+            except Exception as e:
+                if len(batch) > 1:
+                    print(f"[writer] batch of {len(batch)} failed ({e}); writing one by one")
+                    for r in batch:
+                        self._write([r])
+                else:
+                    print(f"[writer] FAIL {batch[0]['episode_id']}: {e}")
+                    traceback.print_exc()
+                    self._release(batch)
+                return
+
+        if timings.get("lost"):
+            print(f"[writer] lease lost on {timings['lost']} (re-claimed elsewhere); not stored")
+            self.failed += len(timings["lost"])
+            batch = [r for r in batch if r["episode_id"] not in timings["lost"]]
+            if not batch:
+                return
+        self.written += len(batch)
+        share = 1.0 / len(batch)
+        runs = []
+        for r in batch:
+            run = r.get("run")
+            if run is not None:
+                run["db_write_s"] = timings["db_write_s"] * share
+                run["finalize_s"] = timings["finalize_s"] * share
+                runs.append(run)
+        record_runs(self._db, runs)
+        print(f"[writer] stored {len(batch)} episode(s) "
+              f"(write {timings['db_write_s']:.2f}s, finalize {timings['finalize_s']:.2f}s)")
+
+    def _release(self, batch):
+        """Hand episodes that couldn't be stored back to the queue for another worker."""
+        self.failed += len(batch)
+        runs = []
+        for r in batch:
+            try:
+                self._connect().mark_failed(r["episode_id"], retry=True, worker_id=self.worker_id)
+            except Exception as e:
+                self._disconnect()
+                print(f"[writer] mark_failed {r['episode_id']} failed: {e} (lease will expire)")
+            if r.get("run") is not None:
+                runs.append(dict(r["run"], status="failed"))
+        if self._db is not None:
+            record_runs(self._db, runs)
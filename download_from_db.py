@@ -8,11 +8,17 @@ SFTP_PODCAST_FOLDER = os.getenv("SFTP_PODCAST_FOLDER")
 os.makedirs(DL_DIRECTORY, exist_ok=True)
 
 
-def search_and_download(search_term=SEARCH_TERM):
+def search_and_download(search_term=SEARCH_TERM, local=False):
     # todo what about metadata? should i save a csv with data on db row data?
     # maybe save 1 row per episode. include transcript? maybe flat transcript, def not individual rows.
     # but might need to warn user about how many eps and size estimate before proceeding to actually save.
-    with get_db_client() as db:
+    # local=True searches the SQLite replica (podscrape.py sync_local) instead of Postgres
+    if local:
+        from local_replica import get_replica_client
+        client = get_replica_client()
+    else:
+        client = get_db_client()
+    with client as db:
         episodes = db.search_title_and_description(search_term)
 
     if len(episodes) == 0:
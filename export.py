@@ -0,0 +1,342 @@
+"""
+Streaming bulk export of finished transcripts to Parquet or Arrow IPC.
+
+    python podscrape.py export [--out exports] [--format parquet|arrow] [--full]
+
+Each table is pulled with a single `COPY (SELECT …) TO STDOUT` and parsed as it
+arrives, so memory is bounded by EXPORT_BATCH_ROWS regardless of corpus size.
+Output layout (hive-style, readable with pyarrow.dataset / duckdb / polars):
+
+    <out>/episodes/run=<run_id>/part-00000.parquet
+    <out>/transcript_segments/run=<run_id>/part-00000.parquet
+    <out>/transcript_words/run=<run_id>/part-00000.parquet
+
+Exports are incremental: <out>/_export_state.json records the completion
+timestamp watermark, and each run only exports episodes completed after it.
+The watermark is advanced only once all tables of a run are written. It
+trails NOW() by EXPORT_SETTLE_S: transcription_timestamp_completed is the
+writing transaction's start time, so a transaction still open when the export
+runs can commit rows stamped before the newest visible one; a watermark that
+jumped straight to MAX() would skip them for good.
+
+--full starts over: it exports everything into a new run and, once that run
+is complete, deletes the earlier run= partitions of the tables it wrote, so
+a scan never sees an episode twice because of it. Incremental runs can still
+hold an episode more than once (it was re-transcribed and completed again
+after an earlier run exported it); readers should keep each episode's rows
+from its latest run only. run ids sort chronologically, e.g. in duckdb:
+
+    SELECT s.*
+      FROM read_parquet('<out>/transcript_segments/*/*.parquet', hive_partitioning = true) s
+      JOIN (SELECT id, max(run) AS run
+              FROM read_parquet('<out>/episodes/*/*.parquet', hive_partitioning = true)
+             GROUP BY id) latest
+        ON s.episode_id = latest.id AND s.run = latest.run
+"""
+import os
+import re
+import json
+import shutil
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from db_client import get_db_client
+
+load_dotenv()
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "100000"))
+EXPORT_ROWS_PER_FILE = int(os.getenv("EXPORT_ROWS_PER_FILE", "5000000"))
+EXPORT_SETTLE_S = float(os.getenv("EXPORT_SETTLE_S", "300"))  # longer than any writer transaction
+
+STATE_FILE = "_export_state.json"
+EPOCH = "1970-01-01 00:00:00+00"
+
+TS = pa.timestamp("us", tz="UTC")
+
+# table -> (arrow schema, SELECT producing those columns in order).
+# timestamps are selected as epoch microseconds so parsing stays trivial.
+TABLES = {
+    "episodes": (
+        pa.schema([
+            ("id", pa.string()),
+            ("podcast_id", pa.int32()),
+            ("podcast_title", pa.string()),
+            ("title", pa.string()),
+            ("description", pa.string()),
+            ("pub_date", TS),
+            ("date_entered", TS),
+            ("duration_s", pa.float64()),
+            ("audio_path", pa.string()),
+            ("completed_at", TS),
+        ]),
+        """
+        SELECT e.id, e.podcast_id, p.title, e.title, e.description,
+               (EXTRACT(EPOCH FROM e.pub_date) * 1000000)::bigint,
+               (EXTRACT(EPOCH FROM e.date_entered) * 1000000)::bigint,
+               e.duration_s, e.audio_path,
+               (EXTRACT(EPOCH FROM e.transcription_timestamp_completed) * 1000000)::bigint
+          FROM episodes e
+     LEFT JOIN podcasts p ON p.id = e.podcast_id
+         WHERE {where}
+        """,
+    ),
+    "transcript_segments": (
+        pa.schema([
+            ("episode_id", pa.string()),
+            ("seg_idx", pa.int32()),
+            ("start_s", pa.float64()),
+            ("end_s", pa.float64()),
+            ("text", pa.string()),
+        ]),
+        """
+        SELECT s.episode_id, s.seg_idx, s.start_s, s.end_s, s.text
+          FROM transcript_segments s
+          JOIN episodes e ON e.id = s.episode_id
+         WHERE {where}
+        """,
+    ),
+    "transcript_words": (
+        pa.schema([
+            ("episode_id", pa.string()),
+            ("seg_idx", pa.int32()),
+            ("word_idx", pa.int32()),
+            ("start_s", pa.float64()),
+            ("end_s", pa.float64()),
+            ("word", pa.string()),
+        ]),
+        """
+        SELECT s.episode_id, s.seg_idx, w.word_idx, w.start_s, w.end_s, w.word
+          FROM transcript_words w
+          JOIN transcript_segments s ON s.id = w.seg_id
+          JOIN episodes e ON e.id = s.episode_id
+         WHERE {where}
+        """,
+    ),
+}
+
+# ---------------- COPY text-format parsing ----------------
+
+_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v", "\\": "\\"}
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+
+def _unescape(field: str):
+    if field == r"\N":
+        return None
+    if "\\" not in field:
+        return field
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), field)
+
+
+class _PartitionWriter:
+    """Writes record batches into part-NNNNN files, rotating every EXPORT_ROWS_PER_FILE rows."""
+
+    def __init__(self, out_dir: str, schema: pa.Schema, fmt: str):
+        self.out_dir = out_dir
+        self.schema = schema
+        self.fmt = fmt
+        self.part = 0
+        self.rows_in_part = 0
+        self.total_rows = 0
+        self._writer = None
+        self._sink = None
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _open(self):
+        ext = "parquet" if self.fmt == "parquet" else "arrow"
+        path = os.path.join(self.out_dir, f"part-{self.part:05d}.{ext}")
+        if self.fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def _close_part(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def write(self, batch: pa.RecordBatch):
+        if self._writer is None:
+            self._open()
+        if self.fmt == "parquet":
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write(batch)
+        self.rows_in_part += batch.num_rows
+        self.total_rows += batch.num_rows
+        if self.rows_in_part >= EXPORT_ROWS_PER_FILE:
+            self._close_part()
+            self.part += 1
+            self.rows_in_part = 0
+
+    def close(self):
+        self._close_part()
+
+
+class _CopySink:
+    """
+    File-like target for cursor.copy_expert. Splits the COPY text stream into
+    rows as it arrives and flushes an Arrow batch every EXPORT_BATCH_ROWS rows.
+    In COPY text format embedded newlines/tabs are escaped, so one line == one row.
+    """
+
+    def __init__(self, schema: pa.Schema, writer: _PartitionWriter):
+        self.schema = schema
+        self.writer = writer
+        self._tail = b""
+        self._cols = [[] for _ in schema]
+        self._nrows = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        buf = self._tail + data
+        lines = buf.split(b"\n")
+        self._tail = lines.pop()  # incomplete last line (or b"")
+        for line in lines:
+            fields = line.decode("utf-8").split("\t")
+            for col, value in zip(self._cols, fields):
+                col.append(_unescape(value))
+            self._nrows += 1
+            if self._nrows >= EXPORT_BATCH_ROWS:
+                self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self._nrows:
+            return
+        arrays = []
+        for field, values in zip(self.schema, self._cols):
+            t = field.type
+            if pa.types.is_string(t):
+                arrays.append(pa.array(values, type=t))
+            elif pa.types.is_floating(t):
+                arrays.append(pa.array([None if v is None else float(v) for v in values], type=t))
+            else:  # ints and epoch-microsecond timestamps
+                arrays.append(pa.array([None if v is None else int(v) for v in values], type=t))
+        self.writer.write(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._cols = [[] for _ in self.schema]
+        self._nrows = 0
+
+
+# ---------------- state ----------------
+
+def _load_state(out_dir: str) -> dict:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"completed_watermark": EPOCH, "runs": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _drop_older_runs(out_dir: str, tables, run_id: str):
+    """Delete every run= partition of `tables` except run_id's (after a --full export)."""
+    for table in tables:
+        table_dir = os.path.join(out_dir, table)
+        for name in sorted(os.listdir(table_dir)):
+            if name.startswith("run=") and name != f"run={run_id}":
+                shutil.rmtree(os.path.join(table_dir, name), ignore_errors=True)
+                print(f"[export] {table}: removed {name} (replaced by the full export)")
+
+
+def _save_state(out_dir: str, state: dict):
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ---------------- export ----------------
+
+def export_table(db, table: str, where_sql: str, out_dir: str, fmt: str) -> int:
+    schema, select = TABLES[table]
+    writer = _PartitionWriter(out_dir, schema, fmt)
+    sink = _CopySink(schema, writer)
+    try:
+        with db.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY ({select.format(where=where_sql)}) TO STDOUT", sink, size=1 << 20)
+        sink.flush()
+    finally:
+        writer.close()
+    return writer.total_rows
+
+
+def export_transcripts(out_dir: str = EXPORT_DIR, fmt: str = "parquet",
+                       full: bool = False, tables=None) -> dict:
+    """
+    Export episodes completed since the last run, or everything with
+    full=True, which then replaces the earlier runs of those tables.
+    Returns {table: rows_written}.
+    """
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    tables = tables or list(TABLES)
+    os.makedirs(out_dir, exist_ok=True)
+    state = _load_state(out_dir)
+    low = EPOCH if full else state["completed_watermark"]
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    counts = {}
+    with get_db_client() as db:
+        # one snapshot for all tables so episodes/segments/words line up
+        db.conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        try:
+            with db.conn.cursor() as cur:
+                cur.execute("""
+                    SELECT MAX(transcription_timestamp_completed)
+                      FROM episodes
+                     WHERE transcript_status = 'done'
+                       AND transcription_timestamp_completed > %s
+                       AND transcription_timestamp_completed <= NOW() - make_interval(secs => %s)
+                """, (low, EXPORT_SETTLE_S))
+                high = cur.fetchone()[0]
+                if high is None:
+                    print("Nothing new to export.")
+                    db.conn.rollback()
+                    return counts
+                where_sql = cur.mogrify(
+                    "e.transcript_status = 'done'"
+                    " AND e.transcription_timestamp_completed > %s"
+                    " AND e.transcription_timestamp_completed <= %s",
+                    (low, high),
+                ).decode()
+
+            written = []
+            try:
+                for table in tables:
+                    table_dir = os.path.join(out_dir, table, f"run={run_id}")
+                    written.append(table_dir)
+                    counts[table] = export_table(db, table, where_sql, table_dir, fmt)
+                    print(f"[export] {table}: {counts[table]:,} rows → {table_dir}")
+            except BaseException:
+                # don't leave a half-written run behind; the watermark is untouched
+                for d in written:
+                    shutil.rmtree(d, ignore_errors=True)
+                raise
+            db.conn.rollback()
+        finally:
+            db.conn.set_session(isolation_level="DEFAULT", readonly=False)
+
+    run = {"run_id": run_id, "from": low, "to": high.isoformat(), "format": fmt, "rows": counts}
+    state["completed_watermark"] = high.isoformat()
+    if full:
+        # older runs only keep what this one doesn't cover (tables it didn't write)
+        state["runs"] = [dict(r, rows={t: n for t, n in r["rows"].items() if t not in tables})
+                         for r in state["runs"]]
+        state["runs"] = [r for r in state["runs"] if r["rows"]]
+    state["runs"].append(run)
+    _save_state(out_dir, state)  # the new run is on record before the old ones go
+    if full:
+        _drop_older_runs(out_dir, tables, run_id)
+    return counts
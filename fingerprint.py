@@ -0,0 +1,388 @@
+"""
+Skip recurring intros, outros and ad reads by audio fingerprint (ASR_FINGERPRINT=1).
+
+Every episode gets a compact fingerprint: one 32-bit sub-fingerprint per
+32 ms hop, each bit the sign of an energy difference between neighbouring
+frequency bands (300-2000 Hz, from audio decimated to 4 kHz) and consecutive
+frames. This is robust to re-encoding and level changes, costs 125 bytes per
+second of audio and about a second of CPU per hour. Silent frames are 0 and
+never count as a match.
+
+After an episode is transcribed, its fingerprint is compared with the last
+ASR_FP_RECENT episodes of the same podcast. Stretches of at least ASR_FP_MIN_S
+seconds that recur (bit error rate under ASR_FP_BER) become known segments
+of the podcast's index, together with the transcript rows that cover them.
+
+Before a new episode is transcribed, match() finds known segments in it:
+exact hits on either 16-bit half of a sub-fingerprint vote for an alignment and the best alignments are
+verified against the whole segment. Matched spans are cut out of the speech
+regions, so the model never decodes them, and splice() puts the cached text
+back in with shifted timestamps.
+
+The index lives in ASR_FP_DIR, one .npz per podcast holding the segments'
+sub-fingerprints and cached text (at most ASR_FP_MAX_SEGMENTS, the least
+matched are dropped first), plus the recent episodes' fingerprints.
+
+    fp = FingerprintIndex()
+    prints = fingerprint(audio)
+    spans = fp.match(podcast_id, prints)
+    regions = skip_regions(regions, spans, duration_s)
+    ...
+    segs, words = splice(segs, words, spans)
+    fp.learn(podcast_id, episode_id, prints, segs, words, spans)
+"""
+import os
+import re
+import json
+import threading
+
+import numpy as np
+
+from whisper_runtime import SAMPLE_RATE
+
+USE_FINGERPRINT = os.getenv("ASR_FINGERPRINT", "0") == "1"
+FP_DIR = os.getenv("ASR_FP_DIR", "fp_index")
+MIN_SEG_S = float(os.getenv("ASR_FP_MIN_S", "8"))
+MAX_SEG_S = float(os.getenv("ASR_FP_MAX_S", "180"))
+MAX_BER = float(os.getenv("ASR_FP_BER", "0.3"))
+RECENT = int(os.getenv("ASR_FP_RECENT", "3"))
+MAX_SEGMENTS = int(os.getenv("ASR_FP_MAX_SEGMENTS", "64"))
+
+DECIMATE = 4          # 16 kHz → 4 kHz before the FFT
+FP_RATE = SAMPLE_RATE // DECIMATE
+FRAME = 512           # 128 ms analysis frame
+HOP = 128             # 32 ms between sub-fingerprints
+SMOOTH_E = 4          # band energies averaged over this many frames (misalignment)
+FPS = FP_RATE / HOP
+BAND_EDGES = np.geomspace(300.0, 2000.0, 34)  # 33 bands → 32 bits
+SILENCE = 1e-8        # mean frame power below this → sub-fingerprint 0
+BLOCK = 4096          # frames per FFT block (bounds memory on long episodes)
+MIN_VOTES = 8         # exact hits an alignment needs before it is verified
+MAX_BUCKET = 16       # key values this common carry no information
+CANDIDATES = 8        # alignments verified per segment / episode pair
+SMOOTH = int(FPS)     # frames of bit errors averaged when looking for runs
+
+_window = np.hanning(FRAME).astype(np.float32)
+_bins = np.fft.rfftfreq(FRAME, 1.0 / FP_RATE)
+_bands = np.stack([(_bins >= lo) & (_bins < hi)
+                   for lo, hi in zip(BAND_EDGES[:-1], BAND_EDGES[1:])], axis=1).astype(np.float32)
+_weights = (1 << np.arange(32, dtype=np.uint64))
+
+
+# ---------------- fingerprints ----------------
+
+def fingerprint(audio) -> np.ndarray:
+    """16 kHz float32 audio → uint32 sub-fingerprint per hop (0 = silent)."""
+    x = np.asarray(audio, dtype=np.float32)
+    x = x[:len(x) // DECIMATE * DECIMATE].reshape(-1, DECIMATE).mean(axis=1)
+    if len(x) < FRAME + HOP * SMOOTH_E:
+        return np.zeros(0, dtype=np.uint32)
+    frames = np.lib.stride_tricks.sliding_window_view(x, FRAME)[::HOP]
+    energy = np.empty((len(frames), _bands.shape[1]), dtype=np.float32)
+    power = np.empty(len(frames), dtype=np.float32)
+    for i in range(0, len(frames), BLOCK):
+        spec = np.abs(np.fft.rfft(frames[i:i + BLOCK] * _window, axis=1)) ** 2
+        energy[i:i + BLOCK] = spec @ _bands
+        power[i:i + BLOCK] = spec.mean(axis=1) / FRAME
+    # moving average over SMOOTH_E frames: a longer effective window, so a
+    # sub-hop shift between two copies of the same audio flips few bits
+    csum = np.cumsum(np.vstack([np.zeros((1, energy.shape[1]), np.float32), energy]), axis=0)
+    energy = csum[SMOOTH_E:] - csum[:-SMOOTH_E]
+    power = np.minimum(power[SMOOTH_E - 1:], power[:len(power) - SMOOTH_E + 1])
+    diff = energy[:, :-1] - energy[:, 1:]
+    bits = (diff[1:] - diff[:-1]) > 0
+    prints = (bits.astype(np.uint64) @ _weights).astype(np.uint32)
+    prints[(power[1:] < SILENCE) | (power[:-1] < SILENCE)] = 0
+    return prints
+
+
+def _bit_errors(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Per-frame differing bits between aligned prints; 16 (chance) where either is silent."""
+    errs = np.unpackbits((a ^ b).view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+    errs[(a == 0) | (b == 0)] = 16
+    return errs
+
+
+def _keys(prints: np.ndarray):
+    """(key, frame) for both 16-bit halves of every non-silent print."""
+    frames = np.nonzero(prints)[0]
+    p = prints[frames].astype(np.int64)
+    return (np.concatenate([p & 0xFFFF, (p >> 16) | 0x10000]),
+            np.concatenate([frames, frames]))
+
+
+def _alignments(query: np.ndarray, keys: np.ndarray, pos: np.ndarray, owner=None):
+    """
+    Vote on how `query` prints line up with the indexed ones (keys sorted,
+    with their frame positions and owning segment; see _sorted_index).
+    A half-print hit survives the few bit errors re-encoding causes.
+    Returns the best (owner, offset) pairs as {owner: [offset, ...]},
+    offset = query frame - indexed frame.
+    """
+    query, qpos = _keys(query)
+    lo = np.searchsorted(keys, query, "left")
+    hi = np.searchsorted(keys, query, "right")
+    count = hi - lo
+    qi = np.nonzero((count > 0) & (count <= MAX_BUCKET))[0]
+    if not len(qi):
+        return {}
+    reps = count[qi]
+    starts = np.repeat(lo[qi], reps)
+    within = np.arange(reps.sum()) - np.repeat(np.cumsum(reps) - reps, reps)
+    hits = starts + within
+    offsets = np.repeat(qpos[qi], reps) - pos[hits]
+    owners = owner[hits] if owner is not None else np.zeros(len(hits), dtype=np.int64)
+    pairs, votes = np.unique(np.stack([owners, offsets]), axis=1, return_counts=True)
+    best = {}
+    for k in np.argsort(-votes)[:CANDIDATES * 4]:
+        if votes[k] < MIN_VOTES:
+            break
+        o, d = int(pairs[0, k]), int(pairs[1, k])
+        if len(best.setdefault(o, [])) < CANDIDATES:
+            best[o].append(d)
+    return best
+
+
+def _sorted_index(prints_list):
+    """Half-print keys of several prints, sorted, with (frame, owner index), for _alignments."""
+    if not prints_list:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    parts = [_keys(p) for p in prints_list]
+    keys = np.concatenate([k for k, _ in parts])
+    pos = np.concatenate([f for _, f in parts])
+    owner = np.concatenate([np.full(len(k), i) for i, (k, _) in enumerate(parts)])
+    order = np.argsort(keys, kind="stable")
+    return keys[order], pos[order], owner[order]
+
+
+def _runs(mask: np.ndarray, min_len: int):
+    """[(start, end)] of True runs at least min_len long."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts, ends = np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]
+    return [(int(s), int(e)) for s, e in zip(starts, ends) if e - s >= min_len]
+
+
+def recurring_spans(a: np.ndarray, b: np.ndarray, min_s: float = MIN_SEG_S):
+    """Frame spans [(start, end)] of `a` whose audio also occurs somewhere in `b`."""
+    keys, pos, _ = _sorted_index([b])
+    found = []
+    for d in _alignments(a, keys, pos).get(0, []):
+        lo, hi = max(0, d), min(len(a), len(b) + d)
+        if hi - lo < min_s * FPS:
+            continue
+        errs = _bit_errors(a[lo:hi], b[lo - d:hi - d]).astype(np.float32)
+        ber = np.convolve(errs, np.ones(SMOOTH) / (SMOOTH * 32), mode="same")
+        # the moving average spreads a run by half its width on either side
+        found += [(lo + s + SMOOTH // 2, lo + e - SMOOTH // 2)
+                  for s, e in _runs(ber < MAX_BER, int(min_s * FPS) + SMOOTH)]
+    # longest first, dropping spans that overlap one already taken
+    taken = []
+    for s, e in sorted(found, key=lambda r: r[0] - r[1]):
+        if all(e <= ts or s >= te for ts, te in taken):
+            taken.append((s, e))
+    return sorted(taken)
+
+
+# ---------------- transcripts ----------------
+
+def skip_regions(regions, spans, duration_s: float):
+    """Speech regions (None = everything) minus the matched spans."""
+    if not spans:
+        return regions
+    out = list(regions) if regions is not None else [(0.0, duration_s)]
+    for sp in spans:
+        lo, hi = sp["skip"]
+        nxt = []
+        for a, b in out:
+            if a < lo:
+                nxt.append((a, min(b, lo)))
+            if b > hi:
+                nxt.append((max(a, hi), b))
+        out = [(a, b) for a, b in nxt if b - a > 0.01]
+    return out
+
+
+def splice(seg_rows, word_rows, spans):
+    """Merge cached text for matched spans into a transcript; seg_idx renumbered in time order."""
+    if not spans:
+        return seg_rows, word_rows
+    skips = [sp["skip"] for sp in spans]
+    words_by_seg = {}
+    for si, wi, a, b, w in word_rows:
+        words_by_seg.setdefault(si, []).append((wi, a, b, w))
+    pieces = []
+    for si, (a, b, text) in enumerate(seg_rows):
+        mid = (a + b) / 2
+        if not any(lo <= mid <= hi for lo, hi in skips):
+            pieces.append(((a, b, text), words_by_seg.get(si, [])))
+    for sp in spans:
+        t0 = sp["start_s"]
+        cached_words = {}
+        for si, wi, a, b, w in sp["word_rows"]:
+            cached_words.setdefault(si, []).append((wi, a + t0, b + t0, w))
+        for si, (a, b, text) in enumerate(sp["seg_rows"]):
+            pieces.append(((a + t0, b + t0, text), cached_words.get(si, [])))
+    pieces.sort(key=lambda p: p[0][0])
+    segs, words = [], []
+    for si, (seg, seg_words) in enumerate(pieces):
+        segs.append(tuple(seg))
+        words.extend((si, wi, a, b, w) for wi, a, b, w in seg_words)
+    return segs, words
+
+
+def _rows_within(seg_rows, word_rows, start_s: float, end_s: float):
+    """Transcript rows wholly inside [start_s, end_s], shifted to start at 0."""
+    keep = {}
+    for si, (a, b, _) in enumerate(seg_rows):
+        if a >= start_s and b <= end_s:
+            keep[si] = len(keep)
+    segs = [(float(a - start_s), float(b - start_s), t)
+             for si, (a, b, t) in enumerate(seg_rows) if si in keep]
+    words = [(keep[si], wi, float(a - start_s), float(b - start_s), w)
+             for si, wi, a, b, w in word_rows if si in keep]
+    return segs, words
+
+
+# ---------------- index ----------------
+
+class _Podcast:
+    """One podcast's known segments and recent episode prints (in memory)."""
+
+    def __init__(self):
+        self.segments = []   # [{'prints','seg_rows','word_rows','hits','source'}]
+        self.recent = []     # [(episode_id, prints)], newest last
+        self.lookup = None   # (keys, pos, owner) over segment prints
+
+    def rebuild(self):
+        self.lookup = _sorted_index([s["prints"] for s in self.segments])
+
+
+class FingerprintIndex:
+    def __init__(self, root: str = FP_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._podcasts = {}
+
+    def _path(self, podcast_id) -> str:
+        return os.path.join(self.root, re.sub(r"[^\w.-]", "_", str(podcast_id)) + ".npz")
+
+    def _get(self, podcast_id) -> _Podcast:
+        """Called with the lock held: the podcast's index, loaded from disk on first use."""
+        pc = self._podcasts.get(podcast_id)
+        if pc is not None:
+            return pc
+        pc = _Podcast()
+        path = self._path(podcast_id)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    meta = json.loads(str(data["meta"]))
+                    for i, m in enumerate(meta["segments"]):
+                        pc.segments.append(dict(m, prints=data[f"seg_{i}"]))
+                    pc.recent = [(eid, data[f"recent_{i}"]) for i, eid in enumerate(meta["recent"])]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[fp] unreadable index {path}: {e}; starting over")
+                pc = _Podcast()
+        pc.rebuild()
+        self._podcasts[podcast_id] = pc
+        return pc
+
+    def _save(self, podcast_id, pc: _Podcast):
+        os.makedirs(self.root, exist_ok=True)
+        meta = {"segments": [{k: v for k, v in s.items() if k != "prints"} for s in pc.segments],
+                "recent": [eid for eid, _ in pc.recent]}
+        arrays = {f"seg_{i}": s["prints"] for i, s in enumerate(pc.segments)}
+        arrays.update({f"recent_{i}": p for i, (_, p) in enumerate(pc.recent)})
+        path = self._path(podcast_id)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+
+    def match(self, podcast_id, prints: np.ndarray):
+        """
+        Known segments found in an episode's prints:
+        [{'start_s','skip': (lo_s, hi_s),'seg_rows','word_rows'}] with rows
+        relative to start_s; 'skip' is the stretch the cached text covers.
+        """
+        if podcast_id is None or not len(prints):
+            return []
+        with self._lock:
+            pc = self._get(podcast_id)
+            # learn() swaps in new lists rather than editing these, but take our
+            # own copy so sids keep pointing at the segments `lookup` was built from
+            segments, lookup = list(pc.segments), pc.lookup
+        if not segments:
+            return []
+        found = []
+        for sid, offsets in _alignments(prints, *lookup).items():
+            seg = segments[sid]
+            n = len(seg["prints"])
+            for d in offsets:
+                lo, hi = max(0, d), min(len(prints), d + n)
+                if hi - lo < 0.9 * n:  # must be (nearly) all there
+                    continue
+                ber = _bit_errors(prints[lo:hi], seg["prints"][lo - d:hi - d]).mean() / 32
+                if ber < MAX_BER:
+                    found.append((ber, sid, d))
+                    break
+        spans, taken = [], []
+        for ber, sid, d in sorted(found, key=lambda f: f[0]):
+            seg = segments[sid]
+            t0 = d / FPS
+            lo = t0 + seg["seg_rows"][0][0]
+            hi = t0 + max(b for _, b, _ in seg["seg_rows"])
+            if any(lo < te and hi > ts for ts, te in taken):
+                continue
+            taken.append((lo, hi))
+            with self._lock:
+                seg["hits"] += 1
+            spans.append({"start_s": t0, "skip": (lo, hi),
+                          "seg_rows": seg["seg_rows"], "word_rows": seg["word_rows"]})
+        return sorted(spans, key=lambda sp: sp["start_s"])
+
+    def learn(self, podcast_id, episode_id: str, prints: np.ndarray, seg_rows, word_rows,
+              matched=None):
+        """
+        Add stretches of this (transcribed) episode that recur in the podcast's
+        recent episodes as known segments, then remember its prints. Spans
+        that were already matched are not learned again. Returns how many
+        segments were added.
+        """
+        if podcast_id is None or not len(prints):
+            return 0
+        with self._lock:
+            pc = self._get(podcast_id)
+            recent = list(pc.recent)
+        known = [sp["skip"] for sp in (matched or [])]
+        max_len = int(MAX_SEG_S * FPS)
+        new = []
+        for _, other in recent:
+            for s, e in recurring_spans(prints, other):
+                for cs in range(s, e, max_len):
+                    ce = min(e, cs + max_len)
+                    lo, hi = cs / FPS, ce / FPS
+                    if ce - cs < MIN_SEG_S * FPS:
+                        continue
+                    if any(lo < ke and hi > ks for ks, ke in known):
+                        continue
+                    segs, words = _rows_within(seg_rows, word_rows, lo, hi)
+                    if not segs:
+                        continue
+                    known.append((lo, hi))
+                    new.append({"prints": prints[cs:ce].copy(), "seg_rows": segs,
+                                "word_rows": words, "hits": 0, "source": episode_id})
+        with self._lock:
+            pc = self._get(podcast_id)
+            if new:
+                # a new list, never an in-place edit: match() may be walking the old one
+                segments = pc.segments + new
+                if len(segments) > MAX_SEGMENTS:
+                    segments = sorted(segments, key=lambda s: -s["hits"])[:MAX_SEGMENTS]
+                pc.segments = segments
+                pc.rebuild()
+            recent = [(eid, p) for eid, p in pc.recent if eid != episode_id]
+            pc.recent = recent[len(recent) - RECENT + 1:] if RECENT > 1 else []
+            pc.recent.append((episode_id, prints))
+            self._save(podcast_id, pc)
+        return len(new)
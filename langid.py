@@ -0,0 +1,134 @@
+"""
+Language ID ahead of transcription.
+
+Before an episode is downloaded, LanguageGate decodes only its first
+ASR_LANGID_HEAD_S seconds from a partial SFTP read (audio_stream.fetch_head)
+and runs a multilingual model's language detection on it (ASR_LANGID_MODEL,
+default fw_tiny_multi on ASR_LANGID_DEVICE=cpu, so no GPU slot is used).
+Files whose head can't be decoded on its own (m4a/mp4) are checked on the
+full download instead.
+
+Each detection counts as a vote for the podcast (podcasts.language /
+language_votes); after ASR_LANG_STABLE episodes in a row agree, the feed's
+language is taken as known and its episodes are no longer checked.
+
+ASR_LANGUAGES lists the languages transcribed as usual (default "en").
+Other episodes follow ASR_LANG_POLICY:
+  off   - no language ID (default)
+  route - transcribe with the multilingual ASR_LANG_MODEL in that language
+  skip  - mark the episode 'skipped' without downloading it
+Detections below ASR_LANGID_MIN_PROB are treated as unknown (transcribed as usual).
+With ASR_MODEL_SERVER set the detector runs in the model server (model_server.py).
+"""
+import os
+import threading
+
+from whisper_runtime import MODELS, SAMPLE_RATE, MODEL_SERVER
+
+POLICY = os.getenv("ASR_LANG_POLICY", "off")
+TARGET_LANGS = {l.strip() for l in os.getenv("ASR_LANGUAGES", "en").split(",") if l.strip()}
+LANG_MODEL = os.getenv("ASR_LANG_MODEL", "fw_base")          # transcribes routed episodes
+LANGID_MODEL = os.getenv("ASR_LANGID_MODEL", "fw_tiny_multi")
+LANGID_DEVICE = os.getenv("ASR_LANGID_DEVICE", "cpu")
+HEAD_S = float(os.getenv("ASR_LANGID_HEAD_S", "30"))
+MIN_PROB = float(os.getenv("ASR_LANGID_MIN_PROB", "0.7"))
+STABLE_VOTES = int(os.getenv("ASR_LANG_STABLE", "3"))
+
+POLICIES = ("off", "route", "skip")
+
+
+def _check_multilingual(name: str, what: str):
+    if name not in MODELS:
+        raise ValueError(f"Unknown model '{name}' for {what}. Options: {list(MODELS)}")
+    if MODELS[name].get("english_only") or "lang_runner" not in MODELS[name]:
+        raise ValueError(f"{what} must be a multilingual model, got '{name}'")
+
+
+class LanguageGate:
+    """
+        gate = LanguageGate()
+        lang = gate.identify(db, sftp, meta)            # before the download
+        if gate.skips(lang): db.mark_skipped(eid, lang)
+    """
+
+    def __init__(self, policy: str = POLICY, targets=None,
+                 detector: str = LANGID_MODEL, device: str = LANGID_DEVICE):
+        if policy not in POLICIES:
+            raise ValueError(f"ASR_LANG_POLICY must be one of {POLICIES}, got '{policy}'")
+        _check_multilingual(detector, "ASR_LANGID_MODEL")
+        if policy == "route":
+            _check_multilingual(LANG_MODEL, "ASR_LANG_MODEL")
+        self.policy = policy
+        self.targets = set(targets or TARGET_LANGS)
+        self.detector = detector
+        self.device = device
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._known = {}   # podcast_id -> stable language
+
+    @property
+    def enabled(self) -> bool:
+        return self.policy != "off"
+
+    def _detect(self, audio):
+        with self._load_lock:
+            if self._model is None:
+                if MODEL_SERVER:
+                    from model_server import RemoteModel
+                    self._model = RemoteModel(self.detector, self.device, path=MODEL_SERVER)
+                else:
+                    self._model = MODELS[self.detector]["build"](device=self.device)
+        if MODEL_SERVER:
+            from model_server import detect_remote
+            return detect_remote(self._model, audio)
+        return MODELS[self.detector]["lang_runner"](self._model, audio)
+
+    def _podcast_language(self, db, podcast_id):
+        if podcast_id is None:
+            return None
+        if podcast_id not in self._known:
+            language, votes = db.get_podcast_language(podcast_id)
+            if not language or votes < STABLE_VOTES:
+                return None
+            self._known[podcast_id] = language
+        return self._known[podcast_id]
+
+    def identify(self, db, sftp, meta: dict, audio=None):
+        """
+        Language of an episode ({'audio_path','podcast_id'}), from its podcast's
+        stable language, else from the head of `audio` or, without it, a
+        partial read. None if unknown (head not decodable, low confidence);
+        meta['lang_checked'] is set once a detection actually ran.
+        """
+        pid = meta.get("podcast_id")
+        language = self._podcast_language(db, pid)
+        if language:
+            return language
+        if audio is not None:
+            head = audio[:int(HEAD_S * SAMPLE_RATE)]
+        else:
+            from audio_stream import fetch_head
+            head = fetch_head(sftp, meta["audio_path"], HEAD_S)
+        if head is None or not len(head):
+            return None
+        meta["lang_checked"] = True
+        language, prob = self._detect(head)
+        if prob < MIN_PROB:
+            print(f"[lang] {meta.get('id')}: {language} at {prob:.2f}; treating as unknown")
+            return None
+        if pid is not None:
+            if db.record_podcast_language(pid, language) >= STABLE_VOTES:
+                self._known[pid] = language
+        return language
+
+    def is_target(self, language) -> bool:
+        return language is None or language in self.targets
+
+    def skips(self, language) -> bool:
+        return self.policy == "skip" and not self.is_target(language)
+
+    def model_for(self, language, default: str) -> str:
+        """Model to transcribe an episode in `language` with."""
+        if self.policy == "route" and not self.is_target(language):
+            return LANG_MODEL
+        return default
@@ -0,0 +1,360 @@
+"""
+Local SQLite replica of podcasts / episode metadata (and optionally transcript
+text) for fast, offline, read-only CLI work.
+
+    python podscrape.py sync_local [--transcripts] [--full]
+    python podscrape.py --local count
+
+Sync is incremental and driven by two watermarks kept in the replica's
+sync_state table:
+  * episodes.date_entered                      -> new episode metadata
+  * episodes.transcription_timestamp_completed -> transcript status/text
+Both timestamps are NOW() of the writing transaction, so a transaction still
+open during a sync can commit rows stamped before the newest one it saw; each
+sync therefore only reads rows older than LOCAL_REPLICA_SETTLE_S and the
+watermarks never pass that bound. Metadata edits to already-synced episodes
+(insert_episode's ON CONFLICT refresh) and status changes that don't set the
+completion time (failed, skipped, re-queued, claimed) are only picked up by a
+--full sync, so --local status counts can lag behind the server.
+
+Search goes through an FTS5 index over title, description and transcript.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REPLICA_PATH = os.getenv("LOCAL_REPLICA_PATH", "podscrape_replica.sqlite")
+SYNC_BATCH = int(os.getenv("LOCAL_REPLICA_BATCH", "2000"))
+SYNC_SETTLE_S = float(os.getenv("LOCAL_REPLICA_SETTLE_S", "300"))  # longer than any writer transaction
+
+EPOCH = "1970-01-01 00:00:00"
+
+EPISODE_COLS = (
+    "id", "date_entered", "audio_path", "guid", "duration_s", "title",
+    "description", "pub_date", "download_url", "podcast_id",
+    "transcript_status", "transcription_timestamp_completed",
+)
+
+
+@contextmanager
+def get_replica_client(path: str = REPLICA_PATH):
+    with LocalReplicaClient(path) as db:
+        yield db
+
+
+def _iso(v):
+    """SQLite has no timestamp type; store everything as ISO text."""
+    if v is None:
+        return None
+    if hasattr(v, "isoformat"):
+        return v.isoformat(sep=" ")
+    return v
+
+
+class LocalReplicaClient:
+    """
+    Read-only subset of DBClient's interface answered from SQLite, plus sync().
+    usage:
+        with get_replica_client() as db:
+            db.ep_count()
+    """
+
+    def __init__(self, path: str = REPLICA_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.make_tables()
+
+    def close(self):
+        self.conn.close()
+
+    def make_tables(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS podcasts (
+                id           INTEGER PRIMARY KEY,
+                date_entered TEXT,
+                title        TEXT NOT NULL,
+                rss_url      TEXT
+            );
+            CREATE TABLE IF NOT EXISTS episodes (
+                id                TEXT PRIMARY KEY,
+                date_entered      TEXT,
+                audio_path        TEXT,
+                guid              TEXT,
+                duration_s        REAL,
+                title             TEXT,
+                description       TEXT,
+                pub_date          TEXT,
+                download_url      TEXT,
+                podcast_id        INTEGER,
+                transcript_status TEXT,
+                transcription_timestamp_completed TEXT,
+                transcript_text   TEXT,
+                word_count        INTEGER,
+                transcript_duration_s REAL
+            );
+            CREATE INDEX IF NOT EXISTS ep_date_entered_idx ON episodes (date_entered);
+            CREATE INDEX IF NOT EXISTS ep_completed_idx
+                ON episodes (transcription_timestamp_completed);
+            CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5(
+                episode_id UNINDEXED, title, description, transcript,
+                tokenize = 'porter unicode61'
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.conn.commit()
+
+    # ---------------- sync ----------------
+
+    def _get_state(self, key: str, default: str = EPOCH) -> str:
+        row = self.conn.execute(
+            "SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key: str, value: str):
+        self.conn.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def _reindex(self, episode_ids):
+        """Rebuild FTS rows for the given episodes from the episodes table."""
+        for i in range(0, len(episode_ids), 500):
+            chunk = episode_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            self.conn.execute(
+                f"DELETE FROM episodes_fts WHERE episode_id IN ({marks})", chunk)
+            self.conn.execute(f"""
+                INSERT INTO episodes_fts (episode_id, title, description, transcript)
+                SELECT id, COALESCE(title, ''), COALESCE(description, ''),
+                       COALESCE(transcript_text, '')
+                  FROM episodes WHERE id IN ({marks})
+            """, chunk)
+
+    def sync(self, pg_db, with_transcripts: bool = False, full: bool = False) -> dict:
+        """
+        Pull changes from the Postgres DBClient `pg_db` into the replica.
+        Streams through server-side cursors, committing every SYNC_BATCH rows,
+        so an interrupted sync resumes from the last committed watermark.
+        """
+        if full:
+            self.conn.execute("DELETE FROM sync_state")
+            self.conn.commit()
+
+        # podcasts are small; copy them whole every time
+        with pg_db.conn.cursor() as cur:
+            cur.execute("SELECT id, date_entered, title, rss_url FROM podcasts")
+            self.conn.executemany("""
+                INSERT INTO podcasts (id, date_entered, title, rss_url)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET title = excluded.title,
+                                               rss_url = excluded.rss_url
+            """, [(r[0], _iso(r[1]), r[2], r[3]) for r in cur.fetchall()])
+        self.conn.commit()
+
+        new_eps = self._sync_episode_metadata(pg_db)
+        done_eps = self._sync_transcriptions(pg_db, with_transcripts)
+        pg_db.conn.commit()  # close the read transaction used by named cursors
+        return {"episodes": new_eps, "transcriptions": done_eps}
+
+    def _sync_episode_metadata(self, pg_db) -> int:
+        wm = self._get_state("episodes_date_entered")
+        cols = ", ".join(EPISODE_COLS)
+        synced = 0
+        with pg_db.conn.cursor(name="replica_episodes") as cur:
+            cur.itersize = SYNC_BATCH
+            cur.execute(f"""
+                SELECT {cols}
+                  FROM episodes
+                 WHERE date_entered >= %s
+                   AND date_entered <= NOW() - make_interval(secs => %s)
+                 ORDER BY date_entered
+            """, (wm, SYNC_SETTLE_S))
+            while True:
+                rows = cur.fetchmany(SYNC_BATCH)
+                if not rows:
+                    break
+                vals = [tuple(float(v) if k == "duration_s" and v is not None else _iso(v)
+                              for k, v in zip(EPISODE_COLS, r)) for r in rows]
+                marks = ", ".join("?" * len(EPISODE_COLS))
+                updates = ", ".join(f"{c} = excluded.{c}" for c in EPISODE_COLS[1:])
+                self.conn.executemany(
+                    f"INSERT INTO episodes ({cols}) VALUES ({marks}) "
+                    f"ON CONFLICT (id) DO UPDATE SET {updates}", vals)
+                self._reindex([v[0] for v in vals])
+                self._set_state("episodes_date_entered", vals[-1][1])
+                self.conn.commit()
+                synced += len(rows)
+        return synced
+
+    def _sync_transcriptions(self, pg_db, with_transcripts: bool) -> int:
+        key = "transcripts_completed" if with_transcripts else "status_completed"
+        wm = self._get_state(key)
+        synced = 0
+        with pg_db.conn.cursor(name="replica_transcriptions") as cur:
+            cur.itersize = SYNC_BATCH
+            cur.execute("""
+                SELECT id, transcript_status, transcription_timestamp_completed
+                  FROM episodes
+                 WHERE transcription_timestamp_completed >= %s
+                   AND transcription_timestamp_completed <= NOW() - make_interval(secs => %s)
+                 ORDER BY transcription_timestamp_completed
+            """, (wm, SYNC_SETTLE_S))
+            while True:
+                rows = cur.fetchmany(SYNC_BATCH)
+                if not rows:
+                    break
+                ids = [r[0] for r in rows]
+                self.conn.executemany("""
+                    UPDATE episodes
+                       SET transcript_status = ?,
+                           transcription_timestamp_completed = ?
+                     WHERE id = ?
+                """, [(r[1], _iso(r[2]), r[0]) for r in rows])
+                if with_transcripts:
+                    self._pull_transcripts(pg_db, ids)
+                    self._reindex(ids)
+                self._set_state(key, _iso(rows[-1][2]))
+                self.conn.commit()
+                synced += len(rows)
+        return synced
+
+    def _pull_transcripts(self, pg_db, ids):
+        # separate (unnamed) cursor: the named one is still iterating
+        with pg_db.conn.cursor() as cur:
+            cur.execute("""
+                SELECT s.episode_id,
+                       string_agg(s.text, ' ' ORDER BY s.seg_idx),
+                       MAX(e.transcript_duration_s),
+                       MAX(e.word_count)
+                  FROM transcript_segments s
+                  JOIN episodes e ON e.id = s.episode_id
+                 WHERE s.episode_id = ANY(%s)
+              GROUP BY s.episode_id
+            """, (ids,))
+            rows = cur.fetchall()
+        self.conn.executemany("""
+            UPDATE episodes
+               SET transcript_text = ?, transcript_duration_s = ?, word_count = ?
+             WHERE id = ?
+        """, [(r[1], float(r[2] or 0), int(r[3] or 0), r[0]) for r in rows])
+
+    # ---------------- DBClient-compatible readers ----------------
+
+    def get_podcasts(self):
+        return [dict(r) for r in self.conn.execute("SELECT * FROM podcasts")]
+
+    def get_episodes(self):
+        return [dict(r) for r in self.conn.execute(
+            "SELECT * FROM episodes ORDER BY pub_date IS NULL, pub_date DESC")]
+
+    def get_id_list(self):
+        return [r[0] for r in self.conn.execute("SELECT id FROM episodes")]
+
+    def get_existing_ids(self, candidate_ids):
+        """take a list of ids and return those that are actually in the replica"""
+        candidate_ids = list(candidate_ids)
+        found = set()
+        for i in range(0, len(candidate_ids), 500):
+            chunk = candidate_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            found.update(r[0] for r in self.conn.execute(
+                f"SELECT id FROM episodes WHERE id IN ({marks})", chunk))
+        return found
+
+    def ep_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM episodes").fetchone()[0]
+
+    def recent_episode_counts(self):
+        """Episode counts for the 7 most recent distinct days with episodes."""
+        return [tuple(r) for r in self.conn.execute("""
+            SELECT date(date_entered) AS day, COUNT(*) AS episode_count
+              FROM episodes
+          GROUP BY day
+          ORDER BY day DESC
+             LIMIT 7
+        """)]
+
+    def _fts(self, column: Optional[str], search_string: str):
+        # quote the phrase so user input can't inject FTS5 syntax
+        query = '"' + search_string.replace('"', '""') + '"'
+        if column:
+            query = f"{column} : {query}"
+        return [dict(r) for r in self.conn.execute("""
+            SELECT e.*
+              FROM episodes_fts f
+              JOIN episodes e ON e.id = f.episode_id
+             WHERE episodes_fts MATCH ?
+          ORDER BY rank
+        """, (query,))]
+
+    def search_in_title(self, search_string):
+        return self._fts("title", search_string)
+
+    def search_in_description(self, search_string):
+        return self._fts("description", search_string)
+
+    def search_transcripts(self, search_string):
+        return self._fts("transcript", search_string)
+
+    def search_title_and_description(self, search_term):
+        in_title = self.search_in_title(search_term)
+        in_description = self.search_in_description(search_term)
+        description_ids = {d['id'] for d in in_description}
+        return [d for d in in_title if d['id'] not in description_ids] + in_description
+
+    def get_transcript_for_episode(self, episode_id):
+        row = self.conn.execute(
+            "SELECT transcript_text FROM episodes WHERE id = ?", (episode_id,)).fetchone()
+        return row[0] if row and row[0] else ""
+
+    def nth_most_recent_transcription(self, n: int = 1) -> Optional[dict]:
+        row = self.conn.execute("""
+            SELECT id, audio_path, transcription_timestamp_completed
+              FROM episodes
+             WHERE transcription_timestamp_completed IS NOT NULL
+             ORDER BY transcription_timestamp_completed DESC, id DESC
+             LIMIT 1 OFFSET ?
+        """, (max(0, n - 1),)).fetchone()
+        if not row:
+            return None
+        return {"id": row[0], "audio_path": row[1], "completed_at": row[2]}
+
+    def transcript_stats(self, episode_id: str) -> dict:
+        row = self.conn.execute(
+            "SELECT transcript_duration_s, word_count FROM episodes WHERE id = ?",
+            (episode_id,)).fetchone()
+        if not row:
+            return {"duration_s": 0.0, "word_count": 0}
+        return {"duration_s": float(row[0] or 0.0), "word_count": int(row[1] or 0)}
+
+    def transcript_words_excerpt(self, episode_id: str, limit_words: int = 1000) -> Tuple[str, int]:
+        toks = self.get_transcript_for_episode(episode_id).split()
+        return " ".join(toks[:limit_words]), min(limit_words, len(toks))
+
+    def recent_transcription_counts(self, limit_days: int = 7):
+        rows = self.conn.execute("""
+            SELECT date(transcription_timestamp_completed) AS day, COUNT(*) AS cnt
+              FROM episodes
+             WHERE transcription_timestamp_completed IS NOT NULL
+               AND transcript_status = 'done'
+          GROUP BY day
+          ORDER BY day DESC
+             LIMIT ?
+        """, (limit_days,)).fetchall()
+        return [{"day": r[0], "count": int(r[1])} for r in rows]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
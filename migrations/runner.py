@@ -0,0 +1,374 @@
+"""
+Versioned, online migration runner.
+
+    python -m migrations.runner status
+    python -m migrations.runner up [--target N] [--batch 5000] [--throttle-ms 100]
+
+Migrations live next to this file as vNNNN_<name>.py and expose:
+
+    VERSION = 3
+    NAME = "summary_columns"
+    def up(m):            # m is a Migration
+        m.ddl("ALTER TABLE episodes ADD COLUMN IF NOT EXISTS ...")
+        m.update_in_chunks("fill", "episodes", set_sql="...", where_sql="...")
+        m.ddl("CREATE INDEX CONCURRENTLY IF NOT EXISTS ...", autocommit=True)
+
+Rules that keep the transcription fleet running while this works:
+  * DDL runs with a short lock_timeout and is retried, so an ALTER never
+    sits in the lock queue blocking claim_episodes behind it. A concurrent
+    index build cut off by the timeout leaves an INVALID index; it is dropped
+    and rebuilt rather than skipped by IF NOT EXISTS.
+  * Backfills are keyset-chunked: each chunk is its own short transaction
+    that also records its progress, so Ctrl-C / crashes resume at the last
+    committed key. Chunk size adapts to CHUNK_TARGET_S and the runner sleeps
+    between chunks (throttle).
+  * up() is re-run from the top on resume, so every step must be idempotent
+    (IF NOT EXISTS, WHERE-guarded updates); finished backfill steps are skipped.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import importlib
+
+import psycopg2
+
+from db_client import get_db_client
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+VERSION_FILE_RE = re.compile(r"^v(\d{4})_\w+\.py$")
+
+LOCK_TIMEOUT = os.getenv("MIGRATE_LOCK_TIMEOUT", "3s")
+STATEMENT_TIMEOUT = os.getenv("MIGRATE_STATEMENT_TIMEOUT", "60s")
+CHUNK_TARGET_S = float(os.getenv("MIGRATE_CHUNK_TARGET_S", "1.0"))
+DDL_RETRIES = int(os.getenv("MIGRATE_DDL_RETRIES", "20"))
+ADVISORY_LOCK_KEY = 7262_0001  # one runner at a time per database
+
+
+def ensure_tables(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version     INT PRIMARY KEY,
+                name        TEXT NOT NULL,
+                status      TEXT NOT NULL DEFAULT 'running',   -- 'running' | 'done'
+                started_at  TIMESTAMPTZ DEFAULT NOW(),
+                applied_at  TIMESTAMPTZ
+            );
+            CREATE TABLE IF NOT EXISTS migration_backfills (
+                version     INT,
+                step        TEXT,
+                last_key    TEXT,
+                rows_done   BIGINT NOT NULL DEFAULT 0,
+                done        BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at  TIMESTAMPTZ DEFAULT NOW(),
+                PRIMARY KEY (version, step)
+            );
+        """)
+    conn.commit()
+
+
+def discover():
+    """Return [(version, module_name)] sorted by version."""
+    found = []
+    for fn in os.listdir(MIGRATIONS_DIR):
+        m = VERSION_FILE_RE.match(fn)
+        if m:
+            found.append((int(m.group(1)), fn[:-3]))
+    found.sort()
+    versions = [v for v, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return found
+
+
+def applied_versions(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, status FROM schema_migrations")
+        return dict(cur.fetchall())
+
+
+def _is_lock_timeout(e) -> bool:
+    return getattr(e, "pgcode", None) in ("55P03", "57014")  # lock_not_available, query_canceled
+
+
+CONCURRENT_INDEX_RE = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\S+)\s+ON\b",
+    re.IGNORECASE)
+
+
+def _index_valid(cur, index: str):
+    """pg_index.indisvalid for an index name, or None if there is no such index."""
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (index,))
+    row = cur.fetchone()
+    return None if row is None else row[0]
+
+
+class Migration:
+    """Context handed to a migration's up(); wraps the connection with online-safe helpers."""
+
+    def __init__(self, conn, version: int, name: str,
+                 batch_size: int = 5000, throttle_s: float = 0.1):
+        self.conn = conn
+        self.version = version
+        self.name = name
+        self.batch_size = batch_size
+        self.throttle_s = throttle_s
+
+    # ---------------- DDL ----------------
+
+    def ddl(self, sql: str, params=None, autocommit: bool = False):
+        """
+        Run a schema change with a short lock_timeout, retrying with backoff.
+        autocommit=True is required for CREATE INDEX CONCURRENTLY.
+
+        A concurrent index build that times out part way leaves an INVALID
+        index behind, which IF NOT EXISTS would then skip; so before each
+        attempt an invalid index of that name is dropped, and afterwards the
+        index must exist and be valid.
+        """
+        match = CONCURRENT_INDEX_RE.search(sql)
+        index = match.group(1) if match else None
+        for attempt in range(1, DDL_RETRIES + 1):
+            try:
+                if autocommit:
+                    self.conn.rollback()
+                    self.conn.autocommit = True
+                try:
+                    with self.conn.cursor() as cur:
+                        cur.execute("SET lock_timeout = %s", (LOCK_TIMEOUT,))
+                        if index and _index_valid(cur, index) is False:
+                            print(f"[v{self.version:04d}] dropping invalid index {index} "
+                                  f"left by an interrupted build")
+                            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+                        cur.execute(sql, params)
+                        if index and not _index_valid(cur, index):
+                            raise RuntimeError(f"[v{self.version:04d}] index {index} "
+                                               f"is missing or invalid after its build")
+                        cur.execute("RESET lock_timeout")
+                finally:
+                    if autocommit:
+                        self.conn.autocommit = False
+                self.conn.commit()
+                return
+            except psycopg2.Error as e:
+                self.conn.rollback()
+                if not _is_lock_timeout(e) or attempt == DDL_RETRIES:
+                    raise
+                wait = min(30.0, 0.5 * 2 ** attempt)
+                print(f"[v{self.version:04d}] lock busy, retrying DDL in {wait:.1f}s "
+                      f"({attempt}/{DDL_RETRIES})")
+                time.sleep(wait)
+
+    # ---------------- backfills ----------------
+
+    def _progress(self, step: str):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO migration_backfills (version, step)
+                VALUES (%s, %s)
+                ON CONFLICT (version, step) DO NOTHING
+            """, (self.version, step))
+            cur.execute("""
+                SELECT last_key, rows_done, done
+                  FROM migration_backfills
+                 WHERE version = %s AND step = %s
+            """, (self.version, step))
+            row = cur.fetchone()
+        self.conn.commit()
+        return row
+
+    def _estimate_rows(self, table: str) -> int:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+            row = cur.fetchone()
+        self.conn.commit()
+        return max(0, int(row[0])) if row else 0
+
+    def backfill(self, step: str, table: str, chunk_sql: str, key: str = "id",
+                 params: dict = None):
+        """
+        Run chunk_sql once per keyset chunk of `table` ordered by `key`.
+
+        chunk_sql sees a CTE named `batch` holding this chunk's keys and must be
+        a data-modifying statement WITHOUT a RETURNING clause, e.g.
+            UPDATE episodes t SET ... FROM batch b WHERE t.id = b.id AND ...
+            INSERT INTO x (...) SELECT ... FROM y JOIN batch b ON b.id = y.id
+        Each chunk commits together with its progress row.
+        """
+        last_key, rows_done, done = self._progress(step)
+        if done:
+            print(f"[v{self.version:04d}] {step}: already complete ({rows_done:,} rows)")
+            return
+
+        est = self._estimate_rows(table)
+        batch_size = self.batch_size
+        scanned = 0
+        t_start = time.time()
+        print(f"[v{self.version:04d}] {step}: starting at key {last_key!r} (~{est:,} rows in {table})")
+
+        while True:
+            key_filter = f"WHERE {key} > %(last_key)s" if last_key is not None else ""
+            sql = f"""
+                WITH batch AS (
+                    SELECT {key} FROM {table}
+                    {key_filter}
+                    ORDER BY {key}
+                    LIMIT %(limit)s
+                ), work AS (
+                    {chunk_sql}
+                    RETURNING 1
+                )
+                SELECT (SELECT MAX({key})::text FROM batch),
+                       (SELECT COUNT(*) FROM batch),
+                       (SELECT COUNT(*) FROM work)
+            """
+            args = dict(params or {}, last_key=last_key, limit=batch_size)
+            t0 = time.time()
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute("SET LOCAL lock_timeout = %s", (LOCK_TIMEOUT,))
+                    cur.execute("SET LOCAL statement_timeout = %s", (STATEMENT_TIMEOUT,))
+                    cur.execute(sql, args)
+                    max_key, n_batch, n_work = cur.fetchone()
+                    if n_batch:
+                        cur.execute("""
+                            UPDATE migration_backfills
+                               SET last_key = %s, rows_done = rows_done + %s, updated_at = NOW()
+                             WHERE version = %s AND step = %s
+                        """, (max_key, n_work, self.version, step))
+                    else:
+                        cur.execute("""
+                            UPDATE migration_backfills
+                               SET done = TRUE, updated_at = NOW()
+                             WHERE version = %s AND step = %s
+                        """, (self.version, step))
+                self.conn.commit()
+            except psycopg2.Error as e:
+                self.conn.rollback()
+                if not _is_lock_timeout(e):
+                    raise
+                batch_size = max(100, batch_size // 2)
+                print(f"[v{self.version:04d}] {step}: chunk hit lock/statement timeout; "
+                      f"retrying with batch={batch_size}")
+                time.sleep(max(self.throttle_s, 1.0))
+                continue
+
+            if not n_batch:
+                print(f"[v{self.version:04d}] {step}: done, {rows_done:,} rows changed "
+                      f"in {time.time() - t_start:.0f}s")
+                return
+
+            elapsed = time.time() - t0
+            last_key = max_key
+            rows_done += n_work
+            scanned += n_batch
+            rate = scanned / max(1e-6, time.time() - t_start)
+            pct = f"{min(100.0, 100.0 * scanned / est):.1f}%" if est else "?"
+            print(f"[v{self.version:04d}] {step}: scanned {scanned:,} ({pct}), "
+                  f"changed {rows_done:,}, {rate:,.0f} rows/s, batch={batch_size}, last={last_key!r}")
+
+            # keep each chunk's transaction short: adapt size toward the target duration
+            if elapsed > 2 * CHUNK_TARGET_S:
+                batch_size = max(100, batch_size // 2)
+            elif elapsed < CHUNK_TARGET_S / 2:
+                batch_size = min(self.batch_size * 8, batch_size * 2)
+            time.sleep(self.throttle_s)
+
+    def update_in_chunks(self, step: str, table: str, set_sql: str,
+                         where_sql: str = "TRUE", key: str = "id", params: dict = None):
+        """Chunked `UPDATE table SET set_sql WHERE where_sql` (columns unqualified or as t.col)."""
+        self.backfill(step, table, f"""
+            UPDATE {table} t
+               SET {set_sql}
+              FROM batch b
+             WHERE t.{key} = b.{key}
+               AND ({where_sql})
+        """, key=key, params=params)
+
+
+def migrate(target: int = None, batch_size: int = 5000, throttle_s: float = 0.1):
+    with get_db_client() as db:
+        conn = db.conn
+        ensure_tables(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                raise RuntimeError("Another migration runner holds the lock; aborting.")
+        conn.commit()
+        try:
+            status = applied_versions(conn)
+            for version, module_name in discover():
+                if target is not None and version > target:
+                    break
+                if status.get(version) == "done":
+                    continue
+                mod = importlib.import_module(f"migrations.{module_name}")
+                name = getattr(mod, "NAME", module_name)
+                print(f"== v{version:04d} {name} "
+                      f"({'resuming' if version in status else 'starting'})")
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        INSERT INTO schema_migrations (version, name) VALUES (%s, %s)
+                        ON CONFLICT (version) DO NOTHING
+                    """, (version, name))
+                conn.commit()
+
+                mod.up(Migration(conn, version, name, batch_size=batch_size, throttle_s=throttle_s))
+
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        UPDATE schema_migrations
+                           SET status = 'done', applied_at = NOW()
+                         WHERE version = %s
+                    """, (version,))
+                conn.commit()
+                print(f"== v{version:04d} {name} done")
+        finally:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+            conn.commit()
+
+
+def print_status():
+    with get_db_client() as db:
+        ensure_tables(db.conn)
+        status = applied_versions(db.conn)
+        with db.conn.cursor() as cur:
+            cur.execute("""
+                SELECT version, step, rows_done, done, last_key
+                  FROM migration_backfills ORDER BY version, step
+            """)
+            steps = cur.fetchall()
+    for version, module_name in discover():
+        print(f"v{version:04d}  {status.get(version, 'pending'):<8}  {module_name}")
+        for v, step, rows_done, done, last_key in steps:
+            if v == version:
+                state = "done" if done else f"at {last_key!r}"
+                print(f"        backfill {step}: {rows_done:,} rows, {state}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Online, resumable schema migrations.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Show applied/pending migrations and backfill progress.")
+    up = sub.add_parser("up", help="Apply pending migrations (resumes interrupted ones).")
+    up.add_argument("--target", type=int, default=None, help="stop after this version")
+    up.add_argument("--batch", type=int, default=5000, help="initial rows per backfill chunk")
+    up.add_argument("--throttle-ms", type=int, default=100, help="sleep between chunks")
+    args = ap.parse_args(argv)
+
+    if args.command == "status":
+        print_status()
+    else:
+        try:
+            migrate(args.target, args.batch, args.throttle_ms / 1000.0)
+        except KeyboardInterrupt:
+            print("Interrupted; progress is saved. Re-run `up` to resume.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Transcription checkout columns (transcript_status / lease_expires_at / worker_id).
+Online port of the old migrate_add_ep_checkout.py: the 'done' backfill runs in
+keyset chunks instead of one UPDATE over all of episodes.
+"""
+VERSION = 1
+NAME = "ep_checkout"
+
+
+def up(m):
+    m.ddl("""
+        ALTER TABLE episodes
+          ADD COLUMN IF NOT EXISTS transcript_status text NOT NULL DEFAULT 'pending',
+          ADD COLUMN IF NOT EXISTS lease_expires_at timestamptz,
+          ADD COLUMN IF NOT EXISTS worker_id text
+    """)
+
+    # mark DONE where a transcript already exists
+    m.update_in_chunks(
+        "mark_done_with_segments", "episodes",
+        set_sql="transcript_status = 'done', worker_id = NULL, lease_expires_at = NULL",
+        where_sql="""t.transcript_status <> 'done'
+                 AND EXISTS (SELECT 1 FROM transcript_segments ts WHERE ts.episode_id = t.id)""",
+    )
+
+    m.ddl("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS episodes_transcribe_queue_idx
+            ON episodes (transcript_status, lease_expires_at)
+    """, autocommit=True)
@@ -0,0 +1,27 @@
+"""
+transcription_timestamp_completed, plus a chunked backfill marking episodes
+with segments as done and stamping a completion time on every done episode.
+Online port of the old migrate_add_completion_date.py.
+"""
+VERSION = 2
+NAME = "completion_date"
+
+
+def up(m):
+    m.ddl("""
+        ALTER TABLE episodes
+          ADD COLUMN IF NOT EXISTS transcription_timestamp_completed timestamptz
+    """)
+
+    m.update_in_chunks(
+        "mark_done_with_segments", "episodes",
+        set_sql="transcript_status = 'done'",
+        where_sql="""t.transcript_status <> 'done'
+                 AND EXISTS (SELECT 1 FROM transcript_segments ts WHERE ts.episode_id = t.id)""",
+    )
+
+    m.update_in_chunks(
+        "stamp_completion", "episodes",
+        set_sql="transcription_timestamp_completed = NOW()",
+        where_sql="t.transcript_status = 'done' AND t.transcription_timestamp_completed IS NULL",
+    )
@@ -0,0 +1,47 @@
+"""
+Per-episode transcript summary columns, maintained by mark_done():
+segment_count, word_count, transcript_duration_s, audio_duration_s.
+Adding NOT NULL DEFAULT 0 columns is metadata-only, so the ALTER is instant;
+the backfill then fills episodes that already have segments, chunk by chunk.
+"""
+VERSION = 3
+NAME = "transcript_summary"
+
+
+def up(m):
+    m.ddl("""
+        ALTER TABLE episodes
+          ADD COLUMN IF NOT EXISTS segment_count INT NOT NULL DEFAULT 0,
+          ADD COLUMN IF NOT EXISTS word_count INT NOT NULL DEFAULT 0,
+          ADD COLUMN IF NOT EXISTS transcript_duration_s NUMERIC,
+          ADD COLUMN IF NOT EXISTS audio_duration_s NUMERIC
+    """)
+
+    m.backfill("summarize_transcripts", "episodes", """
+        UPDATE episodes t
+           SET segment_count = s.segment_count,
+               word_count = s.word_count,
+               transcript_duration_s = s.transcript_duration_s,
+               audio_duration_s = COALESCE(t.audio_duration_s, t.duration_s)
+          FROM (
+                SELECT ts.episode_id,
+                       COUNT(*) AS segment_count,
+                       COALESCE(SUM((SELECT COUNT(*) FROM transcript_words w
+                                      WHERE w.seg_id = ts.id)), 0) AS word_count,
+                       MAX(ts.end_s) - MIN(ts.start_s) AS transcript_duration_s
+                  FROM transcript_segments ts
+                  JOIN batch b ON b.id = ts.episode_id
+              GROUP BY ts.episode_id
+               ) s
+         WHERE t.id = s.episode_id
+           AND t.transcript_duration_s IS NULL
+    """)
+
+    m.ddl("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS episodes_with_transcript_idx
+            ON episodes (pub_date DESC NULLS LAST) WHERE segment_count > 0
+    """, autocommit=True)
+    m.ddl("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS episodes_no_transcript_idx
+            ON episodes (pub_date DESC NULLS LAST) WHERE segment_count = 0
+    """, autocommit=True)
@@ -0,0 +1,23 @@
+"""
+transcript_checkpoints: finished windows of long episodes (chunking.py), so a
+worker that reclaims an episode resumes instead of starting over. Rows are
+removed once the full transcript is written.
+"""
+VERSION = 4
+NAME = "transcript_checkpoints"
+
+
+def up(m):
+    m.ddl("""
+        CREATE TABLE IF NOT EXISTS transcript_checkpoints (
+            episode_id  TEXT REFERENCES episodes(id) ON DELETE CASCADE,
+            window_idx  INT,
+            model       TEXT NOT NULL,
+            start_s     NUMERIC NOT NULL,
+            end_s       NUMERIC NOT NULL,
+            seg_rows    JSONB NOT NULL,
+            word_rows   JSONB NOT NULL,
+            created_at  TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (episode_id, window_idx)
+        )
+    """)
@@ -0,0 +1,19 @@
+"""
+Inputs and outputs of the transcription model router (routing.py):
+podcasts.priority (0 = normal, higher = more accurate model) and
+episodes.transcript_model, stamped by mark_done().
+Both are metadata-only ADD COLUMNs.
+"""
+VERSION = 5
+NAME = "model_routing"
+
+
+def up(m):
+    m.ddl("""
+        ALTER TABLE podcasts
+          ADD COLUMN IF NOT EXISTS priority INT NOT NULL DEFAULT 0
+    """)
+    m.ddl("""
+        ALTER TABLE episodes
+          ADD COLUMN IF NOT EXISTS transcript_model TEXT
+    """)
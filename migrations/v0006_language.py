@@ -0,0 +1,20 @@
+"""
+Language ID (langid.py): podcasts.language is a feed's detected language and
+language_votes how many episodes in a row agreed (stable at ASR_LANG_STABLE);
+episodes.language is what each episode was detected or transcribed as.
+Non-target episodes skipped by policy get transcript_status = 'skipped'.
+"""
+VERSION = 6
+NAME = "language"
+
+
+def up(m):
+    m.ddl("""
+        ALTER TABLE podcasts
+          ADD COLUMN IF NOT EXISTS language TEXT,
+          ADD COLUMN IF NOT EXISTS language_votes INT NOT NULL DEFAULT 0
+    """)
+    m.ddl("""
+        ALTER TABLE episodes
+          ADD COLUMN IF NOT EXISTS language TEXT
+    """)
@@ -0,0 +1,36 @@
+"""
+transcription_runs: one row per transcription attempt with per-stage timings
+(see transcribe.py), the audio length and real-time factor, so a host can be
+told apart as I/O-bound (download/decode) or compute-bound (inference).
+`podscrape.py workers` summarises the recent rows per worker.
+"""
+VERSION = 7
+NAME = "transcription_runs"
+
+
+def up(m):
+    m.ddl("""
+        CREATE TABLE IF NOT EXISTS transcription_runs (
+            id           BIGSERIAL PRIMARY KEY,
+            episode_id   TEXT REFERENCES episodes(id) ON DELETE CASCADE,
+            worker_id    TEXT NOT NULL,
+            model        TEXT,
+            device       TEXT,
+            status       TEXT NOT NULL,
+            audio_s      REAL,
+            claim_s      REAL,
+            queue_s      REAL,
+            download_s   REAL,
+            decode_s     REAL,
+            inference_s  REAL,
+            db_write_s   REAL,
+            finalize_s   REAL,
+            rtf          REAL,
+            queue_depth  INT,
+            finished_at  TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
+    m.ddl("""
+        CREATE INDEX IF NOT EXISTS transcription_runs_worker_idx
+            ON transcription_runs (worker_id, finished_at)
+    """)
@@ -0,0 +1,24 @@
+"""
+Claim order for claim_episodes: episodes.priority (higher first), then
+fair_seq, a round-robin position within the episode's podcast (filled by
+DBClient.resequence_claims, i.e. `podscrape.py requeue`), plus an optional
+keyword relevance_score (`podscrape.py relevance`).
+The partial index lets the claim read pending episodes in that order
+instead of sorting the whole queue.
+"""
+VERSION = 8
+NAME = "claim_order"
+
+
+def up(m):
+    m.ddl("""
+        ALTER TABLE episodes
+          ADD COLUMN IF NOT EXISTS priority INT NOT NULL DEFAULT 0,
+          ADD COLUMN IF NOT EXISTS relevance_score REAL,
+          ADD COLUMN IF NOT EXISTS fair_seq INT
+    """)
+    m.ddl("""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS episodes_claim_idx
+            ON episodes (priority DESC, fair_seq, date_entered DESC)
+         WHERE transcript_status IN ('pending', 'processing')
+    """, autocommit=True)
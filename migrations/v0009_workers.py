@@ -0,0 +1,19 @@
+"""
+workers: each transcribe worker's measured throughput (audio seconds per wall
+second), written by the prefetcher every ASR_WORKER_REPORT_S and read back at
+startup, so claims are sized to what the worker can finish within
+ASR_LEASE_HORIZON_MIN (see prefetch.py).
+"""
+VERSION = 9
+NAME = "workers"
+
+
+def up(m):
+    m.ddl("""
+        CREATE TABLE IF NOT EXISTS workers (
+            worker_id    TEXT PRIMARY KEY,
+            throughput   REAL,
+            slots        INT,
+            updated_at   TIMESTAMPTZ DEFAULT NOW()
+        )
+    """)
@@ -0,0 +1,266 @@
+"""
+Long-lived local ASR model server.
+
+Every script that calls whisper_runtime.get_model / get_word_level_model
+pays the full model load (and oa_* drags in torch) before doing anything.
+`python model_server.py` keeps whisper_runtime.MODELS entries loaded and
+serves them over a Unix socket. With ASR_MODEL_SERVER=<socket path> set,
+get_model / get_word_level_model return a proxy with the same
+(model, run_fn) contract instead of loading anything, and transcribe.py
+borrows slots from the server instead of building its own ModelPool, so
+CLI tools start instantly and several pipelines share one copy of each model.
+
+Protocol: multiprocessing.connection over AF_UNIX (length-prefixed pickles),
+one request at a time per connection, replies ("ok", result) or ("error", msg):
+    ("ping",   None)                                          -> {"pid", "uptime_s", "loaded"}
+    ("load",   (name, device))                                -> {"slots"}
+    ("run",    (name, device, word_level, audio, regions, language)) -> runner result
+    ("detect", (name, device, audio))                         -> (language, prob)
+    ("unload", (name, device))                                -> True if it was evicted
+    ("stats",  None)                                          -> whisper_runtime.ModelCache.stats()
+Audio is a path (opened by the server), a decoded array, or a /dev/shm PCM
+reference (see cpu_workers._ship) so prefetched audio isn't copied through
+the socket. Requests are pickles, so the socket is created 0600: only the
+user running the server can connect.
+
+A fw_* model is built with ASR_MODEL_SERVER_WORKERS CTranslate2 workers and
+serves that many calls at once; oa_* models serve one at a time. Models live
+in a whisper_runtime.ModelCache, so ASR_MODEL_CACHE_MB bounds what stays
+loaded (least recently used, idle models go first).
+
+    python model_server.py --preload fw_base,fw_tiny [--device cuda] [--socket PATH]
+"""
+import os
+import time
+import queue
+import argparse
+import threading
+import traceback
+from contextlib import contextmanager
+from multiprocessing.connection import Listener, Client
+
+SOCKET_PATH = os.getenv("ASR_MODEL_SERVER")  # set → clients go through the server
+DEFAULT_SOCKET = SOCKET_PATH or "/tmp/podscrape-asr.sock"
+SERVER_WORKERS = int(os.getenv("ASR_MODEL_SERVER_WORKERS", "2"))
+
+
+# ---------------- server ----------------
+
+class ModelServer:
+    def __init__(self, workers: int = SERVER_WORKERS):
+        from whisper_runtime import ModelCache
+        self.workers = max(1, workers)
+        self.started = time.time()
+        # same single-flight / budget / LRU rules as in-process use (ASR_MODEL_CACHE_MB)
+        self.cache = ModelCache(num_workers=self.workers)
+        self._sems = {}  # cache key -> Semaphore(slots)
+        self._lock = threading.Lock()
+
+    def slots(self, name: str) -> int:
+        """Calls a model serves at once: its CTranslate2 workers, or one for oa_*."""
+        return self.workers if name.startswith("fw_") else 1
+
+    def _sem(self, key):
+        with self._lock:
+            if key not in self._sems:
+                self._sems[key] = threading.Semaphore(self.slots(key[0]))
+            return self._sems[key]
+
+    @contextmanager
+    def _use(self, name: str, device: str):
+        """The model, pinned in the cache and holding one of its slots."""
+        with self.cache.use(name, device) as model, self._sem(self.cache.key(name, device)):
+            yield model
+
+    def handle(self, op: str, payload):
+        from whisper_runtime import MODELS
+        from cpu_workers import _local_audio
+        if op == "ping":
+            return {"pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+                    "loaded": [f"{m['name']}@{m['device']}" for m in self.cache.stats() if m["resident"]]}
+        if op == "load":
+            name, device = payload
+            self.cache.get(name, device)
+            return {"slots": self.slots(name)}
+        if op == "unload":
+            return self.cache.evict(*payload)
+        if op == "stats":
+            return self.cache.stats()
+        if op == "run":
+            name, device, word_level, audio, regions, language = payload
+            run_fn = MODELS[name]["word_runner" if word_level else "seg_runner"]
+            with self._use(name, device) as model:
+                return run_fn(model, _local_audio(audio), regions=regions, language=language)
+        if op == "detect":
+            name, device, audio = payload
+            if "lang_runner" not in MODELS.get(name, {}):
+                raise ValueError(f"{name} has no language detection")
+            with self._use(name, device) as model:
+                return MODELS[name]["lang_runner"](model, _local_audio(audio))
+        raise ValueError(f"unknown op {op!r}")
+
+    def _serve_conn(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.handle(op, payload))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self, path: str = DEFAULT_SOCKET):
+        if os.path.exists(path):
+            try:
+                Client(path, family="AF_UNIX").close()
+            except OSError:
+                os.unlink(path)  # left behind by a server that died
+            else:
+                raise RuntimeError(f"a model server is already listening on {path}")
+        old_umask = os.umask(0o177)  # socket is 0600 from the moment it exists
+        try:
+            listener = Listener(path, family="AF_UNIX")
+        finally:
+            os.umask(old_umask)
+        print(f"[model server] listening on {path} (pid {os.getpid()})")
+        try:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve_conn, args=(conn,),
+                                 name="model-server-conn", daemon=True).start()
+        finally:
+            listener.close()
+
+
+# ---------------- client ----------------
+
+class _Connection:
+    """One connection per thread: each request waits for its reply, so threads can't share one."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def call(self, op: str, payload=None):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                conn = self._local.conn = Client(self.path, family="AF_UNIX")
+            except OSError as e:
+                raise ConnectionError(f"no model server on {self.path} ({e}); "
+                                      f"start one with `python model_server.py`") from e
+        try:
+            conn.send((op, payload))
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            self._local.conn = None
+            conn.close()
+            raise ConnectionError(f"model server on {self.path} went away: {e}") from e
+        if status != "ok":
+            raise RuntimeError(f"[model server] {result}")
+        return result
+
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def connect(path: str = None) -> _Connection:
+    path = path or DEFAULT_SOCKET
+    with _connections_lock:
+        if path not in _connections:
+            _connections[path] = _Connection(path)
+        return _connections[path]
+
+
+def _ship_audio(audio):
+    """Paths are made absolute (the server has its own cwd); arrays go as PCM refs when possible."""
+    if isinstance(audio, (str, os.PathLike)):
+        return os.path.abspath(os.fspath(audio))
+    from cpu_workers import _ship
+    return _ship(audio)
+
+
+class RemoteModel:
+    """Stands in for a loaded model: run_remote / detect_remote send the work to the server."""
+
+    def __init__(self, name: str, device: str = "cuda", word_level: bool = True, path: str = None):
+        self.name = name
+        self.device = device
+        self.word_level = word_level
+        self.conn = connect(path)
+        self.slots = self.conn.call("load", (name, device))["slots"]  # loads it if nobody has
+
+    def __repr__(self):
+        return f"RemoteModel({self.name!r}, {self.device!r} via {self.conn.path})"
+
+
+def run_remote(model: RemoteModel, audio, regions=None, language=None):
+    """Same contract as whisper_runtime's seg/word runners."""
+    return model.conn.call("run", (model.name, model.device, model.word_level,
+                                   _ship_audio(audio), regions, language))
+
+
+def detect_remote(model: RemoteModel, audio):
+    """Same contract as whisper_runtime's lang runners: (language, probability)."""
+    return model.conn.call("detect", (model.name, model.device, _ship_audio(audio)))
+
+
+class ServerModelPool:
+    """
+    ModelPool stand-in backed by the model server: one slot per call the
+    server runs at once for this model.
+        pool = ServerModelPool("fw_base", "cuda")
+        with pool.acquire() as (model, run_fn):
+            segs, words = run_fn(model, path)
+    """
+
+    def __init__(self, name: str, device: str = "cuda", path: str = None):
+        self.name = name
+        self.device = device
+        self.model = RemoteModel(name, device, path=path)
+        self.run_fn = run_remote
+        self.batch_fn = None  # batching across episodes needs the model in this process
+        self._free = queue.Queue()
+        for i in range(self.model.slots):
+            self._free.put(i)
+
+    @property
+    def size(self) -> int:
+        return self.model.slots
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        slot = self._free.get(timeout=timeout)
+        try:
+            yield self.model, self.run_fn
+        finally:
+            self._free.put(slot)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep ASR models loaded and serve them over a Unix socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="socket path (clients: ASR_MODEL_SERVER)")
+    parser.add_argument("--device", default=os.getenv("ASR_DEVICE", "cuda"), help="device for --preload")
+    parser.add_argument("--preload", default="", help="comma-separated models to load before listening")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                        help="concurrent calls per fw_* model (CTranslate2 num_workers)")
+    args = parser.parse_args()
+
+    server = ModelServer(workers=args.workers)
+    for name in filter(None, (n.strip() for n in args.preload.split(","))):
+        server.cache.get(name, args.device)
+    try:
+        server.serve_forever(args.socket)  # the listener removes its socket file on close
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import argparse
 import os
 from rss import get_unscraped_episodes, get_podnews_top_50_podcasts, update_rss_file
 from scrape import download_episodes_and_save_remotely, download_episodes_and_save_locally
-from db_client import get_db_client
+from db_client import get_db_client, RUN_STAGES
 
 DEFAULTS = {
     "workers_days": 7,   # fallback used by nothing here; left as example centralization
@@ -24,31 +24,85 @@ def scrape_episodes_from_rss_and_save_remotely():
     print(f"scraping {len(unscraped)} podcast episodes...")
     download_episodes_and_save_remotely(unscraped)
 
-def db_ep_count():
-    with get_db_client() as db:
+def _reader(local=False):
+    """DB context for read-only commands: remote Postgres, or the SQLite replica with --local."""
+    if local:
+        from local_replica import get_replica_client
+        return get_replica_client()
+    return get_db_client()
+
+def db_ep_count(local=False):
+    with _reader(local) as db:
         print(db.ep_count())
 
-def db_recent_count():
-    with get_db_client() as db:
+def db_recent_count(local=False):
+    with _reader(local) as db:
         rows = db.recent_episode_counts()
     for day, count in rows:
         print(f"{day}: {count}")
 
 # ---------- worker & transcription intel ----------
 
-def db_workers():
+def db_workers(minutes: int = 15):
     with get_db_client() as db:
         info = db.active_workers_info()
+        try:
+            runs = db.worker_run_stats(minutes)
+        except Exception as e:  # transcription_runs not migrated yet
+            db.conn.rollback()
+            print(f"(no run stats: {e})")
+            runs = []
+        try:
+            speeds = db.worker_throughputs()
+        except Exception:  # workers table not migrated yet
+            db.conn.rollback()
+            speeds = {}
 
     print("Active workers (status='processing'):")
     if not info["workers"]:
         print("  (none)")
     else:
         for w in info["workers"]:
+            speed = speeds.get(w["worker_id"])
+            rate = (f"  throughput={speed['throughput']:.1f} audio-s/s ({speed['slots']} slots)"
+                    if speed and speed["throughput"] else "")
             print(f"  worker={w['worker_id']}  processing={w['processing']}  "
-                  f"next_lease={w['next_lease_exp']}  last_lease={w['last_lease_exp']}")
+                  f"next_lease={w['next_lease_exp']}  last_lease={w['last_lease_exp']}{rate}")
     print(f"Pending episodes: {info['pending_total']}")
 
+    print(f"\nLast {minutes} min (transcription_runs):")
+    if not runs:
+        print("  (no runs)")
+    for r in runs:
+        stages = {st: r[f"{st}_s"] for st in RUN_STAGES}
+        total = sum(stages.values()) or 1.0
+        top = max(stages, key=stages.get)
+        rtf = f"{r['rtf']:.3f}" if r["rtf"] is not None else "-"
+        print(f"  worker={r['worker_id']}  runs={r['runs']} (failed {r['failed']})  "
+              f"audio={r['audio_s'] / 3600:.1f}h  RTF={rtf}  queue={r['queue_depth']}  "
+              f"model={r['models']}  device={r['devices']}")
+        print("    time by stage: " + "  ".join(
+            f"{st}={100 * v / total:.0f}%" for st, v in stages.items() if v))
+        print(f"    most time in: {top} ({100 * stages[top] / total:.0f}%)")
+
+# ---------- claim order ----------
+
+def db_requeue():
+    with get_db_client() as db:
+        n = db.resequence_claims()
+    print(f"Renumbered {n} episode(s) for round-robin claiming across podcasts.")
+
+def db_relevance(keywords_path: str, min_score: float = 0.1, boost: int = 1):
+    """Score episodes against a keyword file (one word or phrase per line, # comments)."""
+    with open(keywords_path, encoding="utf-8") as f:
+        keywords = [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+    with get_db_client() as db:
+        counts = db.set_relevance(keywords, min_score=min_score, boost=boost)
+        n = db.resequence_claims()
+    print(f"Scored {counts['scored']} episode(s) against {len(keywords)} keyword(s); "
+          f"{counts['boosted']} unfinished episode(s) raised to priority {boost}; "
+          f"{n} renumbered.")
+
 def _format_hms(seconds: float) -> str:
     s = int(round(seconds))
     h = s // 3600
@@ -56,9 +110,8 @@ def _format_hms(seconds: float) -> str:
     ss = s % 60
     return f"{h:02d}:{m:02d}:{ss:02d}"
 
-def db_nth_transcription(n: int):
-    from db_client import get_db_client
-    with get_db_client() as db:
+def db_nth_transcription(n: int, local=False):
+    with _reader(local) as db:
         rec = db.nth_most_recent_transcription(n)
         if not rec:
             print(f"No completed transcriptions found (n={n}).")
@@ -79,8 +132,8 @@ def db_nth_transcription(n: int):
         print("")
         print(f"(Printed {took} words.)")
 
-def db_recent_transcribed(limit_days: int = 7):
-    with get_db_client() as db:
+def db_recent_transcribed(limit_days: int = 7, local=False):
+    with _reader(local) as db:
         rows = db.recent_transcription_counts(limit_days)
     if not rows:
         print("No transcription completions found.")
@@ -89,15 +142,63 @@ def db_recent_transcribed(limit_days: int = 7):
     for r in rows:
         print(f"  {r['day']}: {r['count']}")
 
+def db_stats_report(dump_dir=None):
+    import db_stats
+    merged = db_stats.load_dumps(dump_dir)
+    if not merged:
+        print(f"No DB stats dumps found in {dump_dir or db_stats.DB_STATS_DIR!r} "
+              f"(run workers with DB_STATS=1).")
+        return
+    print(f"{'method':<34} {'calls':>8} {'err':>5} {'mean ms':>9} {'p50':>7} "
+          f"{'p95':>7} {'max ms':>9} {'rows':>10} {'KB sent':>9}")
+    for name, e in sorted(merged.items(), key=lambda kv: -kv[1]["total_ms"]):
+        mean = e["total_ms"] / e["calls"] if e["calls"] else 0.0
+        print(f"{name:<34} {e['calls']:>8,} {e['errors']:>5} {mean:>9.1f} "
+              f"{db_stats.percentile_ms(e['hist'], 0.50):>7.0f} "
+              f"{db_stats.percentile_ms(e['hist'], 0.95):>7.0f} "
+              f"{e['max_ms']:>9.1f} {e['rows']:>10,} {e['bytes'] / 1024:>9.1f}")
+
+# ---------- local replica ----------
+
+def sync_local(with_transcripts=False, full=False):
+    from local_replica import get_replica_client
+    with get_db_client() as db, get_replica_client() as replica:
+        counts = replica.sync(db, with_transcripts=with_transcripts, full=full)
+    print(f"Synced {counts['episodes']} episode rows and "
+          f"{counts['transcriptions']} completed transcriptions into {replica.path}")
+
+def search_local(term):
+    from local_replica import get_replica_client
+    with get_replica_client() as db:
+        rows = db.search_title_and_description(term) + db.search_transcripts(term)
+    seen = set()
+    for r in rows:
+        if r["id"] in seen:
+            continue
+        seen.add(r["id"])
+        print(f"{r['id']}  {r['pub_date'] or '':<26}  {r['title']}")
+    print(f"({len(seen)} episodes)")
+
+# ---------- bulk export ----------
+
+def export_corpus(out_dir=None, fmt="parquet", full=False, no_words=False):
+    from export import export_transcripts, EXPORT_DIR, TABLES
+    tables = [t for t in TABLES if not (no_words and t == "transcript_words")]
+    counts = export_transcripts(out_dir or EXPORT_DIR, fmt=fmt, full=full, tables=tables)
+    for table, n in counts.items():
+        print(f"  {table}: {n:,} rows")
+
 # ---------- update orchestration ----------
 
 def update_local():
     update_rss_file()
     scrape_episodes_from_rss_and_save_locally()
+    db_requeue()  # new episodes join the round-robin
 
 def update_remote():
     update_rss_file()
     scrape_episodes_from_rss_and_save_remotely()
+    db_requeue()
 
 # ---------- CLI ----------
 
@@ -110,29 +211,83 @@ COMMANDS = [
     },
     { "name": "scrape_remote", "help": "Scrape episodes from RSS and upload to remote.", "func": lambda a: scrape_remote() },
     { "name": "scrape_local",  "help": "Scrape episodes from RSS and save locally.",    "func": lambda a: scrape_local()  },
-    { "name": "count",         "help": "Print total episodes in DB.",                   "func": lambda a: db_ep_count()   },
-    { "name": "recent",        "help": "Episodes saved in the last week.",              "func": lambda a: db_recent_count() },
+    { "name": "count",         "help": "Print total episodes in DB.",                   "func": lambda a: db_ep_count(a.local) },
+    { "name": "recent",        "help": "Episodes saved in the last week.",              "func": lambda a: db_recent_count(a.local) },
     { "name": "update_local",  "help": "Update RSS → scrape → save locally.",           "func": lambda a: update_local()  },
     { "name": "update_remote", "help": "Update RSS → scrape → save remotely.",          "func": lambda a: update_remote() },
-    { "name": "workers",       "help": "Active workers and pending count.",             "func": lambda a: db_workers()    },
+    {
+        "name": "workers",
+        "help": "Active workers, pending count and recent per-worker RTF / queue depth / stage times.",
+        "func": lambda a: db_workers(a.minutes),
+        "args": [ (["--minutes"], {"type": int, "default": 15, "help": "window for run stats"}) ],
+    },
+    {
+        "name": "requeue",
+        "help": "Renumber the transcription queue so claims round-robin across podcasts.",
+        "func": lambda a: db_requeue(),
+    },
+    {
+        "name": "relevance",
+        "help": "Score episodes against a keyword file and move relevant ones up the transcription queue.",
+        "func": lambda a: db_relevance(a.keywords, a.min_score, a.boost),
+        "args": [
+            (["keywords"], {"type": str, "help": "file with one keyword or phrase per line"}),
+            (["--min-score"], {"type": float, "default": 0.1, "help": "relevance (0..1) needed for a boost"}),
+            (["--boost"], {"type": int, "default": 1, "help": "priority given to relevant episodes"}),
+        ],
+    },
     {
         "name": "nth",
         "help": "Print the Nth most recent transcription (n=1 → most recent).",
-        "func": lambda a: db_nth_transcription(a.n),
+        "func": lambda a: db_nth_transcription(a.n, a.local),
         "args": [ (["n"], {"type": int, "nargs": "?", "default": 1}) ],
     },
     {
         "name": "recent_transcribed",
         "help": "Counts of transcriptions for the most recent N days with completions.",
-        "func": lambda a: db_recent_transcribed(a.days),
+        "func": lambda a: db_recent_transcribed(a.days, a.local),
         "args": [ (["--days"], {"type": int, "default": 7}) ],
     },
+    {
+        "name": "dbstats",
+        "help": "Per-method DB timings from DB_STATS=1 dumps (calls, latency, rows, bytes).",
+        "func": lambda a: db_stats_report(a.dir),
+        "args": [ (["--dir"], {"type": str, "default": None}) ],
+    },
+    {
+        "name": "sync_local",
+        "help": "Incrementally sync the local SQLite replica used by --local.",
+        "func": lambda a: sync_local(a.transcripts, a.full),
+        "args": [
+            (["--transcripts"], {"action": "store_true", "help": "also copy transcript text (FTS-searchable)"}),
+            (["--full"], {"action": "store_true", "help": "ignore watermarks and resync everything"}),
+        ],
+    },
+    {
+        "name": "export",
+        "help": "Stream episodes/segments/words completed since the last export to Parquet or Arrow.",
+        "func": lambda a: export_corpus(a.out, a.format, a.full, a.no_words),
+        "args": [
+            (["--out"], {"type": str, "default": None, "help": "output dir (default EXPORT_DIR or ./exports)"}),
+            (["--format"], {"choices": ["parquet", "arrow"], "default": "parquet"}),
+            (["--full"], {"action": "store_true", "help": "ignore the watermark and export everything"}),
+            (["--no-words"], {"action": "store_true", "help": "skip transcript_words (largest table)"}),
+        ],
+    },
+    {
+        "name": "search_local",
+        "help": "Full-text search titles, descriptions and transcripts in the local replica.",
+        "func": lambda a: search_local(a.term),
+        "args": [ (["term"], {"type": str}) ],
+    },
 ]
 
 def main():
     parser = argparse.ArgumentParser(
         description="PodScrape: RSS → episodes → storage → transcription helpers."
     )
+    parser.add_argument("--local", action="store_true",
+                        help="answer read-only commands from the local SQLite replica (see sync_local)")
     sub = parser.add_subparsers(dest="command", required=True)
 
     # build subparsers from the single COMMANDS spec
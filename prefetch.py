@@ -0,0 +1,499 @@
+"""
+Claim + fetch ahead of the transcribe workers.
+
+Prefetcher runs a variable number of downloader threads, each with its own DB
+connection and SFTP session, that claim episodes and decode their audio into
+memory (audio_stream.fetch_audio). Instead of an item count, the amount held
+ahead is bounded by decoded PCM bytes and audio seconds: a downloader only
+claims while the budget has room, and a worker returns an item's share when
+it calls done(). Downloaders reserve a typical episode's size before claiming,
+so the limit is soft only by how far an episode differs from the average
+(and a single episode larger than the whole budget is still let through).
+
+A controller thread compares the measured fetch rate (audio seconds fetched
+per second, per downloader) with the workers' consumption rate and resizes
+the downloader set between min_downloaders and max_downloaders; any time a
+worker had to wait on an empty queue while the budget had room it adds one.
+
+With a language_gate (langid.py), a downloader identifies each episode's
+language before fetching it, and skips the download entirely for episodes the
+policy doesn't transcribe.
+
+On top of that, leased work is sized to this worker's measured throughput
+(audio seconds transcribed per wall second, all workers together): a
+downloader claims only while the audio leased here (held, plus claimed but
+not fetched yet) is under ASR_LEASE_HORIZON_MIN minutes of that throughput,
+and claims as many episodes per query (up to ASR_CLAIM_BATCH) as fit. A fast
+GPU box therefore holds many episodes and a slow CPU one or two, so near the
+end of a backlog no slow worker sits on episodes a fast one could finish.
+The throughput is stored in the workers table (DBClient.report_worker) and
+read back at startup, so a restarted worker sizes its first claims right.
+
+Every claimed episode id is tracked until its item is done() (or the fetch
+gives up on it), so on shutdown outstanding() lists the leases this process
+still holds for DBClient.release_leases, apart from results already handed to
+the DB writer (DBWriter.pending_ids() covers those).
+
+Each item carries item['timings']: claim_s (its share of the claim query),
+download_s / decode_s (audio_stream.fetch_audio; language ID counts as
+download) and queue_s (fetched until a worker took it).
+
+    pf = Prefetcher(worker_id, consumers=4)
+    pf.start()
+    item = pf.get()          # {'id','source','audio','podcast_id','language', ...}
+    ...
+    pf.done(item)
+"""
+import os
+import math
+import time
+import queue
+import threading
+import traceback
+from typing import Dict, Any, Optional
+
+from audio_stream import fetch_audio, release
+from whisper_runtime import SAMPLE_RATE
+
+MAX_BYTES = int(float(os.getenv("ASR_PREFETCH_MB", "2048")) * 1024 * 1024)
+MAX_AUDIO_S = float(os.getenv("ASR_PREFETCH_AUDIO_S", "14400"))
+MIN_DOWNLOADERS = int(os.getenv("ASR_DOWNLOADERS_MIN", "1"))
+MAX_DOWNLOADERS = int(os.getenv("ASR_DOWNLOADERS_MAX", "4"))
+CLAIM_BATCH = int(os.getenv("ASR_CLAIM_BATCH", "8"))      # max per claim; 1 until throughput is known
+HORIZON_S = float(os.getenv("ASR_LEASE_HORIZON_MIN", "20")) * 60
+REPORT_S = float(os.getenv("ASR_WORKER_REPORT_S", "60"))
+SLEEP_EMPTY_S = float(os.getenv("ASR_EMPTY_SLEEP", "2.0"))
+TICK_S = float(os.getenv("ASR_PREFETCH_TICK_S", "5"))
+WINDOW_S = 60.0   # busy time per throughput sample
+HEADROOM = 1.25   # fetch this much faster than the workers consume
+EMPTY_LIMIT = 3   # consecutive empty claims (with nothing queued) before giving up
+EMA = 0.3
+
+
+def _fetch_episode_meta(db, episode_id: str) -> Optional[Dict[str, Any]]:
+    """Return at least {'id','audio_path'} for an episode id."""
+    try:
+        return db.get_episode_meta(episode_id)
+    except AttributeError:
+        with db.conn.cursor() as cur:
+            cur.execute("SELECT id, audio_path FROM episodes WHERE id = %s", (episode_id,))
+            row = cur.fetchone()
+        if not row:
+            return None
+        return {"id": row[0], "audio_path": row[1]}
+
+
+def _ema(prev: float, value: float) -> float:
+    return value if not prev else prev * (1 - EMA) + value * EMA
+
+
+class Prefetcher:
+    def __init__(self, worker_id: str, consumers: int = 1,
+                 max_bytes: int = MAX_BYTES, max_audio_s: float = MAX_AUDIO_S,
+                 min_downloaders: int = MIN_DOWNLOADERS,
+                 max_downloaders: int = MAX_DOWNLOADERS,
+                 language_gate=None):
+        self.worker_id = worker_id
+        self.language_gate = language_gate if language_gate and language_gate.enabled else None
+        self.consumers = consumers
+        self.max_bytes = max_bytes
+        self.max_audio_s = max_audio_s
+        self.min_downloaders = max(1, min_downloaders)
+        self.max_downloaders = max(self.min_downloaders, max_downloaders)
+        self.queue = queue.Queue()
+        self.stop_event = threading.Event()
+
+        self._cond = threading.Condition()
+        self._used_bytes = 0
+        self._used_audio_s = 0.0
+        self._avg_bytes = 0.0       # typical episode, so we don't claim into a full budget
+        self._pending = 0           # downloaders past the budget check, not yet queued
+        self._exhausted = False     # nothing left to claim
+        self._target = self.min_downloaders
+        self._downloaders = {}      # slot -> Thread
+        self._next_slot = 1
+        self._empty_claims = 0
+        self._claimed = set()       # leased to us, not yet done() or given up on
+        self._held = 0              # of those, fetched (queued or with a worker)
+        self._avg_audio_s = 0.0     # typical episode length, for unfetched claims
+
+        # rates (EMA): audio seconds fetched per busy second of one downloader,
+        # audio seconds transcribed per busy second of one worker
+        self._fetch_rate = 0.0
+        self._consume_rate = 0.0
+        self._starved_s = 0.0       # worker wait on empty queue while budget had room
+        self._blocked_s = 0.0       # downloader wait on a full budget
+        # whole-worker throughput: EMA over WINDOW_S of busy time of audio s finished per wall s
+        self._throughput = 0.0
+        self._done_audio_s = 0.0    # finished since the last tick
+        self._window_s = 0.0
+        self._window_audio_s = 0.0
+        self._seeded = False        # throughput read back from the workers table
+        self._reported = 0.0
+        self._controller = threading.Thread(target=self._control_loop,
+                                            name="prefetch-ctl", daemon=True)
+
+    # ---------------- lifecycle ----------------
+
+    def start(self):
+        with self._cond:
+            for _ in range(self._target):
+                self._spawn()
+        self._controller.start()
+
+    def stop(self):
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        # free the PCM behind anything still queued
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, dict):
+                release(item["audio"])
+
+    def outstanding(self):
+        """Episode ids claimed by this prefetcher and not finished yet (queued, in flight, fetching)."""
+        with self._cond:
+            return list(self._claimed)
+
+    def _unclaim(self, eid: str):
+        with self._cond:
+            self._claimed.discard(eid)
+
+    def is_alive(self) -> bool:
+        with self._cond:
+            return any(t.is_alive() for t in self._downloaders.values())
+
+    def join(self):
+        """Block until every downloader has exited (nothing left to claim, or stop())."""
+        while True:
+            with self._cond:
+                threads = list(self._downloaders.values())
+            if not threads:
+                return
+            for t in threads:
+                t.join()
+            with self._cond:
+                for slot, t in list(self._downloaders.items()):
+                    if not t.is_alive():
+                        del self._downloaders[slot]
+
+    def _spawn(self):
+        slot = self._next_slot
+        self._next_slot += 1
+        t = threading.Thread(target=self._downloader, args=(slot,),
+                             name=f"prefetch-{slot}", daemon=True)
+        self._downloaders[slot] = t
+        t.start()
+
+    # ---------------- budget ----------------
+
+    def _leased_audio_s(self) -> float:
+        """Audio leased to this worker: fetched items plus claims not fetched yet."""
+        unfetched = max(0, len(self._claimed) - self._held)
+        return self._used_audio_s + unfetched * self._avg_audio_s
+
+    def _horizon_room_s(self) -> Optional[float]:
+        """Audio seconds that still fit in the lease horizon; None until throughput is known."""
+        if not self._throughput:
+            return None
+        return self._throughput * HORIZON_S - self._leased_audio_s()
+
+    def _has_room(self) -> bool:
+        if not self._claimed and self._pending == 0:
+            return True  # always allow one episode, however large
+        horizon = self._horizon_room_s()
+        if horizon is not None and horizon < (self._pending + 1) * self._avg_audio_s:
+            return False
+        return (self._used_bytes + (self._pending + 1) * self._avg_bytes <= self.max_bytes
+                and self._used_audio_s < self.max_audio_s)
+
+    def _claim_size(self) -> int:
+        """Episodes to claim in one query: as many as fit the horizon (1 while unmeasured)."""
+        with self._cond:
+            horizon = self._horizon_room_s()
+            if horizon is None or not self._avg_audio_s:
+                return 1
+            return max(1, min(CLAIM_BATCH, int(horizon // self._avg_audio_s)))
+
+    def _wait_for_room(self, slot: int) -> bool:
+        """
+        Wait until the budget has room and hold a pending slot in it (released by
+        _unpend); False if this downloader should exit instead.
+        """
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                if self.stop_event.is_set() or self._exhausted or self._retire(slot):
+                    return False
+                if self._has_room():
+                    break
+                self._cond.wait(timeout=1.0)
+            self._pending += 1
+            self._blocked_s += time.monotonic() - t0
+        return True
+
+    def _unpend(self):
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify_all()
+
+    def _retire(self, slot: int) -> bool:
+        """Called with the lock held: drop this downloader if we're above target."""
+        live = [s for s, t in self._downloaders.items() if t.is_alive()]
+        if len(live) > self._target and slot == max(live):
+            return True
+        return False
+
+    # ---------------- consumer side ----------------
+
+    def get(self):
+        """Next fetched item (blocks). Waits on an empty queue count as starvation."""
+        try:
+            item = self.queue.get_nowait()
+        except queue.Empty:
+            t0 = time.monotonic()
+            item = self.queue.get()
+            with self._cond:
+                if self._has_room() and not self._exhausted:
+                    self._starved_s += time.monotonic() - t0
+        if isinstance(item, dict):
+            self._start(item)
+        return item
+
+    def take_ready(self, limit: int, sentinel=None):
+        """Up to `limit` more items that are already queued, without waiting."""
+        items = []
+        while len(items) < limit:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is sentinel:
+                self.queue.put(sentinel)
+                self.queue.task_done()
+                break
+            self._start(item)
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _start(item):
+        item["started"] = time.monotonic()
+        item["timings"]["queue_s"] = item["started"] - item["fetched"]
+
+    def done(self, item):
+        """Release an item's share of the budget (and its PCM file) and mark the queue task done."""
+        release(item["audio"])
+        busy = time.monotonic() - item.get("started", time.monotonic())
+        with self._cond:
+            self._used_bytes -= item["nbytes"]
+            self._used_audio_s -= item["audio_s"]
+            self._done_audio_s += item["audio_s"]
+            self._held -= 1
+            self._claimed.discard(item["id"])
+            if busy > 0:
+                self._consume_rate = _ema(self._consume_rate, item["audio_s"] / busy)
+            self._cond.notify_all()
+        self.queue.task_done()
+
+    def first_queued_audio(self):
+        """Peek (without consuming) the first fetched episode's audio; None if nothing comes."""
+        while self.is_alive() or self.queue.qsize():
+            with self.queue.mutex:
+                for item in self.queue.queue:
+                    if isinstance(item, dict):
+                        return item["audio"]
+            time.sleep(0.5)
+        return None
+
+    # ---------------- downloaders ----------------
+
+    def _downloader(self, slot: int):
+        from db_client import get_db_client
+        from sftp_client import get_sftp_client
+        try:
+            with get_db_client() as db, get_sftp_client() as sftp:
+                while self._wait_for_room(slot):
+                    try:
+                        if not self._claim_and_fetch(db, sftp):
+                            break
+                    finally:
+                        self._unpend()
+        except Exception:
+            traceback.print_exc()
+
+    def _report(self, db):
+        """Read this worker's last throughput once; store the current one every REPORT_S."""
+        now = time.monotonic()
+        with self._cond:
+            seed = not self._seeded
+            self._seeded = True
+            due = self._throughput and now - self._reported >= REPORT_S
+            if due:
+                self._reported = now
+            throughput = self._throughput
+        try:
+            if seed:
+                last = db.get_worker_throughput(self.worker_id)
+                if last:
+                    with self._cond:
+                        self._throughput = self._throughput or last
+                    print(f"[prefetch] last measured throughput {last:.1f} audio-s/s")
+            if due:
+                db.report_worker(self.worker_id, throughput, self.consumers)
+        except Exception as e:
+            db.conn.rollback()
+            print(f"[prefetch] workers table: {e}")
+
+    def _claim_and_fetch(self, db, sftp) -> bool:
+        """One claim round; False once there is nothing left to claim."""
+        self._report(db)
+        t0 = time.monotonic()
+        try:
+            ids = db.claim_episodes(self.worker_id, batch_size=self._claim_size())
+        except Exception as e:
+            print(f"[CLAIM FAIL] {e}")
+            time.sleep(1.0)
+            return True
+
+        if not ids:
+            with self._cond:
+                if self.queue.qsize() == 0:
+                    self._empty_claims += 1
+                if self._empty_claims >= EMPTY_LIMIT:
+                    # nothing to claim AND nothing queued → producers done
+                    self._exhausted = True
+                    self._cond.notify_all()
+                    return False
+            time.sleep(SLEEP_EMPTY_S)
+            return True
+
+        claim_s = (time.monotonic() - t0) / len(ids)
+        with self._cond:
+            self._empty_claims = 0
+            self._claimed.update(ids)
+        for eid in ids:
+            if self.stop_event.is_set():
+                break
+            self._fetch_one(db, sftp, eid, claim_s)
+        return True
+
+    def _fetch_one(self, db, sftp, eid: str, claim_s: float = 0.0):
+        meta = _fetch_episode_meta(db, eid)
+        apath = (meta or {}).get("audio_path")
+        if not apath:
+            print(f"[META MISS] {eid}: no audio_path")
+            try:
+                db.mark_failed(eid, retry=False, worker_id=self.worker_id)
+            except Exception:
+                pass
+            self._unclaim(eid)
+            return
+
+        timings = {"claim_s": claim_s}
+        gate = self.language_gate
+        language = None
+        if gate:
+            t0 = time.monotonic()
+            language = self._identify(db, sftp, eid, meta)
+            timings["download_s"] = time.monotonic() - t0  # partial read + detection
+            if gate.skips(language):
+                self._skip(db, eid, language)
+                return
+
+        t0 = time.monotonic()
+        try:
+            audio = fetch_audio(sftp, apath, timings, expected_s=meta.get("duration_s"))
+        except Exception as e:
+            print(f"[DL FAIL] {eid} {apath}: {e}")
+            traceback.print_exc()
+            try:
+                db.mark_failed(eid, retry=True, worker_id=self.worker_id)
+            except Exception:
+                pass
+            self._unclaim(eid)
+            return
+        elapsed = time.monotonic() - t0
+
+        if gate and language is None and not meta.get("lang_checked"):
+            # the head alone wasn't decodable: detect on the full audio
+            t1 = time.monotonic()
+            language = self._identify(db, sftp, eid, meta, audio)
+            timings["download_s"] += time.monotonic() - t1
+            if gate.skips(language):
+                release(audio)
+                self._skip(db, eid, language)
+                return
+
+        item = {"id": eid, "source": apath, "audio": audio,
+                "podcast_id": meta.get("podcast_id"), "language": language,
+                "timings": timings, "fetched": time.monotonic(),
+                "nbytes": audio.nbytes, "audio_s": len(audio) / SAMPLE_RATE}
+        with self._cond:
+            self._used_bytes += item["nbytes"]
+            self._used_audio_s += item["audio_s"]
+            self._avg_bytes = _ema(self._avg_bytes, item["nbytes"])
+            self._avg_audio_s = _ema(self._avg_audio_s, item["audio_s"])
+            self._held += 1
+            if elapsed > 0:
+                self._fetch_rate = _ema(self._fetch_rate, item["audio_s"] / elapsed)
+        self.queue.put(item)
+
+    def _identify(self, db, sftp, eid: str, meta, audio=None):
+        try:
+            return self.language_gate.identify(db, sftp, meta, audio)
+        except Exception as e:
+            print(f"[lang] {eid}: {e}; transcribing as usual")
+            return None
+
+    def _skip(self, db, eid: str, language: str):
+        print(f"[lang] {eid}: {language}; skipped")
+        try:
+            db.mark_skipped(eid, language, worker_id=self.worker_id)
+        except Exception as e:
+            print(f"[lang] {eid}: mark_skipped failed: {e}")
+        self._unclaim(eid)
+
+    # ---------------- controller ----------------
+
+    def _control_loop(self):
+        while not self.stop_event.wait(TICK_S):
+            with self._cond:
+                if self._exhausted:
+                    return
+                starved, self._starved_s = self._starved_s, 0.0
+                blocked, self._blocked_s = self._blocked_s, 0.0
+                finished, self._done_audio_s = self._done_audio_s, 0.0
+                if (self._held or finished) and not starved:  # workers busy all tick
+                    self._window_s += TICK_S
+                    self._window_audio_s += finished
+                if self._window_s >= WINDOW_S:
+                    if self._window_audio_s:
+                        self._throughput = _ema(self._throughput,
+                                                self._window_audio_s / self._window_s)
+                    self._window_s = self._window_audio_s = 0.0
+                live = sum(1 for t in self._downloaders.values() if t.is_alive())
+                target = self._target
+                if self._fetch_rate and self._consume_rate:
+                    need = self._consume_rate * self.consumers * HEADROOM / self._fetch_rate
+                    target = math.ceil(need)
+                if starved > 0:
+                    target = max(target, self._target + 1)
+                elif blocked >= TICK_S * max(1, live) * 0.5:
+                    # downloaders mostly sat on a full budget: more won't help
+                    target = min(target, self._target - 1)
+                target = min(self.max_downloaders, max(self.min_downloaders, target))
+                if target != self._target:
+                    print(f"[prefetch] downloaders {self._target} → {target} "
+                          f"(fetch {self._fetch_rate:.1f} vs consume "
+                          f"{self._consume_rate:.1f}x{self.consumers} audio-s/s, "
+                          f"starved {starved:.1f}s, "
+                          f"held {self._used_bytes / 2**20:.0f} MB / {self._used_audio_s:.0f}s)")
+                    self._target = target
+                    self._cond.notify_all()
+                for _ in range(self._target - live):
+                    self._spawn()
@@ -0,0 +1,139 @@
+"""
+Per-episode model routing (ASR_MODEL=auto).
+
+Every model in ASR_ROUTE_MODELS (fastest → most accurate, default
+fw_tiny,fw_base,fw_small) is loaded side by side from the
+whisper_runtime.MODELS registry; ModelRouter.route() picks one per episode
+and the choice is stored in episodes.transcript_model by mark_done().
+
+The base tier comes from the backlog:
+  * ASR_TARGET_DATE set (ISO date/time): the most accurate model whose
+    real-time factor lets this host's slots, times ASR_ROUTE_FLEET similar
+    hosts, finish the remaining audio before the date (fastest if none can);
+  * otherwise ASR_ROUTE_DEFAULT (default fw_base), dropping to the fastest
+    model while more than ASR_ROUTE_BACKLOG_H hours of audio are pending.
+Each episode then moves from the base tier by its podcast's priority
+(podcasts.priority, +1 = one tier more accurate) and one tier faster if it is
+longer than ASR_ROUTE_LONG_S, since it holds a slot the longest.
+
+Real-time factors start from MODELS[...]["approx_rtf"] and are replaced by
+measured wall/audio time as episodes finish (observe()); models not measured
+yet are scaled by how far the measured ones are from their estimates.
+Backlog size and podcast priorities are re-read every ASR_ROUTE_REFRESH_S.
+"""
+import os
+import time
+import threading
+from datetime import datetime, timezone
+
+from whisper_runtime import MODELS
+
+ROUTE_MODELS = [m.strip() for m in
+                os.getenv("ASR_ROUTE_MODELS", "fw_tiny,fw_base,fw_small").split(",") if m.strip()]
+ROUTE_DEFAULT = os.getenv("ASR_ROUTE_DEFAULT", "fw_base")
+TARGET_DATE = os.getenv("ASR_TARGET_DATE")          # e.g. 2026-12-31
+FLEET = int(os.getenv("ASR_ROUTE_FLEET", "1"))      # hosts sharing the backlog, incl. this one
+BACKLOG_HIGH_S = float(os.getenv("ASR_ROUTE_BACKLOG_H", "500")) * 3600
+LONG_S = float(os.getenv("ASR_ROUTE_LONG_S", "7200"))
+REFRESH_S = float(os.getenv("ASR_ROUTE_REFRESH_S", "60"))
+EMA = 0.2
+
+
+def parse_target(value: str):
+    """ISO date or date-time → aware datetime (naive values are taken as UTC)."""
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+class ModelRouter:
+    """
+        router = ModelRouter(["fw_tiny", "fw_base"], slots=2)
+        name = router.route(db, duration_s=5400, podcast_id=12)
+        ...
+        router.observe(name, audio_s=5400, elapsed_s=160)
+    """
+
+    def __init__(self, models=None, slots: int = 1, target_date: str = TARGET_DATE,
+                 fleet: int = FLEET, default: str = ROUTE_DEFAULT):
+        self.models = list(models or ROUTE_MODELS)
+        if not self.models:
+            raise ValueError("ASR_ROUTE_MODELS is empty")
+        for name in self.models:
+            if name not in MODELS:
+                raise ValueError(f"Unknown model '{name}' in ASR_ROUTE_MODELS. Options: {list(MODELS)}")
+        self.slots = max(1, slots)
+        self.fleet = max(1, fleet)
+        self.target = parse_target(target_date) if target_date else None
+        self.default_tier = (self.models.index(default) if default in self.models
+                             else len(self.models) - 1)
+
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._measured = {}        # name -> EMA of wall s / audio s
+        self._backlog_s = None
+        self._priorities = {}
+        self._refreshed = 0.0
+        self._tier = self.default_tier
+
+    # ---------------- speed ----------------
+
+    def rtf(self, name: str) -> float:
+        with self._lock:
+            if name in self._measured:
+                return self._measured[name]
+            scales = [m / MODELS[n].get("approx_rtf", m) for n, m in self._measured.items()]
+        scale = sum(scales) / len(scales) if scales else 1.0
+        return MODELS[name].get("approx_rtf", 0.1) * scale
+
+    def observe(self, name: str, audio_s: float, elapsed_s: float):
+        """Record one finished episode: elapsed_s of one slot for audio_s of audio."""
+        if audio_s <= 0 or elapsed_s <= 0:
+            return
+        with self._lock:
+            prev = self._measured.get(name)
+            value = elapsed_s / audio_s
+            self._measured[name] = value if prev is None else prev * (1 - EMA) + value * EMA
+
+    # ---------------- policy ----------------
+
+    def _refresh(self, db):
+        """Re-read backlog and priorities if stale; one thread does it, the others carry on."""
+        if time.monotonic() - self._refreshed < REFRESH_S:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            stats = db.backlog_stats()
+            priorities = db.podcast_priorities()
+            with self._lock:
+                self._backlog_s = stats["audio_s"]
+                self._priorities = priorities
+            tier = self._base_tier()
+            if tier != self._tier:
+                print(f"[route] base model {self.models[self._tier]} → {self.models[tier]} "
+                      f"(backlog {self._backlog_s / 3600:.0f} h)")
+            self._tier = tier
+        except Exception as e:
+            print(f"[route] refresh failed: {e}")
+        finally:
+            self._refreshed = time.monotonic()
+            self._refreshing.release()
+
+    def _base_tier(self) -> int:
+        backlog = self._backlog_s
+        if not backlog:
+            return self.default_tier
+        if self.target is not None:
+            left_s = (self.target - datetime.now(timezone.utc)).total_seconds()
+            budget = left_s * self.slots * self.fleet / backlog  # affordable wall s per audio s
+            fits = [i for i, name in enumerate(self.models) if self.rtf(name) <= budget]
+            return fits[-1] if fits else 0
+        return 0 if backlog > BACKLOG_HIGH_S else self.default_tier
+
+    def route(self, db, duration_s: float = None, podcast_id=None) -> str:
+        """Model name for one episode."""
+        self._refresh(db)
+        tier = self._tier + self._priorities.get(podcast_id, 0)
+        if duration_s and duration_s > LONG_S:
+            tier -= 1
+        return self.models[min(len(self.models) - 1, max(0, tier))]
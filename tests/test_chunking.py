@@ -0,0 +1,149 @@
+"""Window planning, overlap trimming and checkpoint resume in chunking.py (no model, no DB)."""
+import json
+
+import numpy as np
+import pytest
+
+from chunking import plan_windows, _trim, stitch, transcribe_checkpointed
+from whisper_runtime import SAMPLE_RATE
+
+
+# ---------------- plan_windows ----------------
+
+@pytest.mark.parametrize("duration, regions, window, expected", [
+    # short enough for one window (up to 1.5 x window_s)
+    (30.0, None, 20.0, [(0.0, 30.0)]),
+    # no VAD: cut at the nominal points, the tail absorbs the remainder
+    (70.0, None, 20.0, [(0.0, 20.0), (20.0, 40.0), (40.0, 70.0)]),
+    # VAD: the cut moves to the middle of the longest silence within window_s / 4
+    (45.0, [(0.0, 17.0), (19.0, 21.0), (21.5, 45.0)], 20.0, [(0.0, 18.0), (18.0, 45.0)]),
+    # no silence near the nominal point: cut there anyway
+    (45.0, [(0.0, 45.0)], 20.0, [(0.0, 20.0), (20.0, 45.0)]),
+])
+def test_plan_windows(duration, regions, window, expected):
+    assert plan_windows(duration, regions, window) == expected
+
+
+def test_plan_windows_tile_the_episode():
+    regions = [(i * 7.0, i * 7.0 + 5.5) for i in range(200)]
+    windows = plan_windows(1400.0, regions, 120.0)
+    assert windows[0][0] == 0.0 and windows[-1][1] == 1400.0
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    assert plan_windows(1400.0, regions, 120.0) == windows  # same plan on every worker
+
+
+# ---------------- _trim ----------------
+
+BOUNDARY = [(0.0, 10.0), (10.0, 20.0)]
+
+
+@pytest.mark.parametrize("seg, owner", [
+    ((8.0, 11.0), 0),     # midpoint 9.5
+    ((9.0, 11.0), 1),     # midpoint exactly on the cut: the later window only
+    ((9.5, 10.4999), 0),  # midpoint just before the cut
+    ((19.0, 21.0), 1),    # midpoint on the episode end: the last window is closed
+])
+def test_trim_gives_each_segment_to_exactly_one_window(seg, owner):
+    kept = []
+    for i, (start, end) in enumerate(BOUNDARY):
+        segs, words = _trim([(*seg, "x")], [(0, 0, seg[0], seg[1], "x")], start, end,
+                            last=i == len(BOUNDARY) - 1)
+        kept.append(len(segs))
+        assert [w[0] for w in words] == list(range(len(segs)))
+    assert kept == [int(i == owner) for i in range(len(BOUNDARY))]
+
+
+def test_trim_renumbers_kept_segments_and_their_words():
+    segs = [(0.0, 2.0, "a"), (9.0, 13.0, "b"), (14.0, 16.0, "c")]
+    words = [(0, 0, 0.0, 1.0, "a"), (1, 0, 9.0, 13.0, "b"), (2, 0, 14.0, 15.0, "c"),
+             (2, 1, 15.0, 16.0, "c2")]
+    kept_segs, kept_words = _trim(segs, words, 10.0, 20.0, last=True)
+    assert kept_segs == segs[1:]
+    assert kept_words == [(0, 0, 9.0, 13.0, "b"), (1, 0, 14.0, 15.0, "c"), (1, 1, 15.0, 16.0, "c2")]
+
+
+def test_stitch_continues_seg_idx_across_parts():
+    parts = [([(0.0, 1.0, "a"), (1.0, 2.0, "b")], [(1, 0, 1.0, 2.0, "b")]),
+             ([[5.0, 6.0, "c"]], [(0, 0, 5.0, 6.0, "c"), (0, 1, 5.5, 6.0, "c2")])]
+    assert stitch(parts) == (
+        [(0.0, 1.0, "a"), (1.0, 2.0, "b"), (5.0, 6.0, "c")],
+        [(1, 0, 1.0, 2.0, "b"), (2, 0, 5.0, 6.0, "c"), (2, 1, 5.5, 6.0, "c2")],
+    )
+
+
+# ---------------- checkpointed runs ----------------
+
+DURATION_S = 100.0
+# a 2.5 s "utterance" every 3 s: VAD cuts land in the 0.5 s gaps, and the 1 s
+# overlap before each cut decodes the last utterance of the previous window again
+TRUTH = [(t, t + 2.5, f"seg{i}") for i, t in enumerate(np.arange(0.0, DURATION_S - 2.5, 3.0).tolist())]
+REGIONS = [(a, b) for a, b, _ in TRUTH]
+
+
+def episode_audio():
+    # each sample holds its own index, so a window can tell where its slice starts
+    return np.arange(int(DURATION_S * SAMPLE_RATE), dtype=np.int64)
+
+
+class FakeModel:
+    """Returns the TRUTH utterances starting inside the slice, in slice time, one word each."""
+
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def __call__(self, piece, regions):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("worker died")
+        self.calls += 1
+        lo, hi = piece[0] / SAMPLE_RATE, (piece[-1] + 1) / SAMPLE_RATE
+        segs = [(a - lo, min(b, hi) - lo, text) for a, b, text in TRUTH if lo <= a < hi]
+        words = [(i, 0, a, b, text) for i, (a, b, text) in enumerate(segs)]
+        return segs, words
+
+
+class FakeCheckpointDB:
+    """get_checkpoints/save_checkpoint with the JSON round trip the real table does."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get_checkpoints(self, episode_id, model):
+        return [json.loads(json.dumps(r)) for _, r in sorted(self.rows.items())]
+
+    def save_checkpoint(self, episode_id, model, window_idx, start_s, end_s, seg_rows, word_rows):
+        self.rows[window_idx] = {"window_idx": window_idx, "start_s": start_s, "end_s": end_s,
+                                 "seg_rows": [list(s) for s in seg_rows],
+                                 "word_rows": [list(w) for w in word_rows]}
+
+
+def run(db, model, shards=1):
+    return transcribe_checkpointed(db, "ep", "fw_base", episode_audio(), REGIONS, model,
+                                   window_s=20.0, shards=shards)
+
+
+def test_every_utterance_survives_the_overlap_exactly_once():
+    assert len(plan_windows(DURATION_S, REGIONS, 20.0)) > 3
+    segs, words = run(FakeCheckpointDB(), FakeModel())
+    assert [text for *_, text in segs] == [text for *_, text in TRUTH]
+    assert [w[0] for w in words] == list(range(len(segs)))
+    assert all(segs[si][2] == w for si, _, _, _, w in words)
+
+
+@pytest.mark.parametrize("fail_after", [1, 2, 4])
+def test_resume_from_checkpoints_matches_an_uninterrupted_run(fail_after):
+    expected = run(FakeCheckpointDB(), FakeModel())
+    windows = len(plan_windows(DURATION_S, REGIONS, 20.0))
+
+    db = FakeCheckpointDB()
+    with pytest.raises(RuntimeError):
+        run(db, FakeModel(fail_after=fail_after))  # crashes part way, leaves checkpoints
+    assert len(db.rows) == fail_after
+
+    resumed_model = FakeModel()
+    assert run(db, resumed_model) == expected
+    assert resumed_model.calls == windows - fail_after  # finished windows aren't redone
+
+
+def test_shards_stitch_the_same_rows():
+    assert run(FakeCheckpointDB(), FakeModel(), shards=3) == run(FakeCheckpointDB(), FakeModel())
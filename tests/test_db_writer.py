@@ -0,0 +1,168 @@
+"""DBWriter against a fake DBClient: batching, reconnect/retry, per-episode fallback, backpressure."""
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+
+import db_client
+import db_writer
+from db_writer import DBWriter
+
+
+class FakeDBClient:
+    """write_transcripts commits a whole batch or nothing, like the real one's single transaction."""
+
+    def __init__(self, drop_connections=0, poisoned=(), gate=None):
+        self.drop_connections = drop_connections
+        self.poisoned = set(poisoned)
+        self.gate = gate            # Event the first write waits on
+        self.connects = 0
+        self.attempts = []          # every batch tried, committed or not
+        self.committed = []         # batches that went through
+        self.failed = []            # (episode_id, retry, worker_id)
+
+    def write_transcripts(self, results, worker_id=None):
+        ids = [r["episode_id"] for r in results]
+        self.attempts.append(ids)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.drop_connections:
+            self.drop_connections -= 1
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        bad = self.poisoned.intersection(ids)
+        if bad:
+            raise ValueError(f"bad transcript for {sorted(bad)}")
+        self.committed.append(ids)
+        return {"db_write_s": 0.0, "finalize_s": 0.0, "lost": []}
+
+    def mark_failed(self, episode_id, retry=True, worker_id=None):
+        self.failed.append((episode_id, retry, worker_id))
+        return True
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    db = FakeDBClient()
+
+    @contextmanager
+    def get_db_client():
+        db.connects += 1
+        yield db
+
+    monkeypatch.setattr(db_client, "get_db_client", get_db_client)
+    monkeypatch.setattr(db_writer.time, "sleep", lambda s: None)  # no reconnect backoff
+    monkeypatch.setattr(db_writer, "RECORD_RUNS", False)
+    return db
+
+
+def result(eid, words=1):
+    return {"episode_id": eid, "seg_rows": [(0.0, 1.0, "hello")],
+            "word_rows": [(0, i, 0.0, 1.0, "hello") for i in range(words)],
+            "audio_duration_s": 1.0, "model": "fw_base", "language": "en"}
+
+
+def test_queued_results_go_in_one_transaction(fake):
+    writer = DBWriter("w1", batch=8, linger_s=0.05)
+    for eid in "abcde":
+        writer.submit(result(eid))
+    writer.start()
+    writer.close(timeout=5)
+    assert fake.committed == [list("abcde")]
+    assert writer.written == 5 and writer.failed == 0
+
+
+def test_batches_are_capped_and_keep_one_result_per_episode(fake):
+    writer = DBWriter("w1", batch=2, linger_s=0.05)
+    for eid in ["a", "b", "c", "c"]:
+        writer.submit(result(eid))
+    writer.start()
+    writer.close(timeout=5)
+    assert fake.committed == [["a", "b"], ["c"], ["c"]]
+
+
+def test_lost_connection_is_reopened_and_the_batch_retried(fake):
+    fake.drop_connections = 2
+    writer = DBWriter("w1", linger_s=0.05)
+    writer.submit(result("a"))
+    writer.submit(result("b"))
+    writer.start()
+    writer.close(timeout=5)
+    assert fake.attempts == [["a", "b"]] * 3
+    assert fake.committed == [["a", "b"]]
+    assert fake.connects == 3
+    assert writer.written == 2 and not fake.failed
+
+
+def test_connection_that_never_comes_back_releases_the_batch(fake, monkeypatch):
+    monkeypatch.setattr(db_writer, "WRITE_RETRIES", 1)
+    fake.drop_connections = 99
+    writer = DBWriter("w1", linger_s=0.05)
+    writer.submit(result("a"))
+    writer.start()
+    writer.close(timeout=5)
+    assert fake.committed == []
+    assert fake.failed == [("a", True, "w1")]
+    assert writer.failed == 1
+
+
+def test_poisoned_result_falls_back_to_one_by_one(fake):
+    fake.poisoned = {"b"}
+    writer = DBWriter("w1", linger_s=0.05)
+    for eid in "abc":
+        writer.submit(result(eid))
+    writer.start()
+    writer.close(timeout=5)
+    assert fake.attempts == [["a", "b", "c"], ["a"], ["b"], ["c"]]
+    assert fake.committed == [["a"], ["c"]]
+    assert fake.failed == [("b", True, "w1")]  # released under this worker's lease only
+    assert writer.written == 2 and writer.failed == 1
+
+
+def test_submit_blocks_while_the_queue_is_full(fake):
+    writer = DBWriter("w1", max_queue=2, linger_s=0.05)
+    writer.submit(result("a"))
+    writer.submit(result("b"))
+    third = threading.Thread(target=writer.submit, args=(result("c"),), daemon=True)
+    third.start()
+    third.join(0.2)
+    assert third.is_alive(), "submit should wait for room"
+    assert writer.backlog() == 2
+    writer.start()  # draining makes room
+    third.join(5)
+    assert not third.is_alive()
+    writer.close(timeout=5)
+    assert sorted(sum(fake.committed, [])) == ["a", "b", "c"]
+
+
+def test_submit_blocks_over_the_memory_bound(fake):
+    writer = DBWriter("w1", max_bytes=1000, linger_s=0.05)
+    writer.submit(result("a", words=3))  # under the bound on its own
+    blocked = threading.Thread(target=writer.submit, args=(result("b", words=3),), daemon=True)
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    writer.start()
+    blocked.join(5)
+    writer.close(timeout=5)
+    assert sorted(sum(fake.committed, [])) == ["a", "b"]
+
+
+def test_pending_ids_cover_results_until_they_are_stored(fake):
+    fake.gate = threading.Event()
+    writer = DBWriter("w1", linger_s=0.0)
+    writer.start()
+    writer.submit(result("a"))
+    writer.submit(result("b"))
+    assert sorted(writer.pending_ids()) == ["a", "b"]  # queued or mid-write: still our leases
+    fake.gate.set()
+    writer.close(timeout=5)
+    assert writer.pending_ids() == []
+
+
+def test_submit_after_close_raises(fake):
+    writer = DBWriter("w1")
+    writer.start()
+    writer.close(timeout=5)
+    with pytest.raises(RuntimeError):
+        writer.submit(result("a"))
@@ -0,0 +1,160 @@
+"""Recurring-segment detection, matching and transcript splicing in fingerprint.py on synthetic audio."""
+import threading
+
+import numpy as np
+import pytest
+
+import fingerprint
+from fingerprint import (FingerprintIndex, fingerprint as fingerprint_of, recurring_spans,
+                         skip_regions, splice)
+from whisper_runtime import SAMPLE_RATE
+
+BURST_S = 10.0
+EPISODE_S = 40
+
+
+@pytest.fixture(scope="module")
+def burst():
+    rng = np.random.default_rng(7)
+    return (rng.standard_normal(int(BURST_S * SAMPLE_RATE)) * 0.1).astype(np.float32)
+
+
+def episode(burst, offset_s: float, seed: int):
+    """EPISODE_S of fresh noise with the shared burst pasted in at offset_s (not hop aligned)."""
+    rng = np.random.default_rng(seed)
+    audio = (rng.standard_normal(EPISODE_S * SAMPLE_RATE) * 0.1).astype(np.float32)
+    i = int(offset_s * SAMPLE_RATE)
+    audio[i:i + len(burst)] = burst
+    return audio
+
+
+def transcript():
+    """One 1 s segment (with one word) per second: 'w0', 'w1', ..."""
+    segs = [(float(t), float(t + 1), f"w{t}") for t in range(EPISODE_S)]
+    words = [(i, 0, a, b, text) for i, (a, b, text) in enumerate(segs)]
+    return segs, words
+
+
+def test_recurring_spans_finds_the_shared_burst(burst):
+    a = fingerprint_of(episode(burst, 12.3, seed=1))
+    b = fingerprint_of(episode(burst, 5.0, seed=2))
+    spans = recurring_spans(a, b, min_s=8.0)
+    assert len(spans) == 1
+    start, end = (f / fingerprint.FPS for f in spans[0])
+    assert 12.3 - 0.5 <= start and end <= 12.3 + BURST_S + 0.5
+    assert end - start >= 8.0
+
+
+def test_recurring_spans_ignores_unrelated_audio(burst):
+    a = fingerprint_of(episode(burst, 12.3, seed=1))
+    c = fingerprint_of(np.random.default_rng(3).standard_normal(EPISODE_S * SAMPLE_RATE)
+                       .astype(np.float32) * 0.1)
+    assert recurring_spans(a, c, min_s=8.0) == []
+
+
+def test_learned_from_two_episodes_and_matched_in_a_third(burst, tmp_path):
+    index = FingerprintIndex(str(tmp_path))
+    segs, words = transcript()
+    first = fingerprint_of(episode(burst, 12.3, seed=1))
+    second = fingerprint_of(episode(burst, 5.0, seed=2))
+    assert index.learn("pod", "e1", first, segs, words) == 0  # nothing to compare with yet
+    assert index.learn("pod", "e2", second, segs, words) == 1
+
+    third = fingerprint_of(episode(burst, 20.77, seed=3))
+    spans = index.match("pod", third)
+    assert len(spans) == 1
+    sp = spans[0]
+    # e2's rows wholly inside its recurring stretch (5 s + a little .. 15 s), moved to e3's burst
+    texts = [text for *_, text in sp["seg_rows"]]
+    assert texts == [f"w{t}" for t in range(6, 14)]
+    lo, hi = sp["skip"]
+    assert lo == pytest.approx(20.77 + 1.0, abs=0.1)
+    assert hi == pytest.approx(20.77 + 9.0, abs=0.1)
+
+    # a fresh index reads the same segment back from disk
+    assert len(FingerprintIndex(str(tmp_path)).match("pod", third)) == 1
+    # and other podcasts don't see it
+    assert index.match("other", third) == []
+
+
+def test_learn_replaces_the_segment_list_instead_of_editing_it(burst, tmp_path, monkeypatch):
+    """match() may still be walking the list it read under the lock (64a732b)."""
+    monkeypatch.setattr(fingerprint, "MAX_SEGMENTS", 1)
+    index = FingerprintIndex(str(tmp_path))
+    segs, words = transcript()
+    for i, offset in enumerate([12.3, 5.0]):
+        index.learn("pod", f"e{i}", fingerprint_of(episode(burst, offset, seed=i)), segs, words)
+    with index._lock:
+        before = index._get("pod").segments
+    snapshot = list(before)
+    # a different recurring burst pushes the list over MAX_SEGMENTS (sort + truncate)
+    other = np.random.default_rng(11).standard_normal(int(BURST_S * SAMPLE_RATE)).astype(np.float32) * 0.1
+    for i, offset in enumerate([3.0, 25.0]):
+        index.learn("pod", f"f{i}", fingerprint_of(episode(other, offset, seed=20 + i)), segs, words)
+    with index._lock:
+        after = index._get("pod").segments
+    assert after is not before
+    assert len(after) == 1
+    assert before == snapshot  # the old list was left exactly as match() saw it
+
+
+def test_concurrent_match_and_learn(burst, tmp_path, monkeypatch):
+    monkeypatch.setattr(fingerprint, "MAX_SEGMENTS", 2)
+    index = FingerprintIndex(str(tmp_path))
+    segs, words = transcript()
+    prints = [fingerprint_of(episode(burst, 4.0 + 3 * i, seed=i)) for i in range(6)]
+    index.learn("pod", "e0", prints[0], segs, words)
+    index.learn("pod", "e1", prints[1], segs, words)
+    errors = []
+
+    def matcher():
+        try:
+            for _ in range(20):
+                for sp in index.match("pod", prints[5]):
+                    assert [t for *_, t in sp["seg_rows"]]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=matcher) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for i in range(2, 5):
+        index.learn("pod", f"e{i}", prints[i], segs, words)
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+# ---------------- transcripts ----------------
+
+@pytest.mark.parametrize("regions, skips, expected", [
+    (None, [], None),
+    (None, [(10.0, 20.0)], [(0.0, 10.0), (20.0, 60.0)]),
+    ([(0.0, 15.0), (18.0, 30.0)], [(10.0, 20.0)], [(0.0, 10.0), (20.0, 30.0)]),
+    ([(12.0, 18.0)], [(10.0, 20.0)], []),
+    ([(0.0, 30.0)], [(10.0, 20.0), (25.0, 40.0)], [(0.0, 10.0), (20.0, 25.0)]),
+])
+def test_skip_regions(regions, skips, expected):
+    spans = [{"skip": s} for s in skips]
+    assert skip_regions(regions, spans, 60.0) == expected
+
+
+def test_splice_renumbers_in_time_order_and_shifts_cached_words():
+    seg_rows = [(0.0, 4.0, "hello"), (11.0, 13.0, "stale"), (20.0, 22.0, "bye")]
+    word_rows = [(0, 0, 0.0, 2.0, "hel"), (0, 1, 2.0, 4.0, "lo"),
+                 (1, 0, 11.0, 13.0, "stale"), (2, 0, 20.0, 22.0, "bye")]
+    span = {"start_s": 9.0, "skip": (10.0, 15.0),
+            "seg_rows": [(1.0, 3.0, "ad one"), (3.5, 6.0, "ad two")],
+            "word_rows": [(0, 0, 1.0, 3.0, "ad"), (1, 0, 3.5, 4.0, "ad"), (1, 1, 4.0, 6.0, "two")]}
+    segs, words = splice(seg_rows, word_rows, [span])
+    assert segs == [(0.0, 4.0, "hello"), (10.0, 12.0, "ad one"), (12.5, 15.0, "ad two"),
+                    (20.0, 22.0, "bye")]
+    assert words == [(0, 0, 0.0, 2.0, "hel"), (0, 1, 2.0, 4.0, "lo"),
+                     (1, 0, 10.0, 12.0, "ad"),
+                     (2, 0, 12.5, 13.0, "ad"), (2, 1, 13.0, 15.0, "two"),
+                     (3, 0, 20.0, 22.0, "bye")]
+
+
+def test_splice_without_spans_is_a_no_op():
+    rows = ([(0.0, 1.0, "a")], [(0, 0, 0.0, 1.0, "a")])
+    assert splice(*rows, []) == rows
@@ -0,0 +1,107 @@
+"""Migration.ddl against a fake connection that times out part way through an index build."""
+import re
+
+import psycopg2
+import pytest
+
+from migrations import runner
+
+
+class LockTimeout(psycopg2.OperationalError):
+    pgcode = "55P03"
+
+
+class FakeDB:
+    """Just enough of Postgres: CREATE INDEX CONCURRENTLY, DROP INDEX, pg_index.indisvalid."""
+
+    def __init__(self, fail_builds=0, indexes=None):
+        self.fail_builds = fail_builds
+        self.indexes = dict(indexes or {})  # name -> indisvalid
+        self.statements = []
+        self.autocommit = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        db = self.db
+        db.statements.append(" ".join(sql.split()))
+        if sql.startswith("SELECT indisvalid"):
+            valid = db.indexes.get(params[0])
+            self._row = None if valid is None else (valid,)
+            return
+        drop = re.match(r"DROP INDEX CONCURRENTLY IF EXISTS (\S+)", sql)
+        if drop:
+            db.indexes.pop(drop.group(1), None)
+            return
+        create = runner.CONCURRENT_INDEX_RE.search(sql)
+        if create:
+            assert db.autocommit, "CREATE INDEX CONCURRENTLY outside autocommit"
+            name = create.group(1)
+            if name in db.indexes and "IF NOT EXISTS" in sql.upper():
+                return  # Postgres skips an existing index, valid or not
+            if db.fail_builds:
+                db.fail_builds -= 1
+                db.indexes[name] = False  # the catalog entry stays behind, INVALID
+                raise LockTimeout("canceling statement due to lock timeout")
+            db.indexes[name] = True
+
+    def fetchone(self):
+        return self._row
+
+
+CREATE = """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS episodes_claim_idx
+        ON episodes (priority DESC, fair_seq, date_entered DESC)
+"""
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(runner.time, "sleep", lambda s: None)
+
+
+def test_timeout_mid_build_drops_invalid_index_and_rebuilds():
+    db = FakeDB(fail_builds=1)
+    runner.Migration(db, 8, "claim_order").ddl(CREATE, autocommit=True)
+    assert db.indexes == {"episodes_claim_idx": True}
+    assert "DROP INDEX CONCURRENTLY IF EXISTS episodes_claim_idx" in db.statements
+    assert db.autocommit is False
+
+
+def test_invalid_index_from_an_earlier_run_is_rebuilt():
+    db = FakeDB(indexes={"episodes_claim_idx": False})
+    runner.Migration(db, 8, "claim_order").ddl(CREATE, autocommit=True)
+    assert db.indexes == {"episodes_claim_idx": True}
+
+
+def test_valid_index_is_left_alone():
+    db = FakeDB(indexes={"episodes_claim_idx": True})
+    runner.Migration(db, 8, "claim_order").ddl(CREATE, autocommit=True)
+    assert not any(s.startswith("DROP") for s in db.statements)
+
+
+def test_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(runner, "DDL_RETRIES", 3)
+    db = FakeDB(fail_builds=5)
+    with pytest.raises(LockTimeout):
+        runner.Migration(db, 8, "claim_order").ddl(CREATE, autocommit=True)
+    assert db.indexes == {"episodes_claim_idx": False}  # never recorded as applied
@@ -0,0 +1,52 @@
+"""ModelCache keys and ModelPool loading through the cache, with fake model builds."""
+import pytest
+
+import whisper_runtime
+from whisper_runtime import ModelCache, ModelPool, parse_placement
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    def build(**kw):
+        calls.append(kw)
+        return object()
+
+    monkeypatch.setitem(whisper_runtime.MODELS, "fw_fake",
+                        dict(build=build, approx_mb=100, word_runner=None, seg_runner=None))
+    return calls
+
+
+def test_same_key_loads_once(builds):
+    cache = ModelCache(budget_mb=0)
+    assert cache.get("fw_fake", "cuda") is cache.get("fw_fake", "cuda:0")
+    assert len(builds) == 1
+
+
+def test_build_kw_are_part_of_the_key(builds):
+    cache = ModelCache(budget_mb=0)
+    default = cache.get("fw_fake", "cpu")
+    wide = cache.get("fw_fake", "cpu", num_workers=4)
+    assert wide is not default
+    assert builds[1]["num_workers"] == 4 and "num_workers" not in builds[0]
+    assert cache.get("fw_fake", "cpu", num_workers=4) is wide
+
+
+def test_cache_wide_build_kw_apply_to_every_key(builds):
+    cache = ModelCache(budget_mb=0, num_workers=2)
+    assert cache.key("fw_fake", "cpu") == cache.key("fw_fake", "cpu", num_workers=2)
+    cache.get("fw_fake", "cpu")
+    assert builds[0]["num_workers"] == 2
+
+
+def test_pool_never_reuses_a_copy_built_with_other_workers(builds):
+    cache = ModelCache(budget_mb=0)
+    default = cache.get("fw_fake", "cpu")
+    pool = ModelPool("fw_fake", parse_placement("cpu=2"), cache=cache)
+    models = {id(m) for m, _ in pool.slots}
+    assert id(default) not in models and len(models) == 2  # one replica per instance
+    assert all(kw.get("num_workers") == 1 for kw in builds[1:])
+    assert not cache.evict("fw_fake", "cpu", replica=1, **dict(cache.stats()[-1]["build_kw"]))
+    pool.close()
+    assert cache.evict("fw_fake", "cpu", replica=1, **dict(cache.stats()[-1]["build_kw"]))
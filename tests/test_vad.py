@@ -0,0 +1,74 @@
+"""Packing speech regions and mapping packed times back (vad.pack_speech / original_time / pack_chunks)."""
+import numpy as np
+import pytest
+
+from vad import SAMPLE_RATE, pack_speech, original_time, pack_chunks
+
+REGIONS = [(1.0, 3.0), (5.0, 6.0), (10.0, 12.0)]
+# packed buffer: [0, 2) <- 1..3, [2, 3) <- 5..6, [3, 5) <- 10..12
+TABLE = [(0.0, 1.0), (2.0, 5.0), (3.0, 10.0)]
+
+
+def audio_s(seconds):
+    return np.arange(int(seconds * SAMPLE_RATE), dtype=np.int64)
+
+
+def test_pack_speech_concatenates_regions_and_records_offsets():
+    audio = audio_s(20.0)
+    packed, table = pack_speech(audio, REGIONS)
+    assert table == TABLE
+    expected = np.concatenate([audio[int(a * SAMPLE_RATE):int(b * SAMPLE_RATE)] for a, b in REGIONS])
+    assert np.array_equal(packed, expected)
+
+
+def test_pack_speech_clips_to_the_audio_and_drops_empty_regions():
+    packed, table = pack_speech(audio_s(11.0), REGIONS + [(15.0, 16.0)])
+    assert table == TABLE
+    assert len(packed) == 4 * SAMPLE_RATE  # 2 + 1 + the 1 s of the last region that exists
+
+
+@pytest.mark.parametrize("t, is_end, expected", [
+    (0.0, False, 1.0),
+    (1.5, False, 2.5),
+    (1.5, True, 2.5),   # inside a region start and end agree
+    (2.0, False, 5.0),  # on a boundary a start belongs to the next region...
+    (2.0, True, 3.0),   # ...and an end to the one before it
+    (3.0, False, 10.0),
+    (3.0, True, 6.0),
+    (5.0, True, 12.0),  # end of the packed buffer
+    (0.0, True, 1.0),   # nothing before the first region: stay in it
+])
+def test_original_time(t, is_end, expected):
+    assert original_time(TABLE, t, is_end=is_end) == pytest.approx(expected)
+
+
+def test_original_time_without_packing_is_the_identity():
+    assert original_time([], 7.25) == 7.25
+    assert original_time([], 7.25, is_end=True) == 7.25
+
+
+def test_region_bounds_round_trip():
+    _, table = pack_speech(audio_s(20.0), REGIONS)
+    for (packed_start, _), (start, end) in zip(table, REGIONS):
+        length = end - start
+        assert original_time(table, packed_start) == pytest.approx(start)
+        assert original_time(table, packed_start + length, is_end=True) == pytest.approx(end)
+
+
+@pytest.mark.parametrize("regions, max_s, expected", [
+    # neighbours merge while the chunk stays within max_s, exactly max_s included
+    ([(0.0, 10.0), (12.0, 20.0), (25.0, 30.0)], 30.0, [(0.0, 30.0)]),
+    # one more second and the last region starts a new chunk
+    ([(0.0, 10.0), (12.0, 20.0), (25.0, 31.0)], 30.0, [(0.0, 20.0), (25.0, 31.0)]),
+    # a region of exactly max_s is one chunk
+    ([(5.0, 35.0)], 30.0, [(5.0, 35.0)]),
+    # exactly 2 x max_s splits in two, without an empty remainder
+    ([(5.0, 65.0)], 30.0, [(5.0, 35.0), (35.0, 65.0)]),
+    # longer regions split at max_s, the remainder may merge with what follows
+    ([(0.0, 70.0), (72.0, 75.0)], 30.0, [(0.0, 30.0), (30.0, 60.0), (60.0, 75.0)]),
+    ([], 30.0, []),
+])
+def test_pack_chunks(regions, max_s, expected):
+    chunks = pack_chunks(regions, max_s)
+    assert chunks == expected
+    assert all(b - a <= max_s for a, b in chunks)
@@ -1,27 +1,67 @@
 import os
 import time
-import queue
+import socket
 import threading
 import traceback
 from contextlib import ExitStack
-from typing import Dict, Any, Optional
 
-from whisper_runtime import get_word_level_model
-from db_client import get_db_client
-from sftp_client import get_sftp_client
+import vad
+import chunking
+from chunking import CHECKPOINT_MIN_S
+from prefetch import Prefetcher
+from langid import LanguageGate, LANG_MODEL
+import fingerprint
+from fingerprint import FingerprintIndex, USE_FINGERPRINT
+from audio_stream import purge_stale_pcm
+from whisper_runtime import ModelPool, parse_placement, SAMPLE_RATE
+from db_client import get_db_client, RUN_STAGES
+from db_writer import DBWriter, record_runs
 
 # -------------------
 # Config
 # -------------------
 DEVICE = os.getenv("ASR_DEVICE", "cuda")          # "cuda" or "cpu"
-MODEL_NAME = os.getenv("ASR_MODEL", "fw_base")    # "fw_base", "fw_tiny", "oa_base"
-WORKER_ID = os.getenv("HOSTNAME") or os.getenv("COMPUTERNAME") or "worker-unknown"
-
-NUM_WORKERS = int(os.getenv("ASR_WORKERS", "1"))  # # of transcribe threads (be careful with VRAM)
-PREFETCH = int(os.getenv("ASR_PREFETCH", "3"))    # max temp files queued (downloaded ahead)
-CLAIM_BATCH = int(os.getenv("ASR_CLAIM_BATCH", "2"))
-SLEEP_EMPTY_S = float(os.getenv("ASR_EMPTY_SLEEP", "2.0"))
-LEASE_MINUTES = int(os.getenv("ASR_LEASE_MIN", "60"))  # must match your DB config
+MODEL_NAME = os.getenv("ASR_MODEL", "fw_base")    # "fw_base", "fw_tiny", "oa_base", ...
+# "auto": load every ASR_ROUTE_MODELS model and pick one per episode (routing.py)
+AUTO_ROUTE = MODEL_NAME == "auto"
+# leases are held by worker id: unique per process unless ASR_WORKER_ID pins it. A pinned
+# id (one per pipeline, stable across restarts) also takes back at startup the leases its
+# previous run left behind, and keeps its measured throughput in the workers table
+PINNED_WORKER_ID = os.getenv("ASR_WORKER_ID")
+WORKER_ID = PINNED_WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+
+# model placement: "<device>[:<index>]=<instances>[x<ct2 workers>]", comma separated,
+# e.g. "cuda:0=2,cuda:1=2" or "cpu=4". Defaults to one instance on ASR_DEVICE.
+PLACEMENT = os.getenv("ASR_PLACEMENT") or f"{DEVICE}=1"
+CPU_THREADS = int(os.getenv("ASR_CPU_THREADS", "0"))  # per CPU instance; 0 = cores / instances
+NUM_WORKERS = int(os.getenv("ASR_WORKERS", "0"))  # # of transcribe threads; 0 = one per pool slot
+# "threads": in-process ModelPool (GPU or CPU). "procs": CPU-only, one model per
+# worker process (cpu_workers.py); ASR_PROCS x ASR_CPU_THREADS, auto-tuned if unset.
+MODE = os.getenv("ASR_MODE", "threads")
+NUM_PROCS = int(os.getenv("ASR_PROCS", "0"))
+# batched inference (faster-whisper only): ASR_BATCH_SIZE VAD chunks per forward
+# pass, packing up to ASR_BATCH_EPISODES already-downloaded episodes per run. 0 = off.
+BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "0"))
+BATCH_EPISODES = int(os.getenv("ASR_BATCH_EPISODES", "4"))
+# split a long episode across up to ASR_SHARDS pool slots when nothing else is queued
+SHARDS = int(os.getenv("ASR_SHARDS", "1"))
+USE_VAD = os.getenv("ASR_VAD", "1") != "0"  # per-model settings in whisper_runtime.MODELS
+# skip recurring intros/ads by audio fingerprint and splice in their cached text:
+# see fingerprint.py (ASR_FINGERPRINT=1, ASR_FP_DIR, ...)
+# language ID on the audio head, skip or re-route other languages: see langid.py
+# (ASR_LANG_POLICY, ASR_LANGUAGES, ASR_LANG_MODEL)
+# fetch-ahead budget / downloader scaling: see prefetch.py (ASR_PREFETCH_MB,
+# ASR_PREFETCH_AUDIO_S, ASR_DOWNLOADERS_MIN/MAX); claims are sized to this worker's
+# measured throughput (ASR_LEASE_HORIZON_MIN, ASR_CLAIM_BATCH)
+# lease length scales with episode length: see db_client.py (ASR_LEASE_MIN,
+# ASR_LEASE_FLOOR_MIN, ASR_LEASE_PER_AUDIO); the heartbeat below uses the same rule
+# for every episode claimed here (queued or in progress), every ASR_LEASE_HEARTBEAT_S
+HEARTBEAT_S = float(os.getenv("ASR_LEASE_HEARTBEAT_S", "60"))
+# ASR_MODEL_SERVER=<socket>: borrow models from a running model_server.py instead of
+# loading a pool (ASR_PLACEMENT is then the server's business; ASR_DEVICE picks the device)
+MODEL_SERVER = os.getenv("ASR_MODEL_SERVER")
+# results are stored by a background writer in batches: see db_writer.py (ASR_WRITE_BATCH,
+# ASR_WRITE_MAX_MB, ...); it also writes the per-episode transcription_runs rows (ASR_RUNS)
 
 SENTINEL = object()  # queue poison pill
 
@@ -29,190 +69,253 @@ SENTINEL = object()  # queue poison pill
 # Small helpers
 # -------------------
 
-def _fetch_episode_meta(db, episode_id: str) -> Optional[Dict[str, Any]]:
-    """Return at least {'id','audio_path'} for an episode id."""
+def _speech_regions(eid: str, audio, model_name: str = MODEL_NAME):
+    """VAD speech regions for the episode (cached by id); None = decode everything."""
+    if not USE_VAD:
+        return None
     try:
-        return db.get_episode_meta(episode_id)
-    except AttributeError:
-        with db.conn.cursor() as cur:
-            cur.execute("SELECT id, audio_path FROM episodes WHERE id = %s", (episode_id,))
-            row = cur.fetchone()
-        if not row:
-            return None
-        return {"id": row[0], "audio_path": row[1]}
-
-def _download_to_temp(sftp, remote_path: str, dest_dir: str) -> str:
-    """Download remote_path to a temp file and return local path."""
-    sftp.sftp.stat(remote_path)  # raise if missing
-    local_path = os.path.join(dest_dir, f"temp_{os.path.basename(remote_path)}")
-    with open(local_path, "wb") as dst:
-        sftp.sftp.getfo(remote_path, dst)
-    return local_path
-
-class LeaseExtender:
-    """Background pinger to extend a lease while a long job runs."""
-    def __init__(self, db, episode_id: str, minutes: int = LEASE_MINUTES, interval_s: int = 60):
-        self.db = db
-        self.episode_id = episode_id
-        self.minutes = minutes
+        return vad.speech_regions(model_name, audio, key=eid)
+    except Exception as e:
+        print(f"[vad] {eid}: {e}; transcribing full file")
+        return None
+
+class LeaseHeartbeat:
+    """
+    Background pinger that renews every lease this process holds, in one
+    UPDATE per tick: not just the episodes workers are on, but also ones
+    claimed and queued by the prefetcher, which can wait longer than the
+    shortest lease (ASR_LEASE_FLOOR_MIN), and finished ones the DB writer
+    hasn't stored yet. `held` returns those ids. Uses its own DB connection.
+    """
+    def __init__(self, held, interval_s: float = HEARTBEAT_S):
+        self.held = held
         self.interval_s = interval_s
         self._stop = threading.Event()
-        self._thr = threading.Thread(target=self._run, daemon=True)
+        self._thr = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
 
     def _run(self):
-        while not self._stop.wait(self.interval_s):
-            try:
-                self.db.extend_lease(self.episode_id, minutes=self.minutes)
-            except Exception as e:
-                # Non-fatal; we’ll try again on next tick
-                print(f"[lease] extend failed for {self.episode_id}: {e}")
+        with ExitStack() as stack:
+            db = None
+            while not self._stop.wait(self.interval_s):
+                ids = self.held()
+                if not ids:
+                    continue
+                try:
+                    if db is None:
+                        db = stack.enter_context(get_db_client())
+                    db.extend_leases(WORKER_ID, ids)
+                except Exception as e:
+                    # Non-fatal; we'll try again on next tick (on a fresh connection)
+                    print(f"[lease] extending {len(ids)} lease(s) failed: {e}")
+                    stack.close()
+                    db = None
 
     def start(self): self._thr.start()
     def stop(self): self._stop.set()
 
+def _run_record(it, status: str) -> dict:
+    """The item's transcription_runs row (stage timings so far)."""
+    t = it.get("timings", {})
+    run = {"episode_id": it["id"], "worker_id": WORKER_ID, "model": it.get("model"),
+           "device": it.get("device"), "status": status, "audio_s": it["audio_s"],
+           "queue_depth": it.get("queue_depth")}
+    run.update({f"{stage}_s": t.get(f"{stage}_s") for stage in RUN_STAGES})
+    return run
+
 # -------------------
-# Producer (Downloader)
+# Consumer (Transcriber)
 # -------------------
 
-def downloader_thread(sftp, out_q: "queue.Queue", stop_event: threading.Event):
-    """
-    Producer: claims episodes, downloads files, enqueues {'id','path'} items.
-    Honors PREFETCH strictly; claims only up to free capacity.
-    """
-    from db_client import get_db_client  # thread-local import
-
-    # simple "no work" sentinel: if we see N consecutive empty polls and the queue is empty, we exit
-    EMPTY_LIMIT = 3
-    empty_count = 0
+def _checkpointed(item) -> bool:
+    """Long episodes are transcribed in checkpointed windows (chunking.py)."""
+    return bool(CHECKPOINT_MIN_S) and len(item["audio"]) / SAMPLE_RATE >= CHECKPOINT_MIN_S
 
+def _known_spans(fp_index, it):
+    """Fingerprint an item and find its podcast's known recurring segments in it."""
     try:
-        with get_db_client() as db:
-            while not stop_event.is_set():
-                free = max(0, PREFETCH - out_q.qsize())
-                if free <= 0:
-                    time.sleep(0.2)
-                    continue
-
-                batch = min(CLAIM_BATCH, free)
-                try:
-                    ids = db.claim_episodes(WORKER_ID, batch_size=batch)
-                except Exception as e:
-                    print(f"[CLAIM FAIL] {e}")
-                    time.sleep(1.0)
-                    continue
-
-                if not ids:
-                    empty_count = empty_count + 1 if out_q.qsize() == 0 else 0
-                    if empty_count >= EMPTY_LIMIT:
-                        # nothing to claim AND nothing queued → producer done
-                        break
-                    time.sleep(SLEEP_EMPTY_S)
-                    continue
-
-                empty_count = 0
-
-                for eid in ids:
-                    if stop_event.is_set():
-                        break
-
-                    meta = _fetch_episode_meta(db, eid)
-                    apath = (meta or {}).get("audio_path")
-                    if not apath:
-                        print(f"[META MISS] {eid}: no audio_path")
-                        try:
-                            db.mark_failed(eid, retry=False)
-                        except Exception:
-                            pass
-                        continue
-
-                    try:
-                        local_path = _download_to_temp(sftp, apath, dest_dir=os.getcwd())
-                    except Exception as e:
-                        print(f"[DL FAIL] {eid} {apath}: {e}")
-                        traceback.print_exc()
-                        try:
-                            db.mark_failed(eid, retry=True)
-                        except Exception:
-                            pass
-                        continue
-
-                    # block until space available (keeps PREFETCH bound)
-                    while not stop_event.is_set():
-                        try:
-                            out_q.put({"id": eid, "path": local_path}, timeout=0.5)
-                            break
-                        except queue.Full:
-                            continue
+        prints = fingerprint.fingerprint(it["audio"])
+        return prints, fp_index.match(it.get("podcast_id"), prints)
+    except Exception as e:
+        print(f"[fp] {it['id']}: {e}; transcribing all of it")
+        return None, []
+
+def _transcribe_items(idx: int, db, pool, items, batch_fn, prefetcher, model_name: str = MODEL_NAME,
+                      language: str = None, fp_index: FingerprintIndex = None):
+    """
+    Transcribe a group of fetched items with one model (`pool` holds
+    `model_name`), in `language` if known; returns {episode_id: (seg_rows, word_rows)}
+    for the ones that succeeded. Short episodes share one model borrow (batched
+    if batch_fn is set); long ones go window by window with checkpoints, and
+    are sharded across idle pool slots when the queue is empty. With an
+    fp_index, known intros/ads are left out of decoding and their cached
+    text spliced in, and each finished episode teaches the index.
+    """
+    results = {}
+    # VAD runs outside the model slot so the decoder isn't kept waiting
+    regions = {it["id"]: _speech_regions(it["id"], it["audio"], model_name) for it in items}
+    prints, spans = {}, {}
+    if fp_index:
+        for it in items:
+            prints[it["id"]], spans[it["id"]] = _known_spans(fp_index, it)
+            if spans[it["id"]]:
+                regions[it["id"]] = fingerprint.skip_regions(
+                    regions[it["id"]], spans[it["id"]], it["audio_s"])
+                skipped = sum(hi - lo for lo, hi in (sp["skip"] for sp in spans[it["id"]]))
+                print(f"[fp] {it['id']}: {len(spans[it['id']])} known segment(s), "
+                      f"{skipped:.0f}s not decoded")
+    short = [it for it in items if not _checkpointed(it)]
+    long_ = [it for it in items if _checkpointed(it)]
+
+    if short:
+        try:
+            with pool.acquire() as (model, run_fn):
+                if batch_fn:
+                    outs = batch_fn(model, [it["audio"] for it in short],
+                                    batch_size=BATCH_SIZE, language=language,
+                                    regions=[regions[it["id"]] for it in short])
+                else:
+                    outs = [run_fn(model, it["audio"], regions=regions[it["id"]], language=language)
+                            for it in short]
+            results.update({it["id"]: out for it, out in zip(short, outs)})
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            print(f"[worker {idx}] FAIL {[it['id'] for it in short]}: {e}")
+            traceback.print_exc()
+
+    def run_window(audio, window_regions):
+        with pool.acquire() as (model, run_fn):
+            return run_fn(model, audio, regions=window_regions, language=language)
+
+    for it in long_:
+        # other workers are idle when nothing is queued: let this episode use their slots
+        shards = min(SHARDS, pool.size) if prefetcher.queue.qsize() == 0 else 1
+        try:
+            results[it["id"]] = chunking.transcribe_checkpointed(
+                db, it["id"], model_name, it["audio"], regions[it["id"]], run_window,
+                shards=shards)
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            print(f"[worker {idx}] FAIL {it['id']}: {e}")
+            traceback.print_exc()
+
+    if fp_index:
+        for it in items:
+            eid = it["id"]
+            if eid not in results:
+                continue
+            results[eid] = fingerprint.splice(*results[eid], spans[eid])
+            if prints[eid] is None:
+                continue
+            try:
+                fp_index.learn(it.get("podcast_id"), eid, prints[eid], *results[eid], spans[eid])
+            except Exception as e:
+                print(f"[fp] {eid}: index update failed: {e}")
+    return results
 
-    except Exception:
-        traceback.print_exc()
-    # Let main thread place N sentinels for N workers once producer exits.
-
-# -------------------
-# Consumer (Transcriber)
-# -------------------
+def _batch_fn(pool):
+    return getattr(pool, "batch_fn", None) if BATCH_SIZE > 0 else None
 
 def transcribe_worker(idx: int,
-                      model,
-                      run_fn,
-                      model_lock: threading.Lock,
-                      in_q: "queue.Queue",
-                      stop_event: threading.Event):
+                      pools: dict,
+                      prefetcher: Prefetcher,
+                      writer: DBWriter,
+                      stop_event: threading.Event,
+                      router=None,
+                      gate: LanguageGate = None,
+                      fp_index: FingerprintIndex = None):
     """
-    Consumer: pulls items from queue, transcribes, writes to DB, cleans up.
-    Uses a dedicated DB connection per worker. Serializes model use with a lock.
+    Consumer: pulls items from queue, transcribes, hands the result to the
+    DB writer and moves on without waiting for it to be stored.
+    Uses a dedicated DB connection per worker (leases, checkpoints). Borrows a model instance from
+    the pool for each inference, so N slots give N concurrent transcriptions.
+    With ASR_BATCH_SIZE set (and a model that supports it) the worker also
+    takes whatever else is already downloaded, up to ASR_BATCH_EPISODES, and
+    decodes all of them in one batched run.
+    `pools` maps model name -> pool; with a router each item goes to the pool
+    of the model it is routed to, otherwise everything uses MODEL_NAME. A
+    language gate sends other-language episodes to its multilingual model.
     """
     print(f"[worker {idx}] starting")
     from db_client import get_db_client  # thread-local import
 
+    batching = any(_batch_fn(p) for p in pools.values())
+
     try:
         with get_db_client() as db:
             while not stop_event.is_set():
-                item = in_q.get()  # blocking
+                item = prefetcher.get()  # blocking
+                depth = prefetcher.queue.qsize()
                 if item is SENTINEL:
                     # put back for other workers and exit
-                    in_q.put(SENTINEL)
-                    in_q.task_done()
+                    prefetcher.queue.put(SENTINEL)
+                    prefetcher.queue.task_done()
                     print(f"[worker {idx}] stopping")
                     return
 
-                eid = item["id"]
-                local_path = item["path"]
-                extender = None
+                items = [item]
+                if batching:
+                    items += prefetcher.take_ready(BATCH_EPISODES - 1, sentinel=SENTINEL)
+                for it in items:
+                    it["queue_depth"] = depth
+                results = {}
 
                 try:
-                    # keep lease alive during long transcribe
-                    extender = LeaseExtender(db, eid, minutes=LEASE_MINUTES, interval_s=60)
-                    extender.start()
-
-                    # serialize GPU model use (safe default)
-                    with model_lock:
-                        segs, words = run_fn(model, local_path)
-
-                    # write and mark done
-                    db.word_level_insert(eid, segs, words)
-                    db.mark_done(eid)
-                    print(f"[worker {idx}] updated: {local_path}")
-
-                except KeyboardInterrupt:
-                    raise
-                except Exception as e:
-                    print(f"[worker {idx}] FAIL {eid}: {e}")
-                    traceback.print_exc()
-                    try:
-                        # retryable; you can choose retry=False for repeated failures
-                        db.mark_failed(eid, retry=True)
-                    except Exception:
-                        pass
+                    groups = {}
+                    for it in items:
+                        it["model"] = (router.route(db, it["audio_s"], it.get("podcast_id"))
+                                       if router else MODEL_NAME)
+                        if gate:
+                            it["model"] = gate.model_for(it.get("language"), it["model"])
+                        groups.setdefault((it["model"], it.get("language")), []).append(it)
+                    for (name, language), group in groups.items():
+                        pool = pools[name]
+                        t0 = time.monotonic()
+                        out = _transcribe_items(idx, db, pool, group, _batch_fn(pool),
+                                                prefetcher, name, language, fp_index)
+                        elapsed = time.monotonic() - t0
+                        group_audio_s = sum(it["audio_s"] for it in group) or 1.0
+                        for it in group:
+                            # a batched run's time is shared by audio length
+                            it["timings"]["inference_s"] = elapsed * it["audio_s"] / group_audio_s
+                            it["device"] = getattr(pool, "device", DEVICE)
+                        if router and out:
+                            router.observe(name, sum(it["audio_s"] for it in group if it["id"] in out),
+                                           elapsed)
+                        results.update(out)
+
+                    for it in items:
+                        eid = it["id"]
+                        try:
+                            if eid not in results:
+                                raise RuntimeError("transcription failed")
+                            segs, words = results[eid]
+                            # writer stores rows + marks done (and drops checkpoints)
+                            writer.submit({
+                                "episode_id": eid, "seg_rows": segs, "word_rows": words,
+                                "audio_duration_s": len(it["audio"]) / SAMPLE_RATE,
+                                "model": it["model"], "language": it.get("language"),
+                                "run": _run_record(it, "done"),
+                            })
+                            rtf = it["timings"]["inference_s"] / max(it["audio_s"], 1e-9)
+                            print(f"[worker {idx}] transcribed: {it['source']} "
+                                  f"({it['model']}, RTF {rtf:.3f})")
+                        except KeyboardInterrupt:
+                            raise
+                        except Exception as e:
+                            if eid in results:
+                                print(f"[worker {idx}] FAIL {eid}: {e}")
+                                traceback.print_exc()
+                            try:
+                                # retryable; you can choose retry=False for repeated failures
+                                db.mark_failed(eid, retry=True, worker_id=WORKER_ID)
+                            except Exception:
+                                pass
+                            record_runs(db, [_run_record(it, "failed")])
                 finally:
-                    if extender:
-                        extender.stop()
-                    try:
-                        if os.path.exists(local_path):
-                            os.remove(local_path)
-                    except Exception:
-                        pass
-                    in_q.task_done()
+                    for it in items:
+                        prefetcher.done(it)  # frees its share of the prefetch budget
     except Exception:
         traceback.print_exc()
 
@@ -220,44 +323,116 @@ def transcribe_worker(idx: int,
 # Orchestrator
 # -------------------
 
+def _load_pool(name: str, placement, stack: ExitStack):
+    """A ModelPool on `placement`, or the model server's slots for `name` with ASR_MODEL_SERVER."""
+    if MODEL_SERVER:
+        from model_server import ServerModelPool
+        return ServerModelPool(name, DEVICE, path=MODEL_SERVER)
+    pool = ModelPool(name, placement, cpu_threads=CPU_THREADS)
+    stack.callback(pool.close)  # unpin its instances from the model cache
+    return pool
+
+
 def transcribe_missing_episodes():
     """
     End-to-end runner:
-      - opens SFTP
-      - loads ASR model once (shared)
-      - starts one downloader (producer) + N transcribe workers (consumers)
-      - waits until producer finishes and queue drains, then sends sentinels
+      - starts the prefetcher (downloaders claim + stream audio into memory)
+      - loads the model pool (ASR_PLACEMENT instances across devices,
+        or ASR_MODE=procs: one CPU process per model copy); with ASR_MODEL=auto
+        one pool per routed model, each on the same placement
+      - starts N transcribe workers (consumers) and the DB writer they hand results to
+      - waits until nothing is left to claim and the queue drains, then sends sentinels
+      - on the way out (done, Ctrl-C or an error) hands every lease it still holds
+        back in one UPDATE; with a pinned ASR_WORKER_ID it does the same at startup
+        for leases a previous run under that id left behind
     """
-    q = queue.Queue(maxsize=PREFETCH)
     stop_event = threading.Event()
-    model_lock = threading.Lock()  # serialize model use across workers
+    purge_stale_pcm()  # PCM files from a previous run that died
 
     with ExitStack() as stack:
         db = stack.enter_context(get_db_client())          # sanity check DB only
-        sftp = stack.enter_context(get_sftp_client())      # one SFTP for producer
-        print(f"Transcribing with {MODEL_NAME} on {DEVICE}…")
-
-        # Load model once and share (safe; avoids multiple VRAM loads)
-        model, run_fn = get_word_level_model(MODEL_NAME, device=DEVICE)
-
-        # Start producer
-        prod = threading.Thread(target=downloader_thread, args=(sftp, q, stop_event), daemon=True)
-        prod.start()
+        stale = db.reclaim_stale_leases(WORKER_ID) if PINNED_WORKER_ID else 0
+        if stale:
+            print(f"[lease] reclaimed {stale} episode(s) left 'processing' by a previous run of {WORKER_ID}")
+        gate = LanguageGate()
+        fp_index = FingerprintIndex() if USE_FINGERPRINT else None
+        # Start fetching (downloads ahead while models load / CPU calibration runs)
+        prefetcher = Prefetcher(WORKER_ID, language_gate=gate)
+        prefetcher.start()
+        writer = DBWriter(WORKER_ID)
+
+        def _held():
+            # prefetcher.done() drops an id once its result is with the writer;
+            # the lease is ours until the writer has stored or released it
+            return sorted(set(prefetcher.outstanding()) | set(writer.pending_ids()))
+
+        heartbeat = LeaseHeartbeat(_held)  # keeps queued, in-progress and unwritten leases alive
+        heartbeat.start()
+        stack.callback(heartbeat.stop)
+
+        def _release_leases():
+            prefetcher.stop()
+            try:
+                n = db.release_leases(WORKER_ID, _held())
+            except Exception as e:
+                print(f"[lease] release failed ({e}); leases will expire instead")
+                return
+            if n:
+                print(f"[lease] released {n} unfinished episode(s)")
+
+        stack.callback(_release_leases)
+        writer.start()
+        stack.callback(writer.close)  # runs before _release_leases: flushes queued results
+        q = prefetcher.queue
+
+        router = None
+        if AUTO_ROUTE:
+            if MODE == "procs":
+                raise ValueError("ASR_MODEL=auto needs ASR_MODE=threads")
+            from routing import ModelRouter, ROUTE_MODELS
+            placement = parse_placement(PLACEMENT)
+            print(f"Transcribing with routed models {ROUTE_MODELS}, placement {PLACEMENT}…")
+            pools = {name: _load_pool(name, placement, stack) for name in ROUTE_MODELS}
+            pool = pools[ROUTE_MODELS[0]]
+            router = ModelRouter(ROUTE_MODELS, slots=pool.size)
+        elif MODE == "procs":
+            if gate.policy == "route" and LANG_MODEL != MODEL_NAME:
+                raise ValueError("ASR_LANG_POLICY=route in procs mode needs ASR_LANG_MODEL == ASR_MODEL")
+            from cpu_workers import ProcessModelPool, resolve_cpu_split
+            procs, threads = resolve_cpu_split(
+                MODEL_NAME, NUM_PROCS, CPU_THREADS,
+                sample_fn=prefetcher.first_queued_audio)
+            print(f"Transcribing with {MODEL_NAME} on {procs} CPU process(es) x {threads} thread(s)…")
+            pool = ProcessModelPool(MODEL_NAME, procs, threads)
+            stack.callback(pool.close)
+        else:
+            print(f"Transcribing with {MODEL_NAME}, placement {PLACEMENT}…")
+            # Load every instance up front; workers borrow them per episode
+            pool = _load_pool(MODEL_NAME, parse_placement(PLACEMENT), stack)
+        if router is None:
+            pools = {MODEL_NAME: pool}
+        if gate.policy == "route" and LANG_MODEL not in pools:
+            print(f"Loading {LANG_MODEL} for other-language episodes…")
+            pools[LANG_MODEL] = _load_pool(LANG_MODEL, parse_placement(PLACEMENT), stack)
+        # routed pools share the devices: one worker per placement slot, not per model copy
+        num_workers = NUM_WORKERS or pool.size
+        prefetcher.consumers = num_workers
+        print(f"Model pool ready: {pool.size} slot(s), {num_workers} worker thread(s)")
 
         # Start consumers
         workers = []
-        for i in range(NUM_WORKERS):
+        for i in range(num_workers):
             t = threading.Thread(
                 target=transcribe_worker,
-                args=(i+1, model, run_fn, model_lock, q, stop_event),
+                args=(i+1, pools, prefetcher, writer, stop_event, router, gate, fp_index),
                 daemon=True
             )
             t.start()
             workers.append(t)
 
         try:
-            # Wait for producer to finish claiming/downloading
-            prod.join()
+            # Wait for downloaders to finish claiming/fetching
+            prefetcher.join()
 
             # Wait for queue to drain (all tasks processed)
             q.join()
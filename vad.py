@@ -0,0 +1,149 @@
+"""
+Voice-activity detection ahead of ASR.
+
+Intro music, ad beds and long silences cost decoder time and are where
+whisper hallucinates. speech_regions() runs faster-whisper's bundled Silero
+VAD (onnxruntime, works for every model family) and returns
+[(start_s, end_s), ...] on the original timeline. Runners lay the regions end
+to end (pack_speech) so the decoder sees full 30 s windows of speech rather
+than one padded window per short region, and map segment/word times back
+through the offset table (original_time).
+
+Settings live per model in whisper_runtime.MODELS[name]["vad"] (None = no VAD).
+Results are cached as JSON in VAD_CACHE_DIR, keyed by episode id (or file name
+and size when there is no id) plus a hash of the settings, so re-transcriptions
+and benchmarks skip the VAD pass.
+"""
+import os
+import re
+import json
+import bisect
+import hashlib
+import importlib
+
+VAD_CACHE_DIR = os.getenv("VAD_CACHE_DIR", "vad_cache")
+
+SAMPLE_RATE = 16000
+
+
+def _settings_hash(settings: dict) -> str:
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(VAD_CACHE_DIR, re.sub(r"[^\w.-]", "_", key) + ".json")
+
+
+def _file_key(path) -> str:
+    return f"{os.path.basename(str(path))}-{os.path.getsize(path)}"
+
+
+def load_cached(key: str, settings: dict):
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            regions = json.load(f).get(_settings_hash(settings))
+    except (OSError, ValueError):
+        return None
+    return None if regions is None else [tuple(r) for r in regions]
+
+
+def save_cached(key: str, settings: dict, regions):
+    os.makedirs(VAD_CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    data = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+    data[_settings_hash(settings)] = [list(r) for r in regions]
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def detect(audio, settings: dict):
+    """Run Silero VAD on 16 kHz float32 audio; returns [(start_s, end_s)]."""
+    fw_vad = importlib.import_module("faster_whisper.vad")
+    opts = fw_vad.VadOptions(**settings)
+    return [(round(c["start"] / SAMPLE_RATE, 3), round(c["end"] / SAMPLE_RATE, 3))
+            for c in fw_vad.get_speech_timestamps(audio, opts)]
+
+
+def speech_regions(model_name: str, audio, key: str = None):
+    """
+    Speech regions for `audio` (path or decoded array) under model_name's VAD
+    settings, or None if that model has VAD disabled. Cached under `key`
+    (episode id); paths without a key are cached by file name and size.
+    """
+    from whisper_runtime import MODELS, decode_audio
+    settings = MODELS[model_name].get("vad")
+    if settings is None:
+        return None
+    if key is None and not hasattr(audio, "shape"):
+        key = _file_key(audio)
+    if key is not None:
+        cached = load_cached(key, settings)
+        if cached is not None:
+            return cached
+    array = audio if hasattr(audio, "shape") else decode_audio(audio)
+    regions = detect(array, settings)
+    if key is not None:
+        save_cached(key, settings, regions)
+    return regions
+
+
+def pack_speech(audio, regions):
+    """
+    Concatenate the speech regions of a 16 kHz array. Returns (packed, table):
+    table is [(packed_start_s, original_start_s)] per region, for original_time().
+    """
+    np = importlib.import_module("numpy")
+    pieces, table, pos = [], [], 0
+    for start, end in regions:
+        a, b = int(start * SAMPLE_RATE), min(len(audio), int(end * SAMPLE_RATE))
+        if b <= a:
+            continue
+        pieces.append(audio[a:b])
+        table.append((pos / SAMPLE_RATE, a / SAMPLE_RATE))
+        pos += b - a
+    packed = np.concatenate(pieces) if pieces else audio[:0]
+    return packed, table
+
+
+def original_time(table, t: float, is_end: bool = False) -> float:
+    """
+    A time in pack_speech()'s buffer on the original timeline. An end time
+    that falls exactly on a region boundary belongs to the region before it.
+    """
+    if not table:
+        return t
+    if is_end:
+        i = bisect.bisect_left(table, (t, float("-inf"))) - 1
+    else:
+        i = bisect.bisect_right(table, (t, float("inf"))) - 1
+    packed_start, original_start = table[max(0, i)]
+    return original_start + (t - packed_start)
+
+
+def pack_chunks(regions, max_s: float = 30.0):
+    """
+    Group speech regions into chunks of at most max_s seconds for batched
+    decoding: neighbouring regions are merged while they fit, longer regions
+    are split. Returns [(start_s, end_s)].
+    """
+    chunks = []
+    for start, end in regions:
+        while end - start > max_s:
+            chunks.append((start, start + max_s))
+            start += max_s
+        if chunks and end - chunks[-1][0] <= max_s:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
@@ -1,8 +1,17 @@
 # Centralized ASR loader + runners for faster-whisper (fw_*) and openai-whisper (oa_*)
 
-import os, site, glob
+import os, sys, site, glob
+import gc
+import time
+import queue
+import bisect
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
 from functools import partial
 
+import vad
+
 # --- keep OpenMP from crashing on Windows when torch/ctranslate2 both bring libiomp ---
 os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")
 os.environ.setdefault("OMP_NUM_THREADS", "1")
@@ -38,71 +47,561 @@ def _import_fw():
     return importlib.import_module("faster_whisper")
 
 
+def audio_duration_s(path):
+    """Container-reported duration in seconds via PyAV (a faster-whisper dep); None if unknown."""
+    try:
+        av = importlib.import_module("av")
+        with av.open(str(path)) as container:
+            return container.duration / 1_000_000 if container.duration else None
+    except Exception:
+        return None
+
+
+SAMPLE_RATE = 16000  # what every whisper variant expects
+
+def decode_audio(path, sampling_rate: int = SAMPLE_RATE):
+    """Decode any container to mono float32 PCM (numpy) via faster-whisper's PyAV decoder."""
+    return _import_fw().decode_audio(str(path), sampling_rate=sampling_rate)
+
+def _audio_input(audio):
+    """Runners accept a file path or an already-decoded 16 kHz float32 array."""
+    return audio if hasattr(audio, "shape") else str(audio)
+
+
 # ---------------- runners ----------------
+# regions: optional [(start_s, end_s)] speech regions from vad.speech_regions();
+# only they are decoded, laid end to end (vad.pack_speech) so short regions share
+# 30 s windows instead of each padding out its own, and timestamps are mapped
+# back to the original timeline.
+# language: ISO code if already known (langid.py), else whisper detects it.
+
+def _decode_kw(language):
+    return {"language": language} if language else {}
 
-def oa_text_segments(model, mp3_path):
-    r = model.transcribe(str(mp3_path), word_timestamps=False)
-    return [(s['start'], s['end'], s['text']) for s in r['segments']]
+def _no_remap(t, is_end=False):
+    return t
 
-def oa_text_segments_word_level(model, mp3_path):
-    r = model.transcribe(str(mp3_path), word_timestamps=True)
+def _packed_input(audio, regions, load):
+    """(runner input, time remap): the packed speech regions, or the audio as is without regions."""
+    if not regions:
+        return _audio_input(audio), _no_remap
+    array = audio if hasattr(audio, "shape") else load(str(audio))
+    packed, table = vad.pack_speech(array, regions)
+    return packed, partial(vad.original_time, table)
+
+def _oa_load(path):
+    return _import_whisper().load_audio(path)
+
+def oa_text_segments(model, audio, regions=None, language=None):
+    if regions == []:
+        return []
+    audio, t = _packed_input(audio, regions, _oa_load)
+    r = model.transcribe(audio, word_timestamps=False, **_decode_kw(language))
+    return [(t(s['start']), t(s['end'], True), s['text']) for s in r['segments']]
+
+def oa_text_segments_word_level(model, audio, regions=None, language=None):
+    if regions == []:
+        return [], []
+    audio, t = _packed_input(audio, regions, _oa_load)
+    r = model.transcribe(audio, word_timestamps=True, **_decode_kw(language))
     seg_rows, word_rows = [], []
     for seg_idx, seg in enumerate(r["segments"]):
-        seg_rows.append((seg["start"], seg["end"], seg["text"]))
+        seg_rows.append((t(seg["start"]), t(seg["end"], True), seg["text"]))
         for word_idx, w in enumerate(seg.get("words", []) or []):
-            word_rows.append((seg_idx, word_idx, w["start"], w["end"], w["word"]))
+            word_rows.append((seg_idx, word_idx, t(w["start"]), t(w["end"], True), w["word"]))
     return seg_rows, word_rows
 
-def fw_text_segments(model, mp3_path):
-    seg_iter, _ = model.transcribe(str(mp3_path), beam_size=1)
-    return [(s.start, s.end, s.text) for s in seg_iter]
+def fw_text_segments(model, audio, regions=None, language=None):
+    if regions == []:
+        return []
+    audio, t = _packed_input(audio, regions, decode_audio)
+    seg_iter, _ = model.transcribe(audio, beam_size=1, **_decode_kw(language))
+    return [(t(s.start), t(s.end, True), s.text) for s in seg_iter]
 
-def fw_text_segments_word_level(model, mp3_path):
-    seg_iter, _ = model.transcribe(str(mp3_path), beam_size=1, word_timestamps=True)
+def fw_text_segments_word_level(model, audio, regions=None, language=None):
+    if regions == []:
+        return [], []
+    audio, t = _packed_input(audio, regions, decode_audio)
+    seg_iter, _ = model.transcribe(audio, beam_size=1, word_timestamps=True, **_decode_kw(language))
     seg_rows, word_rows = [], []
     for seg_idx, seg in enumerate(seg_iter):
-        seg_rows.append((seg.start, seg.end, seg.text))
+        seg_rows.append((t(seg.start), t(seg.end, True), seg.text))
         for word_idx, w in enumerate(seg.words or []):
-            word_rows.append((seg_idx, word_idx, w.start, w.end, w.word))
+            word_rows.append((seg_idx, word_idx, t(w.start), t(w.end, True), w.word))
     return seg_rows, word_rows
 
 
+# ---------------- language ID ----------------
+# (language, probability) from the first 30s of `audio`; needs a multilingual model.
+
+def fw_detect_language(model, audio):
+    # transcribe() detects the language up front; the segment generator is never run
+    _, info = model.transcribe(_audio_input(audio), beam_size=1, without_timestamps=True)
+    return info.language, info.language_probability
+
+def oa_detect_language(model, audio):
+    whisper = _import_whisper()
+    np = importlib.import_module("numpy")
+    audio = np.asarray(audio, dtype=np.float32) if hasattr(audio, "shape") else whisper.load_audio(str(audio))
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)).to(model.device)
+    _, probs = model.detect_language(mel)
+    language = max(probs, key=probs.get)
+    return language, probs[language]
+
+
+# ---------------- batched (faster-whisper only) ----------------
+
+CHUNK_S = 30  # whisper's window; batched chunks must fit in one
+# used when the caller has no VAD regions for an episode (batched mode needs chunks)
+BATCH_VAD = dict(min_silence_duration_ms=160)
+
+def fw_batched_word_level(model, audios, batch_size: int = 16, language=None, regions=None):
+    """
+    Transcribe several episodes in one BatchedInferencePipeline run.
+
+    Each episode's speech regions (regions[i], else a fresh VAD pass) are
+    laid end to end (vad.pack_speech), grouped into <= 30s chunks on region
+    boundaries that never cross episodes, and decoded batch_size at a time,
+    so a chunk holds speech only. Segments are mapped back to their
+    episode's timeline. Returns one (seg_rows, word_rows) per input, same
+    contract as the word_level runners.
+    """
+    np = importlib.import_module("numpy")
+    arrays = [a if hasattr(a, "shape") else decode_audio(a) for a in audios]
+    regions = regions or [None] * len(arrays)
+
+    packed, tables, offsets, clips, pos = [], [], [], [], 0
+    for a, speech in zip(arrays, regions):
+        if speech is None:
+            speech = vad.detect(a, BATCH_VAD)
+        buf, table = vad.pack_speech(a, speech)
+        packed.append(buf)
+        tables.append(table)
+        offsets.append(pos)
+        # regions on the packed timeline are contiguous: chunks close on region boundaries
+        ends = [start for start, _ in table[1:]] + [len(buf) / SAMPLE_RATE]
+        for start, end in vad.pack_chunks(list(zip([s for s, _ in table], ends)), CHUNK_S):
+            clips.append({"start": pos + int(start * SAMPLE_RATE),
+                          "end": pos + min(len(buf), int(end * SAMPLE_RATE))})
+        pos += len(buf)
+
+    results = [([], []) for _ in arrays]
+    if not clips:
+        return results
+
+    pipeline = _import_fw().BatchedInferencePipeline(model)
+    seg_iter, _ = pipeline.transcribe(
+        np.concatenate(packed), clip_timestamps=clips, batch_size=batch_size,
+        language=language, word_timestamps=True)
+
+    offsets_s = [o / SAMPLE_RATE for o in offsets]
+    for seg in seg_iter:
+        ep = bisect.bisect_right(offsets_s, (seg.start + seg.end) / 2) - 1
+        base, table = offsets_s[ep], tables[ep]
+
+        def t(x, is_end=False):
+            return vad.original_time(table, x - base, is_end)
+
+        seg_rows, word_rows = results[ep]
+        seg_idx = len(seg_rows)
+        seg_rows.append((t(seg.start), t(seg.end, True), seg.text))
+        for word_idx, w in enumerate(seg.words or []):
+            word_rows.append((seg_idx, word_idx, t(w.start), t(w.end, True), w.word))
+    return results
+
+
 # ---------------- registry ----------------
 
+def _fw_build(size):
+    def build(device="cuda", device_index=0, compute_type=None,
+              cpu_threads=0, num_workers=1):
+        compute_type = compute_type or _default_compute_type(device)
+        return _import_fw().WhisperModel(
+            size, device=device, device_index=device_index, compute_type=compute_type,
+            cpu_threads=cpu_threads, num_workers=num_workers)
+    return build
+
+def _oa_build(size):
+    def build(device="cuda", device_index=0, **_):
+        if device == "cuda":
+            device = f"cuda:{device_index}"
+        return _import_whisper().load_model(size, device=device)
+    return build
+
+# Silero VAD settings (faster_whisper.vad.VadOptions fields); set a model's
+# "vad" to None to decode the whole file.
+DEFAULT_VAD = dict(threshold=0.5, min_speech_duration_ms=250,
+                   min_silence_duration_ms=2000, speech_pad_ms=400)
+
+# english_only: .en weights (no language detection, English output only).
+# approx_rtf: wall seconds per audio second for one slot on a GPU, from the
+# 39k-episode benchmark in the readme (fw_small/fw_large extrapolated). Only
+# the ratios matter to routing.py, which rescales them with measured speed.
 MODELS = {
     # OpenAI-whisper (CPU or CUDA; installs torchaudio/ffmpeg deps)
     "oa_base": dict(
-        build=lambda device="cuda": _import_whisper().load_model("base", device=device),
+        build=_oa_build("base"),
         seg_runner=oa_text_segments,
         word_runner=oa_text_segments_word_level,
+        approx_mb=1000,  # resident size per instance incl. torch runtime (rough)
+        approx_rtf=0.11,
+        lang_runner=oa_detect_language,
+        vad=DEFAULT_VAD,
     ),
     # faster-whisper (CTranslate2)
     "fw_base": dict(
-        build=lambda device="cuda": _import_fw().WhisperModel("base", device=device, compute_type="float16"),
+        build=_fw_build("base"),
         seg_runner=fw_text_segments,
         word_runner=fw_text_segments_word_level,
+        batch_runner=fw_batched_word_level,
+        lang_runner=fw_detect_language,
+        approx_mb=400,
+        approx_rtf=0.032,
+        vad=DEFAULT_VAD,
     ),
     "fw_tiny": dict(
-        build=lambda device="cuda": _import_fw().WhisperModel("tiny.en", device=device, compute_type="float16"),
+        build=_fw_build("tiny.en"),
+        seg_runner=fw_text_segments,
+        word_runner=fw_text_segments_word_level,
+        batch_runner=fw_batched_word_level,
+        english_only=True,
+        approx_mb=200,
+        approx_rtf=0.025,
+        vad=DEFAULT_VAD,
+    ),
+    "fw_tiny_multi": dict(  # multilingual tiny: langid.py's default detector
+        build=_fw_build("tiny"),
+        seg_runner=fw_text_segments,
+        word_runner=fw_text_segments_word_level,
+        batch_runner=fw_batched_word_level,
+        lang_runner=fw_detect_language,
+        approx_mb=200,
+        approx_rtf=0.025,
+        vad=DEFAULT_VAD,
+    ),
+    "fw_small": dict(
+        build=_fw_build("small.en"),
+        seg_runner=fw_text_segments,
+        word_runner=fw_text_segments_word_level,
+        batch_runner=fw_batched_word_level,
+        english_only=True,
+        approx_mb=1000,
+        approx_rtf=0.07,
+        vad=DEFAULT_VAD,
+    ),
+    "fw_large": dict(
+        build=_fw_build("large-v3"),
         seg_runner=fw_text_segments,
         word_runner=fw_text_segments_word_level,
+        batch_runner=fw_batched_word_level,
+        lang_runner=fw_detect_language,
+        approx_mb=3500,
+        approx_rtf=0.2,
+        vad=DEFAULT_VAD,
     ),
 }
 
-_loaded = {}
+# ---------------- shared model cache ----------------
+
+# per-device budget for ModelCache, in MB of MODELS[...]["approx_mb"]; 0 = unlimited
+MODEL_CACHE_MB = float(os.getenv("ASR_MODEL_CACHE_MB", "0"))
+
+# socket of a running model_server.py: get_model / get_word_level_model hand back
+# proxies to its already-loaded models instead of loading their own
+MODEL_SERVER = os.getenv("ASR_MODEL_SERVER")
+
+
+def _default_compute_type(device: str) -> str:
+    # float16 is GPU-only in CTranslate2; int8 is the fast CPU path
+    return "float16" if device.startswith("cuda") else "int8"
+
+
+class _CacheEntry:
+    def __init__(self, mb: float):
+        self.model = None
+        self.error = None
+        self.loading = True
+        self.mb = mb
+        self.users = 0  # use() blocks in progress; pinned while > 0
+
+
+class ModelCache:
+    """
+    Loaded models shared by every thread, keyed by (name, device, compute_type)
+    ("cuda" means "cuda:0"; "cuda:1" is its own device) plus a replica number,
+    so a ModelPool's separate copies on one device are separate entries, and
+    the build_kw (cache-wide ones merged with the call's): a copy built with
+    num_workers=4 is never handed to a caller that asked for the default.
+    Loading is single-flight: a thread asking for
+    a model another thread is loading waits for that load (and gets its error)
+    instead of loading a second copy. With a budget, loading a model first
+    evicts least recently used models on the same device until the MODELS
+    approx_mb estimates fit; models inside a use() block are never evicted
+    (if nothing can go, the load goes ahead over budget). Extra build_kw
+    (e.g. num_workers) given to the cache or to get() / use() are passed to
+    the build.
+
+        cache = ModelCache(budget_mb=4000)
+        with cache.use("fw_base", "cuda") as model:
+            segs, words = fw_text_segments_word_level(model, path)
+        cache.stats()   # per key: loads, load_s, hits, evictions, resident
+    """
+
+    def __init__(self, budget_mb: float = MODEL_CACHE_MB, **build_kw):
+        self.budget_mb = budget_mb
+        self.build_kw = build_kw
+        self._cond = threading.Condition()
+        self._entries = OrderedDict()  # key -> _CacheEntry, least recently used first
+        self._metrics = {}             # key -> counters; kept across evictions
+
+    def key(self, name: str, device: str = "cuda", compute_type: str = None, replica: int = 0,
+            **build_kw):
+        if name not in MODELS:
+            raise ValueError(f"Unknown model name: {name}")
+        if device == "cuda":
+            device = "cuda:0"
+        if compute_type is None and name.startswith("fw_"):
+            compute_type = _default_compute_type(device)
+        build = tuple(sorted(dict(self.build_kw, **build_kw).items()))
+        return (name, device, compute_type, replica, build)
+
+    def get(self, name: str, device: str = "cuda", compute_type: str = None,
+            replica: int = 0, **build_kw):
+        """The loaded model, loading it if needed. Not pinned: a later load may evict it."""
+        return self._acquire(self.key(name, device, compute_type, replica, **build_kw), False)
+
+    @contextmanager
+    def use(self, name: str, device: str = "cuda", compute_type: str = None,
+            replica: int = 0, **build_kw):
+        """Like get(), but the model can't be evicted until the block exits."""
+        key = self.key(name, device, compute_type, replica, **build_kw)
+        model = self._acquire(key, True)
+        try:
+            yield model
+        finally:
+            with self._cond:
+                self._entries[key].users -= 1
+
+    def evict(self, name: str, device: str = "cuda", compute_type: str = None,
+              replica: int = 0, **build_kw) -> bool:
+        """Drop a model now (unless in use); True if it was resident."""
+        key = self.key(name, device, compute_type, replica, **build_kw)
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is None or entry.loading or entry.users:
+                return False
+            self._drop(key)
+        _free_memory(device)
+        return True
+
+    def stats(self):
+        with self._cond:
+            return [dict(name=k[0], device=k[1], compute_type=k[2], replica=k[3],
+                         build_kw=dict(k[4]),
+                         resident=k in self._entries and not self._entries[k].loading,
+                         **m) for k, m in self._metrics.items()]
+
+    # caller holds self._cond
+    def _drop(self, key):
+        del self._entries[key]
+        self._metrics[key]["evictions"] += 1
+
+    def _used_mb(self, device: str) -> float:
+        return sum(e.mb for k, e in self._entries.items() if k[1] == device)
+
+    def _make_room(self, device: str, mb: float):
+        """Evict idle LRU models on `device` until `mb` more fits; returns the evicted keys."""
+        evicted = []
+        for key in list(self._entries):
+            if self._used_mb(device) + mb <= self.budget_mb:
+                break
+            entry = self._entries[key]
+            if key[1] == device and not entry.loading and not entry.users:
+                self._drop(key)
+                evicted.append(key)
+        return evicted
+
+    def _acquire(self, key, pin: bool):
+        name, device, compute_type, _, build_kw = key
+        with self._cond:
+            metrics = self._metrics.setdefault(
+                key, dict(loads=0, load_s=0.0, last_load_s=None, hits=0, evictions=0))
+            entry = self._entries.get(key)
+            if entry is not None:
+                while entry.loading:
+                    self._cond.wait()
+                if entry.error is not None:
+                    raise entry.error
+                self._entries.move_to_end(key)
+                metrics["hits"] += 1
+                entry.users += pin
+                return entry.model
+            mb = MODELS[name].get("approx_mb", 500)
+            evicted = self._make_room(device, mb) if self.budget_mb > 0 else []
+            if self.budget_mb > 0 and self._used_mb(device) + mb > self.budget_mb:
+                print(f"[models] loading {name} puts {device} over ASR_MODEL_CACHE_MB="
+                      f"{self.budget_mb:.0f} (everything else is in use)")
+            entry = self._entries[key] = _CacheEntry(mb)
+        if evicted:
+            print(f"[models] evicted {', '.join(k[0] for k in evicted)} from {device} to fit {name}")
+            _free_memory(device)
 
-def get_model(name: str, device: str = "cuda"):
+        dev, _, idx = device.partition(":")
+        kwargs = dict(build_kw, device=dev, device_index=int(idx or 0))
+        if compute_type is not None:
+            kwargs["compute_type"] = compute_type
+        t0 = time.perf_counter()
+        try:
+            model = MODELS[name]["build"](**kwargs)
+        except BaseException as e:
+            with self._cond:
+                entry.error, entry.loading = e, False
+                del self._entries[key]
+                self._cond.notify_all()
+            raise
+        took = time.perf_counter() - t0
+        with self._cond:
+            entry.model, entry.loading = model, False
+            entry.users += pin
+            metrics["loads"] += 1
+            metrics["load_s"] += took
+            metrics["last_load_s"] = took
+            self._cond.notify_all()
+        print(f"[models] loaded {name} on {device}" + (f" ({compute_type})" if compute_type else "")
+              + f" in {took:.1f}s")
+        return model
+
+
+def _free_memory(device: str):
+    """Let go of evicted weights now rather than at the next GC; torch keeps freed CUDA blocks cached."""
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and device.startswith("cuda") and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+MODEL_CACHE = ModelCache()
+
+def get_model(name: str, device: str = "cuda", compute_type: str = None):
     """Return (name, model, seg_runner)."""
     if name not in MODELS:
         raise ValueError(f"Unknown model name: {name}")
-    if name not in _loaded:
-        _loaded[name] = MODELS[name]["build"](device=device)
-    return name, _loaded[name], MODELS[name]["seg_runner"]
+    if MODEL_SERVER:
+        from model_server import RemoteModel, run_remote
+        return name, RemoteModel(name, device, word_level=False, path=MODEL_SERVER), run_remote
+    return name, MODEL_CACHE.get(name, device, compute_type), MODELS[name]["seg_runner"]
 
-def get_word_level_model(name: str, device: str = "cuda"):
+def get_word_level_model(name: str, device: str = "cuda", compute_type: str = None):
     """Return (model, word_runner)."""
     if name not in MODELS:
         raise ValueError(f"Unknown model name: {name}")
-    if name not in _loaded:
-        _loaded[name] = MODELS[name]["build"](device=device)
-    return _loaded[name], MODELS[name]["word_runner"]
\ No newline at end of file
+    if MODEL_SERVER:
+        from model_server import RemoteModel, run_remote
+        return RemoteModel(name, device, path=MODEL_SERVER), run_remote
+    return MODEL_CACHE.get(name, device, compute_type), MODELS[name]["word_runner"]
+
+
+# ---------------- multi-instance pool ----------------
+
+def parse_placement(spec: str):
+    """
+    Parse a placement spec into [{'device','device_index','instances','workers'}].
+
+        "cuda=2"            2 instances on cuda:0
+        "cuda:0=2,cuda:1=1" 2 on the first GPU, 1 on the second
+        "cuda:0=1x4"        1 instance serving 4 concurrent calls (CTranslate2 num_workers)
+        "cpu=4"             4 CPU instances (cpu threads split between them)
+    """
+    entries = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        dev, _, count = part.partition("=")
+        dev, _, idx = dev.partition(":")
+        instances, _, workers = (count or "1").partition("x")
+        entries.append({
+            "device": dev,
+            "device_index": int(idx or 0),
+            "instances": int(instances),
+            "workers": int(workers or 1),
+        })
+    if not entries:
+        raise ValueError(f"Empty model placement spec: {spec!r}")
+    return entries
+
+
+class ModelPool:
+    """
+    Several loaded instances of one model, handed out to worker threads.
+
+    Each slot is one concurrent inference: an instance built with
+    num_workers=K (faster-whisper/CTranslate2 only) contributes K slots that
+    share its weights. CPU instances split os.cpu_count() (or cpu_threads)
+    between them so they don't oversubscribe cores.
+
+    Instances are loaded through `cache` (default MODEL_CACHE), one replica
+    per copy on a device, and stay pinned there until close(): they count
+    against ASR_MODEL_CACHE_MB, evict idle models to make room, and show up
+    in its stats.
+
+        pool = ModelPool("fw_base", parse_placement("cuda:0=2,cpu=2"))
+        with pool.acquire() as (model, run_fn):
+            segs, words = run_fn(model, path)
+        pool.close()
+    """
+
+    def __init__(self, name: str, placement, word_level: bool = True, cpu_threads: int = 0,
+                 cache: "ModelCache" = None):
+        if name not in MODELS:
+            raise ValueError(f"Unknown model name: {name}")
+        self.name = name
+        self.cache = cache or MODEL_CACHE
+        self._pins = ExitStack()
+        self.run_fn = MODELS[name]["word_runner" if word_level else "seg_runner"]
+        # multi-episode runner (faster-whisper batched pipeline); None if unsupported
+        self.batch_fn = MODELS[name].get("batch_runner") if word_level else None
+        self._free = queue.Queue()
+        self.slots = []  # [(model, label)]
+        self.device = ",".join(sorted({e["device"] for e in placement}))  # for run records
+
+        cpu_instances = sum(e["instances"] for e in placement if e["device"] == "cpu")
+        if not cpu_threads and cpu_instances:
+            cpu_threads = max(1, (os.cpu_count() or 1) // cpu_instances)
+
+        replicas = {}  # device -> copies so far
+        try:
+            for entry in placement:
+                is_fw = name.startswith("fw_")
+                workers = entry["workers"] if is_fw else 1
+                device = (entry["device"] if entry["device"] == "cpu"
+                          else f"{entry['device']}:{entry['device_index']}")
+                for i in range(entry["instances"]):
+                    kwargs = {}
+                    if is_fw:
+                        kwargs.update(num_workers=workers,
+                                      cpu_threads=cpu_threads if entry["device"] == "cpu" else 0)
+                    replica = replicas[device] = replicas.get(device, -1) + 1
+                    model = self._pins.enter_context(
+                        self.cache.use(name, device, replica=replica, **kwargs))
+                    label = f"{entry['device']}:{entry['device_index']}#{i}"
+                    for _ in range(workers):
+                        self.slots.append((model, label))
+                        self._free.put(len(self.slots) - 1)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        """Unpin the instances; the cache may then evict them."""
+        self._pins.close()
+
+    @property
+    def size(self) -> int:
+        return len(self.slots)
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        """Borrow one slot; yields (model, run_fn). Blocks while all slots are busy."""
+        slot = self._free.get(timeout=timeout)
+        try:
+            yield self.slots[slot][0], self.run_fn
+        finally:
+            self._free.put(slot)